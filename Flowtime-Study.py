@@ -1,33 +1,54 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from datetime import datetime, timedelta
-import json
 import os
-import threading
-import time
-
-# Try importing playsound, but provide a fallback if not installed/fails
-try:
-    from playsound import playsound
-    SOUND_AVAILABLE = True
-except ImportError:
-    SOUND_AVAILABLE = False
-    import winsound # For Windows system beep fallback
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from flowtime.core import (ALARM, BREAK, BREAK_ENDED, BREAK_EXPIRED, BREAK_MEASURED, BREAK_STARTED,
+                           SESSION_SAVED, WORK_STARTED, WORKING, FlowtimeEngine)
+from flowtime.editing import Editor
+from flowtime.export import CLIPBOARD_LIMIT, clipboard_text, export_file
+from flowtime.index import SessionIndex
+from flowtime.instrument import first_frame, span, traced
+from flowtime.loader import BackgroundLoad
+from flowtime.persist import BackgroundWriter
+from flowtime.records import format_break, format_clock, format_duration, format_timestamp, parse_timestamp
+from flowtime.refresh import RefreshScheduler
+from flowtime.storage import JsonFileBackend, open_backend
+from flowtime.suggest import BreakAdvisor
+from flowtime.store import EDIT_INSERT, EDIT_SET, SessionStore
+from flowtime.table import RecordTable
+from flowtime.tasks import TaskCompleter
+from flowtime.tiers import open_tiers, seed_tasks
+
+PREVIEW_COUNT = 200 # Sessions shown before the full history has loaded
+AUTOSAVE_MS = 30000
+TITLE = "Flowtime Focus Tracker"
 
 class TimeTrackerApp:
     def __init__(self, root):
         self.root = root
-        self.root.title("Flowtime Focus Tracker")
+        self.root.title(TITLE)
         self.root.geometry("700x600")
 
         # --- State Variables ---
-        self.records = []
+        self.records = SessionStore()
+        self.index = SessionIndex(self.records)
+        self.completer = TaskCompleter(lambda: self.records.tasks) # Follows clear() and loads
+        self.advisor = BreakAdvisor(self.records) # Learns from the measured breaks
+        self.editor = Editor(self.records) # Edits from the history table, with undo
+        self.loader = None
         self.data_file = "flowtime_data.json"
-        self.is_working = False
-        self.is_breaking = False
-        self.alarm_active = False  # NEW: Tracks if alarm is currently ringing
-        self.start_timestamp = None
-        self.timer_id = None 
+        self.backend = open_backend(JsonFileBackend(self.data_file))
+        self.tiers = open_tiers(self.data_file) # Older months, compressed; None when not tiered
+        self.sync = None
+        if os.environ.get("FLOWTIME_SYNC"): # Set FLOWTIME_SYNC=<url> to enable
+            from flowtime.sync import open_sync # Network modules only when syncing
+            self.sync = open_sync(self.data_file, self.records)
+        self.syncer = None
+        self.engine = FlowtimeEngine(self.records) # IDLE/WORKING/BREAK state lives here
+        self.engine.subscribe(self.on_engine_event)
+        self.alarm = None # Audio backend is loaded when the first break ends
+        self.dirty = False # Changes not yet handed to the writer
+        self.writer = BackgroundWriter(traced("backend.save")(self.backend.save))
 
         # --- Load Data ---
         self.load_records()
@@ -38,9 +59,19 @@ class TimeTrackerApp:
         self.style.configure("Bold.TButton", font=("Arial", 10, "bold"))
         
         self.create_widgets()
+
+        # Timer label, title and break countdown; subscribed after on_engine_event, so it sees its changes
+        self.refresh = RefreshScheduler(self.engine, self.render,
+                                        lambda seconds, callback: self.root.after(max(1, int(seconds * 1000)), callback),
+                                        self.root.after_cancel)
+        self.refresh.wake()
         
         # --- Events ---
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        for sequence in ("<Map>", "<Unmap>", "<FocusIn>", "<FocusOut>"):
+            self.root.bind(sequence, self.on_window_change, add="+")
+        self.root.after(AUTOSAVE_MS, self.autosave)
+        self.root.after_idle(self.on_first_frame)
 
     def create_widgets(self):
         # 1. Top Control Panel
@@ -51,6 +82,15 @@ class TimeTrackerApp:
         tk.Label(control_frame, text="Task:").grid(row=0, column=0, sticky="w")
         self.task_name_entry = tk.Entry(control_frame, width=30, font=("Arial", 11))
         self.task_name_entry.grid(row=0, column=1, padx=5, sticky="w")
+        self.task_name_entry.bind("<KeyRelease>", self.update_suggestions)
+        self.task_name_entry.bind("<Down>", self.focus_suggestions)
+        self.task_name_entry.bind("<FocusOut>", lambda e: self.root.after(150, self.hide_suggestions))
+
+        # Autocomplete list, placed under the entry while there are matches
+        self.suggest_box = tk.Listbox(self.root, height=6, font=("Arial", 10), activestyle="none")
+        self.suggest_box.bind("<ButtonRelease-1>", self.pick_suggestion)
+        self.suggest_box.bind("<Return>", self.pick_suggestion)
+        self.suggest_box.bind("<Escape>", lambda e: self.hide_suggestions(force=True))
 
         # Live Timer Display
         self.timer_label = tk.Label(control_frame, text="00:00:00", font=("Helvetica", 32, "bold"), fg="#333")
@@ -73,7 +113,8 @@ class TimeTrackerApp:
             self.tree.column(col, width=100 if col != "Task" else 200)
 
         scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.table = RecordTable(self.tree, self.table_row, scrollbar=scrollbar,
+                                 older=self.cold_rows if self.tiers is not None else None)
         
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
@@ -84,6 +125,7 @@ class TimeTrackerApp:
 
         tk.Button(btn_frame, text="Edit Selected", command=self.edit_record).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Copy CSV", command=self.copy_to_clipboard).pack(side=tk.LEFT, padx=5)
+        tk.Button(btn_frame, text="Export...", command=self.export_records).pack(side=tk.LEFT, padx=5)
         tk.Button(btn_frame, text="Reset Data", command=self.clear_records, fg="red").pack(side=tk.RIGHT, padx=5)
         tk.Button(btn_frame, text="View Stats", command=self.show_total_time).pack(side=tk.RIGHT, padx=5)
 
@@ -91,71 +133,84 @@ class TimeTrackerApp:
 
     # --- Core Logic ---
 
+    @traced()
     def toggle_work(self):
-        if not self.is_working:
-            # --- START WORKING (Logic Changed) ---
-            
-            # 1. Update the PREVIOUS record's break time (if it exists)
-            # This calculates: "New Focus Start Time - Start of Break (Previous End Time)"
-            if self.records:
-                last_record = self.records[-1]
-                if last_record['end_time']: # Ensure there is a valid end time
-                    start_of_new_focus = datetime.now()
-                    end_of_last_task = last_record['end_time']
-                    
-                    # Calculate actual gap
-                    actual_break_delta = start_of_new_focus - end_of_last_task
-                    
-                    # Format as H:MM:SS (remove microseconds)
-                    last_record['break_time_str'] = str(actual_break_delta).split('.')[0]
-            
-            # 2. Standard Start Logic
+        if not self.engine.working:
             task_name = self.task_name_entry.get().strip()
             if not task_name:
                 messagebox.showwarning("Missing Input", "Please enter a task name first.")
                 return
-            
-            self.is_working = True
-            self.start_timestamp = datetime.now()
-            
+            self.engine.start_work(task_name)
+        else:
+            self.engine.stop_work()
+
+    @traced()
+    def on_engine_event(self, event, data):
+        """Mirrors FlowtimeEngine transitions in the widgets."""
+        if event == BREAK_MEASURED:
+            # "New Focus Start Time - Start of Break (Previous End Time)" was stored on the previous task
+            self.table.refresh(data)
+            self.save_records()
+
+        elif event == WORK_STARTED:
             self.action_btn.config(text="Stop & Break", bg="#f44336") 
             self.task_name_entry.config(state="disabled")
-            self.update_timer_display()
-            self.update_table() # Refresh table to show the updated break time for previous task
+            self.hide_suggestions(force=True)
 
-        else:
-            # --- STOP WORKING (Logic Changed) ---
-            self.is_working = False
-            end_time = datetime.now()
-            duration_seconds = int((end_time - self.start_timestamp).total_seconds())
-            
-            new_record = {
-                "task_name": self.task_name_entry.get().strip(),
-                "start_time": self.start_timestamp,
-                "end_time": end_time,
-                "work_time_str": self.format_seconds(duration_seconds),
-                # Set placeholder text until the NEXT task starts
-                "break_time_str": "On Break..." 
-            }
-            self.records.append(new_record)
-            
-            # UI Reset
+        elif event == SESSION_SAVED:
+            # Break stays "On Break..." until the NEXT task starts
             self.action_btn.config(text="Start Focus", bg="#4CAF50")
             self.task_name_entry.config(state="normal")
-            self.update_table()
-            
-            if self.timer_id:
-                self.root.after_cancel(self.timer_id)
-            
-            self.prompt_break()
+            self.table.append()
+            self.save_records()
+            self.prompt_break(data)
 
-    def update_timer_display(self):
-        if self.is_working:
-            elapsed = datetime.now() - self.start_timestamp
-            self.timer_label.config(text=str(elapsed).split('.')[0], fg="green")
-            self.timer_id = self.root.after(1000, self.update_timer_display)
+        elif event == BREAK_STARTED:
+            self.open_break_window()
 
-    def prompt_break(self):
+        elif event == BREAK_EXPIRED:
+            self.trigger_alarm()
+
+        elif event == BREAK_ENDED:
+            self.close_break_window(interrupted=data)
+
+    @traced()
+    def render(self, changes):
+        """One pass from the RefreshScheduler: only the parts that changed."""
+        if "clock" in changes:
+            state, seconds = changes["clock"]
+            if state == WORKING:
+                self.timer_label.config(text=format_duration(seconds), fg="green")
+            elif state == BREAK:
+                mins, secs = divmod(seconds, 60)
+                text = f"{mins:02}:{secs:02}"
+                if self.break_window_open():
+                    self.lbl_break.config(text=text)
+                self.timer_label.config(text=f"Break: {text}", fg="blue")
+            else:
+                self.timer_label.config(text="00:00:00", fg="red" if state == ALARM else "#333")
+        if "title" in changes:
+            self.root.title(f"{changes['title']} - {TITLE}" if changes["title"] else TITLE)
+
+    def on_window_change(self, event=None):
+        # Map/Unmap and focus events also arrive for child widgets; look at the windows themselves
+        windows = [self.root] + ([self.break_win] if self.break_window_open() else [])
+        self.refresh.set_visible(any(w.winfo_viewable() for w in windows))
+        self.refresh.set_focused(self.focus_path() != "")
+
+    def focus_path(self):
+        """
+        Tk path of the focused widget, "" while another app has focus.
+        focus_get() raises KeyError on Tk-internal widgets (a messagebox,
+        the file dialog's popdown); the path is always there.
+        """
+        return str(self.root.tk.call("focus"))
+
+    def break_window_open(self):
+        return hasattr(self, 'break_win') and self.break_win.winfo_exists()
+
+    @traced()
+    def prompt_break(self, index):
         def set_break():
             try:
                 minutes = int(entry.get())
@@ -169,18 +224,19 @@ class TimeTrackerApp:
         win.geometry("250x120")
         tk.Label(win, text="Work session complete!\nMinutes for break:").pack(pady=10)
         entry = tk.Entry(win)
+        r = self.records
+        entry.insert(0, str(self.advisor.suggest(r.work[index], r.task(index), r.ends[index])))
+        entry.select_range(0, tk.END)
         entry.pack()
         entry.focus_set()
         tk.Button(win, text="Start Break", command=set_break).pack(pady=10)
 
     def start_break_timer(self, minutes):
-        self.is_breaking = True
-        self.break_seconds_left = minutes * 60
-        
-        # REMOVED: self.records[-1]['break_time_str'] = ... 
-        # We don't touch the table here anymore. 
-        # The table will keep saying "On Break..." until you start your next task.
+        # The table keeps saying "On Break..." until you start your next task.
+        self.engine.start_break(minutes * 60)
 
+    @traced()
+    def open_break_window(self):
         # Launch Break Window
         self.break_win = tk.Toplevel(self.root)
         self.break_win.title("On Break")
@@ -192,28 +248,14 @@ class TimeTrackerApp:
         
         self.btn_end_break = tk.Button(self.break_win, text="End Break", command=self.end_break_early, bg="#f44336", fg="white")
         self.btn_end_break.pack(pady=20)
-        
-        self.run_break_countdown()
-
-    def run_break_countdown(self):
-        if self.break_seconds_left > 0 and self.is_breaking:
-            mins, secs = divmod(self.break_seconds_left, 60)
-            self.lbl_break.config(text=f"{mins:02}:{secs:02}")
-            self.timer_label.config(text=f"Break: {mins:02}:{secs:02}", fg="blue")
-            
-            self.break_seconds_left -= 1
-            self.timer_id = self.root.after(1000, self.run_break_countdown)
-        elif self.break_seconds_left <= 0 and self.is_breaking:
-            # Time is up! Trigger the alarm loop
-            self.trigger_alarm()
+        # The countdown here counts as visible even with the main window minimized
+        for sequence in ("<Map>", "<Unmap>", "<FocusIn>", "<FocusOut>"):
+            self.break_win.bind(sequence, self.on_window_change, add="+")
 
     def trigger_alarm(self):
         """Called when break timer hits 0. Starts the sound loop."""
-        self.is_breaking = False
-        self.alarm_active = True
-        
         # Update UI to show Time is Up
-        if hasattr(self, 'break_win') and self.break_win.winfo_exists():
+        if self.break_window_open():
             self.lbl_break.config(text="TIME UP!", fg="red")
             self.btn_end_break.config(text="STOP ALARM", bg="red")
             # Bring window to front
@@ -221,115 +263,329 @@ class TimeTrackerApp:
             self.break_win.attributes('-topmost',True)
             self.break_win.after_idle(self.break_win.attributes,'-topmost',False)
 
-        self.timer_label.config(text="00:00:00", fg="red")
-
-        # Start the sound loop in a background thread
-        threading.Thread(target=self.loop_sound, daemon=True).start()
-
-    def loop_sound(self):
-        """Runs in a separate thread. Loops until alarm_active is False."""
-        while self.alarm_active:
-            if SOUND_AVAILABLE and os.path.exists("notification.mp3"):
-                try:
-                    # block=True is crucial here so it waits for sound to finish before looping
-                    playsound("notification.mp3", block=True)
-                except:
-                    self.system_beep()
-                    time.sleep(1) # Gap between beeps
-            else:
-                self.system_beep()
-                time.sleep(1) 
+        # Wake the alarm worker; it loops the cached sound until stopped
+        if self.alarm is None:
+            from flowtime.audio import AlarmPlayer
+            self.alarm = AlarmPlayer("notification.mp3")
+        self.alarm.start()
 
     def end_break_early(self):
         """Stops the break and the alarm."""
-        self.is_breaking = False
-        self.alarm_active = False  # This kills the loop_sound thread
-        
-        if self.timer_id:
-            self.root.after_cancel(self.timer_id)
+        self.engine.end_break()
+
+    def close_break_window(self, interrupted):
+        if self.alarm is not None:
+            self.alarm.stop()  # Silences the alarm right away
             
-        if hasattr(self, 'break_win') and self.break_win.winfo_exists():
+        if self.break_window_open():
             self.break_win.destroy()
         
-        self.timer_label.config(text="00:00:00", fg="#333")
-        messagebox.showinfo("Focus", "Break ended. Ready for next task?")
+        if not interrupted: # Starting the next task ends the break too
+            self.refresh.wake() # Reset the timer label before the dialog blocks
+            messagebox.showinfo("Focus", "Break ended. Ready for next task?")
 
     # --- Helpers & Utilities ---
-            
-    def system_beep(self):
-        try:
-            import winsound
-            winsound.Beep(1000, 500) 
-        except:
-            print("\a") 
-
-    def format_seconds(self, seconds):
-        return str(timedelta(seconds=seconds))
 
+    def update_suggestions(self, event=None):
+        if event is not None and event.keysym in ("Down", "Up", "Return", "Escape", "Tab"):
+            if event.keysym == "Escape":
+                self.hide_suggestions(force=True)
+            return
+        text = self.task_name_entry.get()
+        names = self.completer.suggest(text)
+        if not names or names == [text]:
+            self.hide_suggestions(force=True)
+            return
+        self.suggest_box.delete(0, tk.END)
+        self.suggest_box.insert(tk.END, *names)
+        self.suggest_box.config(height=len(names))
+        self.suggest_box.place(in_=self.task_name_entry, x=0, rely=1.0, relwidth=1.0)
+        self.suggest_box.lift()
+
+    def focus_suggestions(self, event=None):
+        if self.suggest_box.winfo_ismapped():
+            self.suggest_box.focus_set()
+            self.suggest_box.selection_clear(0, tk.END)
+            self.suggest_box.selection_set(0)
+            self.suggest_box.activate(0)
+
+    def pick_suggestion(self, event=None):
+        selection = self.suggest_box.curselection()
+        if selection and str(self.task_name_entry.cget("state")) == "normal":
+            self.task_name_entry.delete(0, tk.END)
+            self.task_name_entry.insert(0, self.suggest_box.get(selection[0]))
+        self.hide_suggestions(force=True)
+        self.task_name_entry.focus_set()
+        self.task_name_entry.icursor(tk.END)
+
+    def hide_suggestions(self, force=False):
+        # Keep the list open while it has focus (the user is picking from it)
+        if force or self.focus_path() != str(self.suggest_box):
+            self.suggest_box.place_forget()
+
+    @traced()
     def update_table(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        for r in reversed(self.records): 
-            self.tree.insert("", "end", values=(
-                r['task_name'],
-                r['start_time'].strftime("%H:%M") if r['start_time'] else "-",
-                r['end_time'].strftime("%H:%M") if r['end_time'] else "-",
-                r['work_time_str'],
-                r.get('break_time_str', "-")
-            ))
-
+        """Full rebuild; toggles use the incremental RecordTable calls instead."""
+        self.table.reset(len(self.records))
+
+    def table_row(self, index):
+        r = self.records
+        return (
+            r.task(index),
+            format_clock(r.starts[index]),
+            format_clock(r.ends[index]),
+            format_duration(r.work[index]),
+            format_break(r.breaks[index])
+        )
+
+    def cold_rows(self, offset, count):
+        return [(task, format_clock(start), format_clock(end), format_duration(work), format_break(brk))
+                for task, start, end, work, brk in self.tiers.page(offset, count)]
+
+    @traced()
     def copy_to_clipboard(self):
+        """Copies the selected rows (or the whole history, if small) as TSV."""
+        indices = self.table.selected() or range(len(self.records))
+        if len(indices) > CLIPBOARD_LIMIT:
+            # Hundreds of MB through the Tk clipboard hangs the app; write a file instead
+            messagebox.showinfo("Too Large", f"{len(indices)} sessions are too many for the clipboard. Choose a file to export to.")
+            self.export_records(indices)
+            return
         self.root.clipboard_clear()
-        header = "Task\tStart\tEnd\tWork\tBreak\n"
-        data = ""
-        for r in self.records:
-            data += f"{r['task_name']}\t{r['start_time']}\t{r['end_time']}\t{r['work_time_str']}\t{r.get('break_time_str','')}\n"
-        self.root.clipboard_append(header + data)
+        self.root.clipboard_append(clipboard_text(self.records, indices))
         messagebox.showinfo("Copied", "Data copied to clipboard.")
 
+    def export_records(self, indices=None):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("TSV", "*.tsv"), ("JSON Lines", "*.jsonl")])
+        if not path:
+            return
+        # Stream from a snapshot on a worker thread so the UI stays responsive
+        snapshot = self.records.copy(len(self.records.edits))
+        if self.tiers is not None and indices is None:
+            tiers = self.tiers # Whole history: older months are read back on the worker
+            self.exporter = BackgroundLoad(lambda: export_file(tiers.combined(snapshot), path))
+        else:
+            self.exporter = BackgroundLoad(lambda: export_file(snapshot, path, indices=indices))
+        self.root.after(100, self.poll_export)
+
+    def poll_export(self):
+        if not self.exporter.done():
+            self.root.after(100, self.poll_export)
+            return
+        try:
+            count = self.exporter.result()
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        messagebox.showinfo("Exported", f"Exported {count} sessions.")
+
+    @traced()
     def show_total_time(self):
-        total_sec = 0
-        for r in self.records:
-            try:
-                h, m, s = map(int, r['work_time_str'].split(':'))
-                total_sec += h*3600 + m*60 + s
-            except: pass
-        msg = f"Total Work Time: {str(timedelta(seconds=total_sec))}"
+        now = self.engine.clock.now()
+        total = self.records.total_work
+        top = self.index.top_tasks()
+        if self.tiers is not None:
+            # Older months come from the segment headers; nothing is decompressed
+            total += self.tiers.total_work
+            top = self.tiers.top_tasks(self.index)
+        msg = f"Total Work Time: {format_duration(total)}"
+        msg += f"\nToday: {format_duration(self.index.today(now))}"
+        msg += f"\nThis Week: {format_duration(self.index.this_week(now))}"
+        if top:
+            msg += "\n\nTop Tasks:"
+            for task, seconds in top:
+                msg += f"\n  {task}: {format_duration(seconds)}"
+        with span("stats.analytics"): # The handler's own span also covers the modal dialog
+            from flowtime.analytics import NUMPY_AVAILABLE, Analytics, format_report # NumPy only when asked
+            if NUMPY_AVAILABLE and (self.records or self.tiers):
+                msg += "\n\n" + format_report(Analytics.from_store(self.records, self.tiers).report(now))
         messagebox.showinfo("Statistics", msg)
 
     def clear_records(self):
         if messagebox.askyesno("Confirm", "Delete all history?"):
-            self.records = []
+            self.loader = None # Drop a background load that is still running
+            self.records.clear()
+            if self.tiers is not None:
+                self.tiers.clear()
             self.update_table()
+            self.dirty = True
 
+    @traced()
     def save_records(self):
-        serializable = []
-        for r in self.records:
-            item = r.copy()
-            if item['start_time']: item['start_time'] = item['start_time'].strftime("%Y-%m-%d %H:%M:%S")
-            if item['end_time']: item['end_time'] = item['end_time'].strftime("%Y-%m-%d %H:%M:%S")
-            serializable.append(item)
-        with open(self.data_file, "w") as f:
-            json.dump(serializable, f, indent=4)
-
+        """Hands a snapshot to the background writer; no disk I/O on the Tk thread."""
+        if self.loader is not None:
+            self.dirty = True # Saving a half-loaded history would drop sessions
+            return
+        self.writer.submit(self.records.copy(self.backend.edits_saved(self.records)))
+        self.dirty = False
+
+    def autosave(self):
+        if self.dirty:
+            self.save_records()
+        self.start_sync()
+        self.root.after(AUTOSAVE_MS, self.autosave)
+
+    def start_sync(self):
+        """Sends new sessions and fetches other devices' on a worker thread."""
+        if self.sync is None or self.loader is not None or self.syncer is not None:
+            return
+        ops = self.sync.outgoing()
+        self.syncer = BackgroundLoad(lambda: self.sync.exchange(ops))
+        self.root.after(200, self.poll_sync)
+
+    def poll_sync(self):
+        if self.syncer is None:
+            return # Finished by on_close
+        if not self.syncer.done():
+            self.root.after(200, self.poll_sync)
+            return
+        if self.finish_sync():
+            self.root.after_idle(self.start_sync)
+
+    def finish_sync(self):
+        """Applies a finished round on the Tk thread. Returns True if more is waiting on the server."""
+        syncer, self.syncer = self.syncer, None
+        try:
+            pulled, position, more = syncer.result()
+        except (OSError, ValueError) as e:
+            print(f"Sync failed: {e}") # Watermarks stay put; the next round resumes
+            return False
+        self.engine.pin_pending() # Sessions from other devices must not take the running break
+        self.apply_edits(self.sync.apply(pulled, position))
+        return more
+
+    @traced()
     def load_records(self):
-        if not os.path.exists(self.data_file): return
+        """Shows the newest sessions now and streams the rest in on a worker thread."""
         try:
-            with open(self.data_file, "r") as f:
-                data = json.load(f)
-                for r in data:
-                    if r['start_time']: r['start_time'] = datetime.strptime(r['start_time'], "%Y-%m-%d %H:%M:%S")
-                    if r['end_time']: r['end_time'] = datetime.strptime(r['end_time'], "%Y-%m-%d %H:%M:%S")
-                    self.records.append(r)
+            self.records.extend(self.backend.recent(PREVIEW_COUNT))
         except Exception as e:
             print(f"Error loading data: {e}")
+            return
+        
+        self.preview_len = len(self.records)
+        self.loader = BackgroundLoad(traced("backend.load")(self.backend.load))
+        self.root.after(50, self.poll_loader)
+
+    def poll_loader(self):
+        if self.loader is None:
+            return
+        if not self.loader.done():
+            self.root.after(50, self.poll_loader)
+            return
+        self.finish_loading()
+
+    @traced()
+    def finish_loading(self):
+        loader, self.loader = self.loader, None
+        try:
+            full = loader.result()
+        except Exception as e:
+            print(f"Error loading data: {e}")
+            return
+        self.records.adopt(full, self.preview_len)
+        if self.tiers is not None:
+            seed_tasks(self.records, self.tiers)
+        self.update_table()
+        self.root.after_idle(self.completer.sync) # Index task names before the first keystroke
+        self.root.after_idle(self.start_sync)
+
+    def on_first_frame(self):
+        self.root.update_idletasks() # Make sure the window has actually been drawn
+        first_frame(quit=self.root.destroy)
 
     def edit_record(self):
-        pass 
+        """One selected session gets the full editor; several can be re-tagged together."""
+        if self.loader is not None:
+            messagebox.showinfo("Loading", "History is still loading, try again in a moment.")
+            return
+        indices = self.table.selected()
+        if not indices:
+            messagebox.showinfo("Edit", "Select one or more sessions first.")
+            return
+
+        r = self.records
+        single = len(indices) == 1
+        win = tk.Toplevel(self.root)
+        win.title("Edit Session" if single else f"Edit {len(indices)} Sessions")
+        fields = {}
+        for row, label in enumerate(("Task", "Start", "End", "Split at") if single else ("Task",)):
+            tk.Label(win, text=f"{label}:").grid(row=row, column=0, sticky="w", padx=5, pady=2)
+            fields[label] = tk.Entry(win, width=30)
+            fields[label].grid(row=row, column=1, padx=5, pady=2)
+        fields["Task"].insert(0, r.task(indices[0]))
+        if single:
+            fields["Start"].insert(0, format_timestamp(r.starts[indices[0]]))
+            fields["End"].insert(0, format_timestamp(r.ends[indices[0]]))
+
+        def run(operation):
+            # Each operation returns the edits it made; the table follows just those
+            try:
+                edits = operation()
+            except ValueError as e:
+                messagebox.showerror("Edit", str(e), parent=win)
+                return
+            win.destroy()
+            self.apply_edits(edits)
+
+        def timestamp(label):
+            try:
+                return parse_timestamp(fields[label].get().strip())
+            except ValueError:
+                raise ValueError(f"{label}: expected YYYY-MM-DD HH:MM:SS")
+
+        def save():
+            i = indices[0]
+            run(lambda: self.editor.update(i, fields["Task"].get(), timestamp("Start"), timestamp("End")))
+
+        buttons = tk.Frame(win)
+        buttons.grid(row=len(fields), column=0, columnspan=2, pady=8)
+        if single:
+            i = indices[0]
+            tk.Button(buttons, text="Save", command=save).pack(side=tk.LEFT, padx=3)
+            tk.Button(buttons, text="Split",
+                      command=lambda: run(lambda: self.editor.split(i, timestamp("Split at")))).pack(side=tk.LEFT, padx=3)
+            tk.Button(buttons, text="Merge with Next",
+                      command=lambda: run(lambda: self.editor.merge(i))).pack(side=tk.LEFT, padx=3)
+            tk.Button(buttons, text="Delete", fg="red",
+                      command=lambda: run(lambda: self.editor.delete(i))).pack(side=tk.LEFT, padx=3)
+        else:
+            tk.Button(buttons, text="Apply",
+                      command=lambda: run(lambda: self.editor.retag(indices, fields["Task"].get()))).pack(side=tk.LEFT, padx=3)
+        tk.Button(buttons, text="Undo", command=lambda: run(self.editor.undo),
+                  state="normal" if self.editor.can_undo else "disabled").pack(side=tk.LEFT, padx=3)
+
+    def apply_edits(self, edits):
+        """Updates the rows an edit touched and saves; no table rebuild."""
+        for kind, i, _old, _new in edits:
+            if kind == EDIT_SET:
+                self.table.refresh(i)
+            elif kind == EDIT_INSERT:
+                self.table.insert(i)
+            else:
+                self.table.delete(i)
+        if edits:
+            self.save_records()
 
     def on_close(self):
-        self.alarm_active = False # Kill alarm thread if app closes
+        self.refresh.close()
+        if self.alarm is not None:
+            self.alarm.close() # Stop the alarm worker if app closes
+        if self.loader is not None:
+            self.loader.wait() # Never save a half-loaded history
+            self.finish_loading()
+        if self.syncer is not None:
+            self.syncer.wait() # The round owns the sync state until exchange() returns
+            self.finish_sync()
+        if self.sync is not None:
+            self.sync.capture() # Edits not sent yet wait in the outbox for the next run (before rolling resets the store)
+        if self.tiers is not None:
+            self.tiers.roll(self.records, self.engine.clock.now()) # Keep the history file small
         self.save_records()
+        self.writer.close() # Wait for the last write before exiting
+        self.backend.close(self.records)
         self.root.destroy()
 
 if __name__ == "__main__":
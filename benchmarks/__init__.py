@@ -0,0 +1 @@
+"""Performance benchmarks for the Flowtime front-ends (see benchmarks.run)."""
@@ -0,0 +1,120 @@
+"""
+Deterministic synthetic histories in either JSON layout.
+
+Every day is generated from its own seeded RNG, so any day can be rebuilt
+on its own and a history can be written oldest first (flowtime_data.json)
+or newest first (flowtime_v2.json) without holding it all in memory:
+
+    python -m benchmarks.generate --sessions 1000000 --schema study flowtime_data.json
+"""
+import argparse
+import json
+import random
+from datetime import datetime
+
+from flowtime.index import DAY
+from flowtime.records import NO_BREAK, study_record, to_epoch, v2_record
+from flowtime.store import SessionStore
+
+START = to_epoch(datetime(2020, 1, 6)) # First generated day (a Monday)
+SESSIONS_PER_DAY = (2, 10)
+MAX_WORK = 4 * 3600
+
+TASKS = ["Math", "Physics", "Chemistry", "Biology", "History", "Geography", "Literature",
+         "Essay writing", "Reading", "Flashcards", "Past papers", "Lab report", "Coding",
+         "Algorithms", "Databases", "Networking", "Statistics", "Linear algebra", "Calculus",
+         "German", "French", "Spanish", "Music theory", "Economics", "Accounting", "Philosophy",
+         "Psychology", "Project", "Email", "Planning"]
+TASK_WEIGHTS = [1 / (rank + 1) for rank in range(len(TASKS))] # Zipf-like: a few tasks dominate
+
+SCHEMAS = {"study": study_record, "v2": v2_record}
+
+
+def _day_rng(seed, day):
+    return random.Random(seed * 1000003 + day)
+
+def day_count(seed, day):
+    return _day_rng(seed, day).randint(*SESSIONS_PER_DAY)
+
+def day_sessions(seed, day):
+    """(task, start, end, work, break) rows for one day, oldest first."""
+    rng = _day_rng(seed, day)
+    count = rng.randint(*SESSIONS_PER_DAY) # Same first draw as day_count()
+    t = START + day * DAY + 7 * 3600 + rng.randint(0, 3 * 3600)
+    rows = []
+    for _ in range(count):
+        work = min(MAX_WORK, int(rng.lognormvariate(7.6, 0.6))) # Median ~33 minutes
+        brk = max(60, int(work / 5 * rng.uniform(0.5, 1.5)))
+        task = rng.choices(TASKS, TASK_WEIGHTS)[0]
+        rows.append((task, t, t + work, work, brk))
+        t += work + brk
+    return rows
+
+def plan(sessions, seed):
+    """Day numbers covering `sessions` sessions, and how many the last day keeps."""
+    days = []
+    total = 0
+    while total < sessions:
+        count = day_count(seed, len(days))
+        days.append(count)
+        total += count
+    keep = days[-1] - (total - sessions) if days else 0
+    return len(days), keep
+
+def iter_rows(sessions, seed=1, newest_first=False):
+    """Yields `sessions` rows. The newest session's break is still pending."""
+    days, keep = plan(sessions, seed)
+    order = range(days - 1, -1, -1) if newest_first else range(days)
+    for day in order:
+        rows = day_sessions(seed, day)
+        if day == days - 1:
+            rows = rows[:keep]
+            task, start, end, work, _ = rows[-1]
+            rows[-1] = (task, start, end, work, NO_BREAK)
+        if newest_first:
+            rows.reverse()
+        yield from rows
+
+def generate_store(sessions, seed=1):
+    store = SessionStore()
+    store.extend(iter_rows(sessions, seed))
+    return store
+
+def write_history(path, sessions, schema="study", seed=1, batch=10000):
+    """
+    Writes a history file in `schema` ("study" or "v2"). The JSON array is
+    streamed out in batches, so 10M sessions don't need 10M dicts at once.
+    """
+    to_record = SCHEMAS[schema]
+    chunk = SessionStore()
+    with open(path, "w") as f:
+        f.write("[")
+        first = True
+        for row in iter_rows(sessions, seed, newest_first=schema == "v2"):
+            chunk.append(*row)
+            if len(chunk) >= batch:
+                first = _write_chunk(f, chunk, to_record, first)
+                chunk = SessionStore()
+        _write_chunk(f, chunk, to_record, first)
+        f.write("\n]\n")
+
+def _write_chunk(f, chunk, to_record, first):
+    for i in range(len(chunk)):
+        f.write("\n" if first else ",\n")
+        f.write(json.dumps(to_record(chunk, i)))
+        first = False
+    return first
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic Flowtime history")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--schema", choices=sorted(SCHEMAS), default="study")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("path")
+    args = parser.parse_args(argv)
+    write_history(args.path, args.sessions, args.schema, args.seed)
+    print(f"Wrote {args.sessions} sessions to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Times the hot paths of both front-ends against synthetic histories and
+prints the results as JSON.
+
+    python -m benchmarks.run --sizes 1000 100000 1000000 --output bench.json
+    xvfb-run python -m benchmarks.run     # also times the Tk widgets
+
+Storage, stats, CSV export and session saves are measured headlessly for every
+backend ("study" is the Tk app's JSON file, "v2" the Kivy app's snapshot
+plus journal, "sqlite" the FLOWTIME_DB backend). The Tk app itself
+(load_records, save_records, update_table, show_total_time,
+copy_to_clipboard) is timed only when a display is available; otherwise
+those entries are reported as skipped. Time-to-first-frame of both apps
+comes from benchmarks.startup. Each entry has the best and median
+wall time over --repeat runs plus the peak traced memory of one extra run.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.generate import iter_rows, write_history
+from benchmarks.startup import startup_benchmarks
+from flowtime.analytics import NUMPY_AVAILABLE, Analytics
+from flowtime.core import FakeClock, FlowtimeEngine
+from flowtime.export import export_file
+from flowtime.index import SessionIndex
+from flowtime.storage import JournalBackend, JsonFileBackend, SqliteBackend
+from flowtime.store import SessionStore
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+PREVIEW_COUNT = 200
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Flowtime-Study.py")
+
+FILES = {"study": "flowtime_data.json", "v2": "flowtime_v2.json", "sqlite": "flowtime.db"}
+
+
+def measure(run, setup=None, teardown=None, repeat=3):
+    """Best/median seconds of `run(state)` plus its peak traced allocation."""
+    times = []
+    for _ in range(repeat + 1):
+        state = setup() if setup else None
+        traced = len(times) == repeat # Last run only: tracemalloc slows everything down
+        if traced:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            run(state)
+        finally:
+            elapsed = time.perf_counter() - start
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if teardown:
+                teardown(state)
+        if not traced:
+            times.append(elapsed)
+    return {"best": min(times), "median": statistics.median(times), "runs": repeat, "peak_bytes": peak}
+
+
+# --- Headless backend benchmarks ---
+
+def make_history(directory, schema, sessions, seed):
+    path = os.path.join(directory, FILES[schema])
+    if schema == "sqlite":
+        backend = SqliteBackend(path)
+        backend.insert_rows(iter_rows(sessions, seed))
+        backend.close(None)
+    else:
+        write_history(path, sessions, schema, seed)
+    return path
+
+def open_history(schema, path):
+    if schema == "study":
+        return JsonFileBackend(path)
+    if schema == "v2":
+        return JournalBackend(path)
+    return SqliteBackend(path)
+
+def load(backend):
+    """What both apps do at startup: preview first, then the full history."""
+    store = SessionStore()
+    store.extend(backend.recent(PREVIEW_COUNT))
+    store.adopt(backend.load(), len(store))
+    return store
+
+def backend_benchmarks(schema, path, repeat):
+    results = {}
+    results["load"] = measure(lambda _: load(open_history(schema, path)), repeat=repeat)
+
+    def loaded():
+        backend = open_history(schema, path)
+        store = load(backend)
+        clock = FakeClock(store.ends[-1] + 600 if len(store) else 0)
+        return backend, store, FlowtimeEngine(store, clock), clock
+
+    def save(state):
+        backend, store, engine, clock = state
+        engine.start_work("Benchmark")
+        clock.advance(1500)
+        engine.stop_work()
+        backend.save(store)
+
+    def close(state):
+        backend, store = state[:2]
+        backend.close(store)
+
+    results["save_session"] = measure(save, loaded, close, repeat)
+
+    def stats(state):
+        store, clock = state[1], state[3]
+        index = SessionIndex(store) # Cold: the first stats popup indexes everything
+        now = clock.now()
+        index.today(now)
+        index.this_week(now)
+        index.top_tasks()
+        if NUMPY_AVAILABLE and len(store):
+            Analytics.from_store(store).report(now)
+
+    results["stats"] = measure(stats, loaded, close, repeat)
+
+    export_path = os.path.join(os.path.dirname(path), "export.csv")
+    results["export_csv"] = measure(lambda state: export_file(state[1], export_path), loaded, close, repeat)
+    return results
+
+
+# --- Tk front-end ---
+
+class _QuietDialogs:
+    """Stands in for tkinter.messagebox/filedialog so dialogs don't block the run."""
+    def showinfo(self, *args, **kwargs):
+        pass
+    showwarning = showerror = showinfo
+
+    def askyesno(self, *args, **kwargs):
+        return True
+
+    def asksaveasfilename(self, *args, **kwargs):
+        return os.path.abspath("export.csv")
+
+def tk_unavailable():
+    """None if Tk can open a window, otherwise the reason it can't."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.destroy()
+    except Exception as e: # ImportError, or TclError without a display
+        return f"Tk unavailable: {e}"
+    return None
+
+def load_tk_app():
+    spec = importlib.util.spec_from_file_location("flowtime_study_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.messagebox = module.filedialog = _QuietDialogs()
+    return module
+
+def tk_benchmarks(module, directory, repeat):
+    import tkinter as tk
+
+    def start_app(_=None):
+        root = tk.Tk()
+        root.withdraw()
+        app = module.TimeTrackerApp(root)
+        if app.loader is not None:
+            app.loader.wait()
+            app.finish_loading()
+        root.update_idletasks()
+        return app
+
+    def close_app(app):
+        app.on_close()
+
+    def save(app):
+        app.engine.start_work("Benchmark")
+        app.engine.stop_work()
+        app.writer.flush() # Include the background rewrite
+        app.root.update_idletasks()
+
+    def copy(app):
+        app.copy_to_clipboard() # Large histories are exported to a file instead
+        exporter = getattr(app, "exporter", None)
+        if exporter is not None:
+            exporter.wait()
+
+    def redraw(app):
+        app.update_table()
+        app.root.update_idletasks()
+
+    cwd = os.getcwd()
+    os.chdir(directory) # The app opens flowtime_data.json from the working directory
+    try:
+        return {
+            "load_records": measure(start_app, teardown=close_app, repeat=repeat),
+            "save_records": measure(save, start_app, close_app, repeat),
+            "update_table": measure(redraw, start_app, close_app, repeat),
+            "show_total_time": measure(lambda app: app.show_total_time(), start_app, close_app, repeat),
+            "copy_to_clipboard": measure(copy, start_app, close_app, repeat),
+        }
+    finally:
+        os.chdir(cwd)
+
+
+# --- Driver ---
+
+def run(sizes, repeat=3, seed=1, schemas=("study", "v2", "sqlite")):
+    os.environ["FLOWTIME_AUDIO"] = "null"
+    os.environ.pop("FLOWTIME_DB", None)
+    tk_skip = tk_unavailable()
+    tk_module = load_tk_app() if tk_skip is None else None
+
+    results = []
+    for sessions in sizes:
+        directory = tempfile.mkdtemp(prefix="flowtime-bench-")
+        try:
+            for schema in schemas:
+                path = make_history(directory, schema, sessions, seed)
+                for name, result in backend_benchmarks(schema, path, repeat).items():
+                    results.append({"suite": "backend", "name": name, "schema": schema,
+                                    "sessions": sessions, **result})
+                print(f"{schema} x {sessions}: done", file=sys.stderr)
+
+            names = ["load_records", "save_records", "update_table", "show_total_time", "copy_to_clipboard"]
+            if tk_module is None:
+                tk_results = {name: {"skipped": tk_skip} for name in names}
+            else:
+                make_history(directory, "study", sessions, seed) # Fresh copy, the saves above grew it
+                tk_results = tk_benchmarks(tk_module, directory, repeat)
+            for name, result in tk_results.items():
+                results.append({"suite": "tk", "name": name, "schema": "study",
+                                "sessions": sessions, **result})
+            results.extend(startup_benchmarks(directory, sessions, repeat, seed))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": NUMPY_AVAILABLE,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flowtime benchmarks (JSON on stdout)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="history sizes in sessions (1000 to 10000000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--schemas", nargs="+", choices=sorted(FILES), default=["study", "v2", "sqlite"])
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat, args.seed, args.schemas)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Startup cost of both apps, each measured in a fresh interpreter.
+
+    import        time to import the app module, and which deferred modules
+                  (NumPy, analytics, audio backends, sync) it pulled in anyway
+    first_frame   wall time from launch until the window has been drawn
+                  (FLOWTIME_FIRST_FRAME=1 makes the app report it and quit)
+
+first_frame needs a display for Tk and an installed Kivy for main.py;
+without them those entries are reported as skipped. As a regression check:
+
+    python -m benchmarks.startup --sessions 100000 --budget-ms 500
+
+exits with status 1 if a median exceeds the budget or a deferred module
+was imported at startup.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import write_history
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = {
+    "tk": ("Flowtime-Study.py", "flowtime_data.json", "study"),
+    "kivy": ("main.py", "flowtime_v2.json", "v2"),
+}
+DEFERRED = ("numpy", "miniaudio", "flowtime.analytics", "flowtime.archive", "flowtime.audio",
+            "flowtime.sync", "kivy.core.audio")
+TIMEOUT = 60
+
+_IMPORT_PROBE = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("flowtime_app", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+elapsed = time.perf_counter() - start
+print(json.dumps({"ms": elapsed * 1000, "eager": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    env["FLOWTIME_AUDIO"] = "null"
+    env["KIVY_NO_ARGS"] = "1"
+    env.pop("FLOWTIME_DB", None)
+    env.pop("FLOWTIME_SYNC", None)
+    return env
+
+def probe_import(app):
+    """(milliseconds, eagerly imported deferred modules), or raises RuntimeError."""
+    script = os.path.join(ROOT, APPS[app][0])
+    result = subprocess.run([sys.executable, "-c", _IMPORT_PROBE, script, *DEFERRED],
+                            capture_output=True, text=True, env=_env(), timeout=TIMEOUT)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    return data["ms"], data["eager"]
+
+def probe_first_frame(app, directory):
+    """Wall milliseconds from launch to the app's "first-frame" line."""
+    env = _env()
+    env["FLOWTIME_FIRST_FRAME"] = "1"
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, APPS[app][0])], cwd=directory, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        for line in proc.stdout:
+            if line.startswith("first-frame"):
+                return (time.perf_counter() - start) * 1000
+        proc.wait(TIMEOUT)
+        error = proc.stderr.read().strip().splitlines()
+        raise RuntimeError(error[-1] if error else "exited before drawing a frame")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+def _timed(probe, repeat):
+    times = [probe() for _ in range(repeat)]
+    return {"best": min(times), "median": statistics.median(times), "runs": repeat}
+
+def startup_benchmarks(directory, sessions, repeat=3, seed=1):
+    """Result entries for both apps, with histories of `sessions` written to `directory`."""
+    results = []
+    for app, (_, data_file, schema) in APPS.items():
+        entry = {"suite": "startup", "app": app, "sessions": sessions}
+        try:
+            eager = []
+            def probe():
+                ms, found = probe_import(app)
+                eager[:] = found
+                return ms
+            results.append({**entry, "name": "import", **_timed(probe, repeat), "eager_modules": eager})
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            results.append({**entry, "name": "import", "skipped": str(e)})
+            results.append({**entry, "name": "first_frame", "skipped": "app does not import here"})
+            continue
+
+        write_history(os.path.join(directory, data_file), sessions, schema, seed)
+        try:
+            results.append({**entry, "name": "first_frame",
+                            **_timed(lambda: probe_first_frame(app, directory), repeat)})
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            results.append({**entry, "name": "first_frame", "skipped": str(e)})
+    return results
+
+def check(results, budget_ms=None):
+    """Problems found in startup results: over budget, or deferred modules loaded."""
+    problems = []
+    for r in results:
+        if r.get("eager_modules"):
+            problems.append(f"{r['app']}: imported at startup: {', '.join(r['eager_modules'])}")
+        if budget_ms is not None and "median" in r and r["median"] > budget_ms:
+            problems.append(f"{r['app']} {r['name']}: {r['median']:.0f} ms > {budget_ms} ms")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flowtime startup benchmark")
+    parser.add_argument("--sessions", type=int, default=10000, help="history size to start with")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, help="fail if a median is slower than this")
+    args = parser.parse_args(argv)
+
+    directory = tempfile.mkdtemp(prefix="flowtime-startup-")
+    try:
+        results = startup_benchmarks(directory, args.sessions, args.repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+    problems = check(results, args.budget_ms)
+    for problem in problems:
+        print(f"FAIL {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
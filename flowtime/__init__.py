@@ -0,0 +1 @@
+"""Shared building blocks for the Flowtime Tk and Kivy front-ends."""
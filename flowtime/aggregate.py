@@ -0,0 +1,169 @@
+"""
+Team totals across many users' history files.
+
+Each file is parsed and rolled up in a worker process (the same backends
+and record parsing the apps use), and only the small partial rollups come
+back to be merged: total focus and break time, time per task and a daily
+histogram. Directories are searched for the apps' history files; older
+months rolled into segments (flowtime.tiers) are counted from their
+headers.
+
+    python -m flowtime.aggregate --workers 8 --output team.json group/
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from flowtime.index import DAY
+from flowtime.records import civil_from_days
+from flowtime.storage import open_history
+from flowtime.tiers import TieredHistory, segments_dir
+
+HISTORY_NAMES = ("flowtime_data.json", "flowtime_v2.json", "flowtime.db")
+JOURNAL_NAME = "flowtime_v2.journal"
+
+
+class Rollup:
+    """Mergeable totals. Small and picklable, so workers can send it back."""
+    def __init__(self):
+        self.users = 0
+        self.sessions = 0
+        self.work = 0
+        self.breaks = 0
+        self.tasks = Counter() # Task name -> focus seconds
+        self.days = Counter() # Local day number -> focus seconds
+
+    def add_store(self, store):
+        self.users += 1
+        self.sessions += len(store)
+        self.work += store.total_work
+        self.breaks += store.total_break
+
+        per_task = [0] * len(store.task_names)
+        days = self.days
+        for start, work, task_id in zip(store.starts, store.work, store.task_ids):
+            per_task[task_id] += work
+            if start >= DAY: # Old v2 records without a date stay out of the histogram
+                days[start // DAY] += work
+        for name, seconds in zip(store.task_names, per_task):
+            self.tasks[name] += seconds
+
+    def add_tiers(self, tiers):
+        """The same user's cold tier, from the segment headers alone."""
+        self.sessions += len(tiers)
+        self.work += tiers.total_work
+        self.breaks += tiers.total_break
+        self.tasks.update(tiers.task_totals())
+        self.days.update({day: seconds for day, seconds in tiers.daily().items() if day > 0})
+
+    def merge(self, other):
+        self.users += other.users
+        self.sessions += other.sessions
+        self.work += other.work
+        self.breaks += other.breaks
+        self.tasks.update(other.tasks)
+        self.days.update(other.days)
+        return self
+
+    def to_dict(self, top=None):
+        def date(day):
+            y, m, d = civil_from_days(day)
+            return f"{y:04}-{m:02}-{d:02}"
+        return {
+            "users": self.users,
+            "sessions": self.sessions,
+            "work_sec": self.work,
+            "break_sec": self.breaks,
+            "tasks": dict(self.tasks.most_common(top)),
+            "daily": {date(day): self.days[day] for day in sorted(self.days)},
+        }
+
+
+def summarize(path):
+    """Worker: (path, Rollup or None, error message or None)."""
+    try:
+        store = open_history(path, read_only=True).load()
+    except Exception as e: # One broken file must not sink the whole run
+        return path, None, f"{type(e).__name__}: {e}"
+    rollup = Rollup()
+    rollup.add_store(store)
+    if os.path.isdir(segments_dir(path)):
+        rollup.add_tiers(TieredHistory(path))
+    return path, rollup, None
+
+def find_histories(paths):
+    """Expands directories into the history files inside them."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for folder, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name in HISTORY_NAMES:
+                    yield os.path.join(folder, name)
+                elif name == JOURNAL_NAME and "flowtime_v2.json" not in files:
+                    # Never compacted yet: the whole history is in the journal
+                    yield os.path.join(folder, "flowtime_v2.json")
+
+def aggregate(paths, workers=None, per_user=False):
+    """Rolls up every file in parallel. Returns (total, {path: Rollup}, {path: error})."""
+    paths = list(find_histories(paths))
+    workers = workers or os.cpu_count() or 1
+    total = Rollup()
+    users = {}
+    errors = {}
+    if not paths:
+        return total, users, errors
+
+    # Batch files per task so thousands of small ones don't drown in IPC overhead
+    chunksize = max(1, len(paths) // (workers * 4))
+    if workers == 1:
+        results = map(summarize, paths)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(summarize, paths, chunksize=chunksize)
+    try:
+        for path, rollup, error in results:
+            if error is not None:
+                errors[path] = error
+                continue
+            total.merge(rollup)
+            if per_user:
+                users[path] = rollup
+    finally:
+        if workers != 1:
+            pool.shutdown()
+    return total, users, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate Flowtime histories from many users")
+    parser.add_argument("--workers", type=int, help="processes to use (default: one per core)")
+    parser.add_argument("--top", type=int, help="only list the N biggest tasks")
+    parser.add_argument("--per-user", action="store_true", help="include each file's own totals")
+    parser.add_argument("--output", default="-", help="JSON report path (default: stdout)")
+    parser.add_argument("paths", nargs="+", help="history files or directories to search")
+    args = parser.parse_args(argv)
+
+    total, users, errors = aggregate(args.paths, args.workers, args.per_user)
+    report = total.to_dict(args.top)
+    if args.per_user:
+        report["per_user"] = {path: rollup.to_dict(args.top) for path, rollup in users.items()}
+    if errors:
+        report["errors"] = errors
+        for path, error in errors.items():
+            print(f"{path}: {error}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+if __name__ == "__main__":
+    main()
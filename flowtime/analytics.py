@@ -0,0 +1,166 @@
+"""
+Vectorized focus/break trend reports.
+
+NumPy is optional: callers check NUMPY_AVAILABLE and skip the trend section
+when it is missing, the same way the Tk app treats playsound.
+
+A tiered history's older months (flowtime.tiers) are folded in from their
+segment headers: session count, totals and focus per day are all the
+reports need besides the recent sessions themselves.
+"""
+from flowtime.archive import EXTENSION, Archive
+from flowtime.index import DAY
+from flowtime.records import NO_BREAK, format_duration, load_rows
+from flowtime.store import SessionStore
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+
+class Analytics:
+    """Daily/weekly rollups, rolling focus length, ratios and streaks over NumPy columns."""
+    def __init__(self, starts, work, breaks):
+        self.starts = starts
+        self.work = work
+        self.breaks = breaks
+
+        # Old v2 records without a date sit on day 0; keep them out of calendar rollups
+        dated = starts >= DAY
+        self.days = starts[dated] // DAY
+        self.day_work = work[dated]
+
+        # Cold tier totals (add_tiers)
+        self.cold_sessions = 0
+        self.cold_work = 0
+        self.cold_break = 0
+
+    @classmethod
+    def from_store(cls, store, tiers=None):
+        """Over the hot store, plus the cold tier if `tiers` is given."""
+        # Copy out of the array module buffers so the store can keep growing
+        def column(values):
+            return np.frombuffer(values, dtype=np.int64).copy() if len(values) else np.zeros(0, np.int64)
+        analytics = cls(column(store.starts), column(store.work), column(store.breaks))
+        if tiers is not None:
+            analytics.add_tiers(tiers)
+        return analytics
+
+    def add_tiers(self, tiers):
+        """Folds in the older months of a TieredHistory; no segment is decompressed."""
+        daily = tiers.daily()
+        days = np.fromiter(daily.keys(), np.int64, len(daily))
+        seconds = np.fromiter(daily.values(), np.int64, len(daily))
+        dated = days > 0
+        self.days = np.concatenate((days[dated], self.days))
+        self.day_work = np.concatenate((seconds[dated], self.day_work))
+        self.cold_sessions += len(tiers)
+        self.cold_work += tiers.total_work
+        self.cold_break += tiers.total_break
+
+    @classmethod
+    def from_archive(cls, archive):
+        """Straight over the archive's mapped columns; nothing is parsed or copied."""
+        return cls(archive.starts, archive.work, archive.breaks)
+
+    @classmethod
+    def from_file(cls, path):
+        """Reads flowtime_data.json, flowtime_v2.json or a binary archive."""
+        if path.endswith(EXTENSION):
+            return cls.from_archive(Archive(path))
+        store = SessionStore()
+        store.extend(load_rows(path))
+        return cls.from_store(store)
+
+    # --- Rollups ---
+
+    def daily_totals(self):
+        """(first_day, seconds per day) with one slot per calendar day."""
+        if not len(self.days):
+            return 0, np.zeros(0, np.int64)
+        first = int(self.days.min())
+        totals = np.bincount(self.days - first, weights=self.day_work)
+        return first, totals.astype(np.int64)
+
+    def weekly_totals(self):
+        """(first_week_start_day, seconds per Monday-based week)."""
+        if not len(self.days):
+            return 0, np.zeros(0, np.int64)
+        weeks = (self.days - (self.days + 3) % 7) // 7
+        first = int(weeks.min())
+        totals = np.bincount(weeks - first, weights=self.day_work)
+        return first * 7, totals.astype(np.int64)
+
+    def rolling_focus(self, window=10):
+        """Mean focus length over each run of `window` consecutive (hot) sessions."""
+        if len(self.work) < window:
+            return np.zeros(0)
+        sums = np.cumsum(self.work, dtype=np.float64)
+        sums[window:] = sums[window:] - sums[:-window]
+        return sums[window - 1:] / window
+
+    def focus_break_ratio(self):
+        measured = self.breaks[self.breaks != NO_BREAK]
+        total_break = int(measured.sum()) + self.cold_break
+        if not total_break:
+            return None
+        return (int(self.work.sum()) + self.cold_work) / total_break
+
+    def streaks(self, today):
+        """(current, longest) runs of consecutive days with any focus time."""
+        first, totals = self.daily_totals()
+        if not len(totals):
+            return 0, 0
+        active = np.concatenate(([0], (totals > 0).astype(np.int8), [0]))
+        edges = np.diff(active)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        lengths = ends - starts
+        longest = int(lengths.max()) if len(lengths) else 0
+
+        # The current streak may end today or yesterday (today not started yet)
+        last_active = first + int(ends[-1]) - 1 if len(ends) else None
+        current = int(lengths[-1]) if last_active is not None and today - last_active <= 1 else 0
+        return current, longest
+
+    def trend(self, today, days=7):
+        """(focus in the last `days` days, focus in the `days` before that)."""
+        recent = self.day_work[(self.days > today - days) & (self.days <= today)].sum()
+        previous = self.day_work[(self.days > today - 2 * days) & (self.days <= today - days)].sum()
+        return int(recent), int(previous)
+
+    def report(self, now):
+        today = now // DAY
+        rolling = self.rolling_focus()
+        recent, previous = self.trend(today)
+        current, longest = self.streaks(today)
+        sessions = int(len(self.work)) + self.cold_sessions
+        return {
+            "sessions": sessions,
+            "avg_focus": (int(self.work.sum()) + self.cold_work) // sessions if sessions else 0,
+            "recent_avg_focus": int(rolling[-1]) if len(rolling) else None,
+            "focus_break_ratio": self.focus_break_ratio(),
+            "last_7_days": recent,
+            "previous_7_days": previous,
+            "current_streak": current,
+            "longest_streak": longest,
+        }
+
+
+def format_report(report):
+    """Short multi-line summary used by both stats views."""
+    lines = [f"Average Focus: {format_duration(report['avg_focus'])}"]
+    if report['recent_avg_focus'] is not None:
+        lines.append(f"Last 10 Sessions: {format_duration(report['recent_avg_focus'])}")
+    if report['focus_break_ratio'] is not None:
+        lines.append(f"Focus/Break Ratio: {report['focus_break_ratio']:.2f}")
+
+    recent, previous = report['last_7_days'], report['previous_7_days']
+    if previous and recent > previous:
+        lines.append("Your study time is increasing!")
+    elif previous and recent < previous:
+        lines.append("Study time is down from last week")
+    lines.append(f"Streak: {report['current_streak']} days (best {report['longest_streak']})")
+    return "\n".join(lines)
@@ -0,0 +1,234 @@
+"""
+Fixed-width binary session archive (.ftarc).
+
+Layout, all little-endian:
+    header   32 bytes: magic "FLOWARC1", version u16, record size u16,
+             reserved u32, session count u64, task count u64
+    records  count x 40 bytes: start, end, work, break, task id (i64 each)
+    tasks    task count x (u32 byte length + UTF-8 name)
+
+Times are local epoch seconds like everywhere else (see flowtime.records)
+and a pending break is NO_BREAK. Nothing needs parsing: an Archive maps the
+file and hands out NumPy views straight onto the mapped pages, so opening
+a multi-million-session archive costs a header read and analytics pay
+only for the pages they touch.
+
+    python -m flowtime.archive convert flowtime_data.json history.ftarc
+    python -m flowtime.archive info history.ftarc
+"""
+import argparse
+import mmap
+import os
+import struct
+from array import array
+
+from flowtime.storage import open_history
+from flowtime.store import SessionStore
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+MAGIC = b"FLOWARC1"
+VERSION = 1
+HEADER = struct.Struct("<8sHHIQQ")
+RECORD = struct.Struct("<qqqqq") # start, end, work, break, task id
+NAME_LENGTH = struct.Struct("<I")
+FIELDS = ("start", "end", "work", "brk", "task")
+EXTENSION = ".ftarc"
+WRITE_BATCH = 65536 # Records packed per write when NumPy is missing
+
+if NUMPY_AVAILABLE:
+    RECORD_DTYPE = np.dtype([(name, "<i8") for name in FIELDS])
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+# --- Writing ---
+
+def write_archive(path, store):
+    """Writes `store` as an archive, via a temp file + rename like atomic_write."""
+    tmp_path = path + ".tmp"
+    count = len(store)
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0, count, len(store.task_names)))
+        if NUMPY_AVAILABLE:
+            records = np.empty(count, dtype=RECORD_DTYPE)
+            for name, column in zip(FIELDS, (store.starts, store.ends, store.work, store.breaks)):
+                if count:
+                    records[name] = np.frombuffer(column, dtype=np.int64)
+            records["task"] = store.task_ids
+            f.write(records.tobytes())
+        else:
+            for lo in range(0, count, WRITE_BATCH):
+                hi = min(count, lo + WRITE_BATCH)
+                buf = bytearray(RECORD.size * (hi - lo))
+                for n, i in enumerate(range(lo, hi)):
+                    RECORD.pack_into(buf, n * RECORD.size, store.starts[i], store.ends[i],
+                                     store.work[i], store.breaks[i], store.task_ids[i])
+                f.write(buf)
+        for name in store.task_names:
+            data = name.encode("utf-8")
+            f.write(NAME_LENGTH.pack(len(data)))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def convert(source, path):
+    """Archives a history in either JSON layout (or a SQLite history). Returns the count."""
+    store = open_history(source, read_only=True).load()
+    write_archive(path, store)
+    return len(store)
+
+
+# --- Reading ---
+
+class Archive:
+    """
+    Read-only, memory-mapped view of an archive.
+
+    `records` and the column properties are NumPy views onto the mapping,
+    not copies; they stay valid until close(). Without NumPy, `row(i)` and
+    `to_store()` still work through struct.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # Empty file
+            self._file.close()
+            raise ArchiveError(f"{path}: not a Flowtime archive")
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ArchiveError(f"{path}: not a Flowtime archive")
+        magic, self.version, record_size, _, self.count, self.task_count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ArchiveError(f"{path}: not a Flowtime archive")
+        if self.version > VERSION:
+            self.close()
+            raise ArchiveError(f"{path}: archive version {self.version} is newer than this reader")
+        self.names_offset = HEADER.size + self.count * RECORD.size
+        if self.names_offset > len(self._map):
+            self.close()
+            raise ArchiveError(f"{path}: truncated archive")
+
+        self._records = None
+        self._task_names = None
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def task_names(self):
+        """Decoded on first use; the string table is tiny next to the records."""
+        if self._task_names is None:
+            names = []
+            pos = self.names_offset
+            for _ in range(self.task_count):
+                (length,) = NAME_LENGTH.unpack_from(self._map, pos)
+                pos += NAME_LENGTH.size
+                names.append(self._map[pos:pos + length].decode("utf-8"))
+                pos += length
+            self._task_names = names
+        return self._task_names
+
+    @property
+    def records(self):
+        """Structured array over the mapped records (zero-copy)."""
+        if self._records is None:
+            self._records = np.frombuffer(self._map, dtype=RECORD_DTYPE, count=self.count, offset=HEADER.size)
+        return self._records
+
+    @property
+    def starts(self):
+        return self.records["start"]
+
+    @property
+    def ends(self):
+        return self.records["end"]
+
+    @property
+    def work(self):
+        return self.records["work"]
+
+    @property
+    def breaks(self):
+        return self.records["brk"]
+
+    @property
+    def task_ids(self):
+        return self.records["task"]
+
+    def row(self, i):
+        """(task, start, end, work, break), like SessionStore.row()."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        start, end, work, brk, task_id = RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+        return (self.task_names[task_id], start, end, work, brk)
+
+    def to_store(self):
+        """Copies the archive into a SessionStore (for the apps, which need to append)."""
+        store = SessionStore()
+        for name in self.task_names:
+            store.intern_task(name)
+        if NUMPY_AVAILABLE:
+            records = self.records
+            store.starts = array('q', records["start"].tobytes())
+            store.ends = array('q', records["end"].tobytes())
+            store.work = array('q', records["work"].tobytes())
+            store.breaks = array('q', records["brk"].tobytes())
+            store.task_ids = array('l', records["task"].astype(np.dtype('l')).tobytes())
+            counts = np.bincount(records["task"], minlength=self.task_count) if self.count else np.zeros(self.task_count)
+            store.tasks.uses = array('q', counts.astype(np.int64).tobytes())
+            store.total_work = int(records["work"].sum())
+            breaks = records["brk"]
+            store.total_break = int(breaks[breaks >= 0].sum())
+        else:
+            for start, end, work, brk, task_id in RECORD.iter_unpack(self._map[HEADER.size:self.names_offset]):
+                store.append(self.task_names[task_id], start, end, work, brk)
+        return store
+
+    def close(self):
+        self._records = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass # A caller still holds a view; the mapping is freed with it
+        self._file.close()
+
+
+# --- Command line ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flowtime binary archives")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cmd = commands.add_parser("convert", help="archive a JSON or SQLite history")
+    cmd.add_argument("source")
+    cmd.add_argument("archive")
+    cmd = commands.add_parser("info", help="show an archive's header")
+    cmd.add_argument("archive")
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        count = convert(args.source, args.archive)
+        print(f"Archived {count} sessions into {args.archive}")
+    elif args.command == "info":
+        with Archive(args.archive) as archive:
+            print(f"{args.archive}: {len(archive)} sessions, {archive.task_count} tasks, version {archive.version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+Alarm playback.
+
+The alarm sound is decoded once into a PCM `Clip` and played by a single
+long-lived worker thread that sleeps on a threading.Event until the alarm
+rings. Stopping sets another Event and interrupts the sink, so the sound
+stops within a few milliseconds instead of after the current loop.
+
+Sinks are what actually make noise; pick one with FLOWTIME_AUDIO:
+    null        play nothing (headless runs and tests)
+    wav:<path>  write the clip to a WAV file instead of playing it
+Otherwise miniaudio is used if installed. Without it only WAV files can be
+decoded, so other files (the MP3 alarm) are handed to playsound if that is
+installed; playsound cannot be interrupted, so stopping takes effect after
+the current play. Failing both, winsound on Windows, then the terminal bell.
+"""
+import io
+import math
+import os
+import struct
+import sys
+import threading
+import wave
+
+try:
+    import miniaudio
+    MINIAUDIO_AVAILABLE = True
+except ImportError:
+    MINIAUDIO_AVAILABLE = False
+
+try:
+    from playsound import playsound
+    PLAYSOUND_AVAILABLE = True
+except ImportError:
+    PLAYSOUND_AVAILABLE = False
+
+REPEAT_GAP = 1.0 # Seconds of silence between repeats
+
+
+class Clip:
+    """Decoded signed 16-bit PCM. `source` is the file it stands in for if that could not be decoded."""
+    def __init__(self, pcm, rate, channels, source=None):
+        self.pcm = pcm
+        self.rate = rate
+        self.channels = channels
+        self.source = source
+        self._wav = None
+
+    @property
+    def duration(self):
+        return len(self.pcm) / (2 * self.channels * self.rate)
+
+    def wav_bytes(self):
+        if self._wav is None:
+            buf = io.BytesIO()
+            with wave.open(buf, "wb") as w:
+                w.setnchannels(self.channels)
+                w.setsampwidth(2)
+                w.setframerate(self.rate)
+                w.writeframes(self.pcm)
+            self._wav = buf.getvalue()
+        return self._wav
+
+
+def beep_clip(freq=1000, seconds=0.5, rate=22050):
+    """The old winsound.Beep(1000, 500) fallback, as PCM."""
+    frames = int(seconds * rate)
+    samples = (int(12000 * math.sin(2 * math.pi * freq * i / rate)) for i in range(frames))
+    return Clip(struct.pack(f"<{frames}h", *samples), rate, 1)
+
+def load_clip(path):
+    """
+    Decodes `path` once. Falls back to a beep if it is missing or undecodable;
+    the beep keeps `path` as its source so PlaysoundSink can still play the file.
+    """
+    try:
+        if path.lower().endswith(".wav"):
+            with wave.open(path, "rb") as w:
+                if w.getsampwidth() == 2:
+                    return Clip(w.readframes(w.getnframes()), w.getframerate(), w.getnchannels())
+        elif MINIAUDIO_AVAILABLE:
+            decoded = miniaudio.decode_file(path, output_format=miniaudio.SampleFormat.SIGNED16)
+            return Clip(decoded.samples.tobytes(), decoded.sample_rate, decoded.nchannels)
+    except Exception as e: # Decoders raise their own error types
+        print(f"Sound Error: {e}")
+    clip = beep_clip()
+    if os.path.exists(path):
+        clip.source = path
+    return clip
+
+
+# --- Sinks ---
+
+class NullSink:
+    """Plays nothing, but takes as long as the clip would. Counts plays for tests."""
+    def __init__(self):
+        self.plays = 0
+
+    def play(self, clip, quiet):
+        self.plays += 1
+        quiet.wait(clip.duration)
+
+    def stop(self):
+        pass
+
+class WavFileSink(NullSink):
+    """Writes the clip to a WAV file each time it "plays"."""
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def play(self, clip, quiet):
+        with open(self.path, "wb") as f:
+            f.write(clip.wav_bytes())
+        super().play(clip, quiet)
+
+class BellSink(NullSink):
+    def play(self, clip, quiet):
+        print("\a", end="", flush=True)
+        super().play(clip, quiet)
+
+class WinsoundSink:
+    def play(self, clip, quiet):
+        import winsound
+        winsound.PlaySound(clip.wav_bytes(), winsound.SND_MEMORY) # Blocks; stop() cuts it short
+
+    def stop(self):
+        import winsound
+        winsound.PlaySound(None, 0)
+
+class MiniaudioSink:
+    """Streams the cached PCM to the sound card, checking `quiet` every buffer."""
+    def play(self, clip, quiet):
+        frame_bytes = 2 * clip.channels
+        done = threading.Event()
+
+        def stream():
+            pos = 0
+            frames = yield b""
+            while pos < len(clip.pcm) and not quiet.is_set():
+                chunk = clip.pcm[pos:pos + frames * frame_bytes]
+                pos += len(chunk)
+                frames = yield chunk
+            done.set()
+
+        device = miniaudio.PlaybackDevice(output_format=miniaudio.SampleFormat.SIGNED16,
+                                          nchannels=clip.channels, sample_rate=clip.rate)
+        try:
+            generator = stream()
+            next(generator)
+            device.start(generator)
+            while not done.wait(0.02) and not quiet.is_set():
+                pass
+        finally:
+            device.close()
+
+    def stop(self):
+        pass # play() watches `quiet` itself
+
+class PlaysoundSink:
+    """Plays the undecoded file itself; anything else goes to `fallback`."""
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    def play(self, clip, quiet):
+        if clip.source is None:
+            self.fallback.play(clip, quiet)
+        else:
+            playsound(clip.source, block=True) # Blocks; stop() cannot cut it short
+
+    def stop(self):
+        self.fallback.stop()
+
+def default_sink():
+    choice = os.environ.get("FLOWTIME_AUDIO", "")
+    if choice == "null":
+        return NullSink()
+    if choice.startswith("wav:"):
+        return WavFileSink(choice[4:])
+    if MINIAUDIO_AVAILABLE:
+        return MiniaudioSink()
+    fallback = WinsoundSink() if sys.platform == "win32" else BellSink()
+    if PLAYSOUND_AVAILABLE:
+        return PlaysoundSink(fallback)
+    return fallback
+
+
+class AlarmPlayer:
+    """
+    One worker thread that loops the alarm clip while ringing.
+    `start()`/`stop()` are cheap and safe to call from the UI thread.
+    """
+    def __init__(self, path, sink=None, gap=REPEAT_GAP):
+        self.path = path
+        self.sink = sink or default_sink()
+        self.gap = gap
+        self.clip = None # Decoded on the worker the first time the alarm rings
+
+        self._ring = threading.Event()
+        self._quiet = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def ringing(self):
+        return self._ring.is_set()
+
+    def start(self):
+        self._quiet.clear()
+        self._ring.set()
+
+    def stop(self):
+        self._ring.clear()
+        self._quiet.set()
+        self.sink.stop()
+
+    def close(self):
+        self._closed = True
+        self.stop()
+        self._ring.set() # Wake the worker so it can exit
+        self._thread.join(timeout=1)
+
+    def _run(self):
+        while True:
+            self._ring.wait()
+            if self._closed:
+                return
+            if self.clip is None:
+                self.clip = load_clip(self.path)
+            while self._ring.is_set() and not self._closed:
+                try:
+                    self.sink.play(self.clip, self._quiet)
+                except Exception as e:
+                    print(f"Sound Error: {e}")
+                    self.sink = BellSink()
+                if self._quiet.wait(self.gap):
+                    break
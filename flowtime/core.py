@@ -0,0 +1,185 @@
+"""
+UI-independent session engine.
+
+Both front-ends drive a FlowtimeEngine and subscribe to its events instead
+of keeping their own IDLE/WORKING/BREAK bookkeeping. The clock is
+injectable, so the engine runs headless: FakeClock lets tests and
+benchmarks push thousands of simulated sessions through in a blink.
+
+Events are delivered as callback(event, data):
+    WORK_STARTED    task name
+    SESSION_SAVED   index of the new record in the store
+    BREAK_MEASURED  index of the record whose break was just measured
+    BREAK_STARTED   break length in seconds
+    BREAK_EXPIRED   None
+    BREAK_ENDED     True if it was cut short by starting new work
+"""
+import time
+from datetime import datetime
+
+from flowtime.records import to_epoch
+from flowtime.store import EDIT_DELETE, EDIT_INSERT
+from flowtime.timer import MonotonicTimer
+
+IDLE = 'IDLE'
+WORKING = 'WORKING'
+BREAK = 'BREAK'
+ALARM = 'ALARM' # Break time is up and the alarm is ringing
+
+WORK_STARTED = 'work_started'
+SESSION_SAVED = 'session_saved'
+BREAK_MEASURED = 'break_measured'
+BREAK_STARTED = 'break_started'
+BREAK_EXPIRED = 'break_expired'
+BREAK_ENDED = 'break_ended'
+
+
+class SystemClock:
+    def now(self):
+        """Wall clock as local epoch seconds (see flowtime.records)."""
+        return to_epoch(datetime.now())
+
+    def monotonic(self):
+        return time.monotonic()
+
+class FakeClock:
+    """Manually advanced clock for headless tests and benchmarks."""
+    def __init__(self, start=0):
+        self.wall = start
+        self.mono = 0.0
+
+    def now(self):
+        return int(self.wall)
+
+    def monotonic(self):
+        return self.mono
+
+    def advance(self, seconds):
+        self.wall += seconds
+        self.mono += seconds
+
+
+class FlowtimeEngine:
+    """
+    IDLE -> WORKING -> IDLE -> BREAK -> ALARM -> IDLE state machine over a SessionStore.
+
+    A record's break is the real gap until the next focus session starts,
+    never the length picked for the break: the break advisor learns from
+    these, so storing its own suggestions would only feed them back.
+    """
+    def __init__(self, store, clock=None):
+        self.store = store
+        self.clock = clock or SystemClock()
+
+        self.state = IDLE
+        self.task = None
+        self.start_ts = None
+        self.last_index = None # Record saved by the latest stop_work()
+        self._last_column = None # store.starts when last_index was set; clear() and adopt() replace it
+        self._edits = 0 # store.edits already followed by last_index
+        self.focus_timer = MonotonicTimer(self.clock.monotonic)
+        self.break_timer = MonotonicTimer(self.clock.monotonic)
+        self._listeners = []
+
+    def subscribe(self, callback):
+        self._listeners.append(callback)
+
+    def _emit(self, event, data=None):
+        for callback in self._listeners:
+            callback(event, data)
+
+    @property
+    def working(self):
+        return self.state == WORKING
+
+    @property
+    def on_break(self):
+        return self.state in (BREAK, ALARM)
+
+    def pending_index(self):
+        """
+        Record whose break the next start_work() measures: the one this
+        engine saved last, or the newest record if it has not saved any yet
+        (or the store was cleared or reloaded since).
+        """
+        if self.last_index is not None and self._last_column is self.store.starts:
+            self._follow_edits()
+        if self.last_index is not None and self._last_column is self.store.starts:
+            return self.last_index
+        return len(self.store) - 1
+
+    def pin_pending(self):
+        """Keeps pending_index() on the current newest record while others are added (sync)."""
+        if len(self.store):
+            self._remember(self.pending_index())
+
+    def _remember(self, index):
+        self.last_index = index
+        self._last_column = self.store.starts
+        self._edits = len(self.store.edits)
+
+    def _follow_edits(self):
+        """Shifts last_index past sessions inserted or deleted before it since it was set."""
+        edits = self.store.edits
+        for kind, i, _old, _new in edits[self._edits:]:
+            if kind == EDIT_INSERT and i <= self.last_index:
+                self.last_index += 1
+            elif kind == EDIT_DELETE and i < self.last_index:
+                self.last_index -= 1
+            elif kind == EDIT_DELETE and i == self.last_index:
+                self.last_index = None # Deleted: fall back to the newest record
+                break
+        self._edits = len(edits)
+
+    # --- Transitions ---
+
+    def start_work(self, task):
+        if self.state == WORKING:
+            return
+        if self.on_break:
+            self._finish_break(interrupted=True)
+
+        now = self.clock.now()
+        if len(self.store):
+            # Break = new focus start - end of the previous task
+            last = self.pending_index()
+            self.store.set_break(last, now - self.store.ends[last])
+            self._emit(BREAK_MEASURED, last)
+
+        self.state = WORKING
+        self.task = task
+        self.start_ts = now
+        self.focus_timer.start()
+        self._emit(WORK_STARTED, task)
+
+    def stop_work(self):
+        """Ends the focus session and saves it. Returns the new record index."""
+        if self.state != WORKING:
+            return None
+        work = int(self.focus_timer.elapsed())
+        self.focus_timer.stop()
+        self.state = IDLE
+        self._remember(self.store.append(self.task, self.start_ts, self.clock.now(), work))
+        self._emit(SESSION_SAVED, self.last_index)
+        return self.last_index
+
+    def start_break(self, seconds):
+        self.state = BREAK
+        self.break_timer.start(seconds)
+        self._emit(BREAK_STARTED, seconds)
+        self.tick() # A zero-length break rings straight away
+
+    def tick(self):
+        """Called from the UI's timer; moves an expired break to ALARM."""
+        if self.state == BREAK and self.break_timer.expired():
+            self.state = ALARM
+            self._emit(BREAK_EXPIRED)
+
+    def end_break(self):
+        if self.on_break:
+            self._finish_break(interrupted=False)
+
+    def _finish_break(self, interrupted):
+        self.break_timer.stop()
+        self.state = IDLE
+        self._emit(BREAK_ENDED, interrupted)
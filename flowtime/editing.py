@@ -0,0 +1,164 @@
+"""
+Editing recorded sessions: rename, retime, merge, split, delete and bulk
+re-tag, with undo.
+
+Every operation is a handful of SessionStore.replace/insert/delete calls,
+which land in `store.edits`; the index, the break advisor, the storage
+backends and sync catch up from there, touching only the changed rows.
+Each operation returns the edits it made, as (kind, index, old row, new
+row), so a front-end can update just those rows on screen too.
+
+Retiming keeps measured breaks consistent: a neighbour's break that was
+the real gap to this session is re-measured against the new times.
+"""
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, EDIT_SET
+
+UNDO_LIMIT = 100 # Operations that can be undone
+
+
+class Editor:
+    def __init__(self, store, limit=UNDO_LIMIT):
+        self.store = store
+        self.limit = limit
+        self.history = [] # Per operation: the store edits it made
+        self._edits = len(store.edits)
+        self._column_ref = store.starts
+
+    @property
+    def can_undo(self):
+        self._check()
+        return bool(self.history)
+
+    def _check(self):
+        """Forgets the undo history once the store was reset or changed by someone else (sync)."""
+        store = self.store
+        if store.starts is not self._column_ref or len(store.edits) != self._edits:
+            self.history = []
+            self._edits = len(store.edits)
+            self._column_ref = store.starts
+
+    def _begin(self):
+        self._check()
+        return len(self.store.edits)
+
+    def _commit(self, position, undoable=True):
+        made = self.store.edits[position:]
+        if made and undoable:
+            self.history.append(made)
+            del self.history[:-self.limit]
+        self._edits = len(self.store.edits)
+        return made
+
+    def _index(self, i):
+        if not 0 <= i < len(self.store):
+            raise ValueError(f"No session {i}")
+        return i
+
+    def _task(self, task):
+        task = task.strip()
+        if not task:
+            raise ValueError("Task name is empty")
+        return task
+
+    def _check_times(self, i, start, end):
+        store = self.store
+        self._index(i)
+        if end < start:
+            raise ValueError("End is before start")
+        if (i > 0 and start < store.starts[i - 1]) or (i + 1 < len(store) and start > store.starts[i + 1]):
+            raise ValueError("Sessions must stay in time order")
+
+    # --- Operations ---
+
+    def rename(self, i, task):
+        return self.retag([i], task)
+
+    def retag(self, indices, task):
+        """Gives every session in `indices` the task `task`."""
+        task = self._task(task)
+        indices = [self._index(i) for i in indices] # All or nothing
+        position = self._begin()
+        store = self.store
+        for i in indices:
+            row = store.row(i)
+            if row[0] != task:
+                store.replace(i, task, *row[1:])
+        return self._commit(position)
+
+    def retime(self, i, start, end):
+        """New start and end; work becomes end - start."""
+        self._check_times(i, start, end)
+        position = self._begin()
+        self._retime(i, start, end)
+        return self._commit(position)
+
+    def update(self, i, task, start, end):
+        """
+        The edit form's Save: new task and times as one operation. Everything
+        is checked first, so a bad field changes nothing.
+        """
+        task = self._task(task)
+        self._check_times(i, start, end)
+        position = self._begin()
+        store = self.store
+        if (start, end) != (store.starts[i], store.ends[i]):
+            self._retime(i, start, end)
+        row = store.row(i)
+        if row[0] != task:
+            store.replace(i, task, *row[1:])
+        return self._commit(position)
+
+    def _retime(self, i, start, end):
+        store = self.store
+        task, old_start, old_end, _work, brk = store.row(i)
+        if i + 1 < len(store) and brk == store.starts[i + 1] - old_end:
+            brk = max(0, store.starts[i + 1] - end)
+        store.replace(i, task, start, end, end - start, brk)
+        if i > 0 and store.breaks[i - 1] == old_start - store.ends[i - 1]:
+            prev = store.row(i - 1)
+            store.replace(i - 1, *prev[:4], max(0, start - prev[2]))
+
+    def merge(self, i):
+        """Joins session `i` with the next one, keeping the first one's task."""
+        store = self.store
+        if not 0 <= i < len(store) - 1:
+            raise ValueError("Nothing to merge with")
+        position = self._begin()
+        task, start, _end, work, _brk = store.row(i)
+        _task, _start, end, next_work, brk = store.row(i + 1)
+        store.replace(i, task, start, end, work + next_work, brk)
+        store.delete(i + 1)
+        return self._commit(position)
+
+    def split(self, i, at):
+        """Splits session `i` at time `at`; work is shared in proportion to the time."""
+        store = self.store
+        task, start, end, work, brk = store.row(self._index(i))
+        if not start < at < end:
+            raise ValueError("Split time must fall inside the session")
+        position = self._begin()
+        first = work * (at - start) // (end - start)
+        store.replace(i, task, start, at, first, 0)
+        store.insert(i + 1, task, at, end, work - first, brk)
+        return self._commit(position)
+
+    def delete(self, i):
+        position = self._begin()
+        self.store.delete(self._index(i))
+        return self._commit(position)
+
+    def undo(self):
+        """Reverts the latest operation. Returns the edits that did it ([] if nothing to undo)."""
+        position = self._begin()
+        if not self.history:
+            return []
+        store = self.store
+        for kind, i, old, _new in reversed(self.history.pop()):
+            if kind == EDIT_SET:
+                store.replace(i, *old)
+            elif kind == EDIT_INSERT:
+                store.delete(i)
+            elif kind == EDIT_DELETE:
+                store.insert(i, *old)
+        return self._commit(position, undoable=False)
+
@@ -0,0 +1,125 @@
+"""
+Streaming export of the session history as CSV, TSV or JSON Lines.
+
+Rows are formatted one at a time and written straight to the output, so
+exporting millions of sessions never builds the whole text in memory. The
+Tk app uses this for "Export..." and keeps the clipboard for small
+selections only. From the command line:
+
+    python -m flowtime.export --format csv --output history.csv flowtime_data.json
+    python -m flowtime.export --format jsonl flowtime_v2.json > history.jsonl
+
+The input can be either JSON layout (a v2 journal next to it is included)
+or a FLOWTIME_DB SQLite file. Older months rolled into segments
+(flowtime.tiers) are exported before it.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+
+from flowtime.records import NO_BREAK, format_break, format_duration, format_timestamp
+from flowtime.storage import open_history
+from flowtime.tiers import TieredHistory, segments_dir
+
+HEADER = ("Task", "Start", "End", "Work", "Break")
+FORMATS = ("csv", "tsv", "jsonl")
+CLIPBOARD_LIMIT = 1000 # Larger selections go to a file instead
+JSONL_BATCH = 1000 # Lines joined per write()
+
+
+def text_row(store, i):
+    return (
+        store.task(i),
+        format_timestamp(store.starts[i]),
+        format_timestamp(store.ends[i]),
+        format_duration(store.work[i]),
+        format_break(store.breaks[i]),
+    )
+
+def json_row(store, i):
+    return json_fields(store.task(i), store.starts[i], store.ends[i], store.work[i], store.breaks[i])
+
+def json_fields(task, start, end, work, brk):
+    return {
+        "task": task,
+        "start": format_timestamp(start),
+        "end": format_timestamp(end),
+        "work_sec": work,
+        "break_sec": None if brk == NO_BREAK else brk,
+    }
+
+def format_for(path):
+    """Export format implied by a file name (".csv", ".tsv", ".jsonl")."""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == "json":
+        ext = "jsonl"
+    return ext if ext in FORMATS else "csv"
+
+
+def write_export(store, out, fmt="csv", indices=None):
+    """
+    Streams sessions to the text stream `out`, oldest first.
+    `indices` limits the export to those records. Returns the row count.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if indices is None:
+        indices = range(len(store))
+
+    count = 0
+    if fmt == "jsonl":
+        batch = []
+        for i in indices:
+            batch.append(json.dumps(json_row(store, i)))
+            if len(batch) >= JSONL_BATCH:
+                out.write("\n".join(batch) + "\n")
+                count += len(batch)
+                batch = []
+        if batch:
+            out.write("\n".join(batch) + "\n")
+            count += len(batch)
+        return count
+
+    writer = csv.writer(out, dialect="excel-tab" if fmt == "tsv" else "excel", lineterminator="\n")
+    writer.writerow(HEADER)
+    for i in indices:
+        writer.writerow(text_row(store, i))
+        count += 1
+    return count
+
+def export_file(store, path, fmt=None, indices=None):
+    """Writes an export to `path` ("-" for stdout). Returns the row count."""
+    fmt = fmt or format_for(path)
+    if path == "-":
+        return write_export(store, sys.stdout, fmt, indices)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        return write_export(store, f, fmt, indices)
+
+def clipboard_text(store, indices):
+    """Small selections as TSV, the format spreadsheets accept on paste."""
+    out = io.StringIO()
+    write_export(store, out, "tsv", indices)
+    return out.getvalue()
+
+
+# --- Command line ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export Flowtime history")
+    parser.add_argument("--format", choices=FORMATS, help="default: from --output's extension, else csv")
+    parser.add_argument("--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("history", help="flowtime_data.json, flowtime_v2.json or a .db file")
+    args = parser.parse_args(argv)
+
+    backend = open_history(args.history, read_only=True)
+    store = backend.load() # Read only: no close(), which may compact the journal
+    if os.path.isdir(segments_dir(args.history)):
+        store = TieredHistory(args.history).combined(store)
+    count = export_file(store, args.output, args.format)
+    print(f"Exported {count} sessions", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import heapq
+from bisect import bisect_left, insort
+from math import isqrt
+
+DAY = 86400
+WEEK = 7 * DAY
+
+
+def day_start(ts):
+    return ts - ts % DAY
+
+def week_start(ts):
+    # Local epoch day 0 (1970-01-01) was a Thursday; weeks start on Monday
+    day = ts // DAY
+    return (day - (day + 3) % 7) * DAY
+
+
+SIDE_LIMIT = 64 # Out-of-order sessions kept aside (at least) before they are merged in
+
+
+def _prefix(tree, j):
+    """Sum of the first `j` values of a Fenwick tree."""
+    total = 0
+    while j > 0:
+        total += tree[j]
+        j -= j & -j
+    return total
+
+def _update(tree, pos, delta):
+    pos += 1
+    while pos < len(tree):
+        tree[pos] += delta
+        pos += pos & -pos
+
+def _push(tree, value):
+    n = len(tree)
+    tree.append(value + _prefix(tree, n - 1) - _prefix(tree, n - (n & -n)))
+
+def _build(values):
+    tree = [0] + values
+    for i in range(1, len(tree)):
+        j = i + (i & -i)
+        if j < len(tree):
+            tree[j] += tree[i]
+    return tree
+
+
+class _Column:
+    """
+    Start times kept sorted, with Fenwick trees of work seconds and session
+    counts. Sessions arrive in time order almost always, so the common add
+    is an append (the trees catch up at the next query). An edit that
+    keeps a start time already present updates that position in O(log n);
+    one moved into the past waits in a short sorted `side` list until
+    enough of them (SIDE_LIMIT, or sqrt(n) on long histories) are merged
+    in at once. Removing is an O(log n) update at a matching key.
+    """
+    def __init__(self):
+        self.keys = []
+        self.works = []
+        self.counts = []
+        self._work_tree = [0]
+        self._count_tree = [0]
+        self.side = [] # Sorted (start, work)
+
+    def add(self, start, work):
+        keys = self.keys
+        if not keys or start >= keys[-1]:
+            keys.append(start)
+            self.works.append(work)
+            self.counts.append(1)
+            return
+        pos = bisect_left(keys, start)
+        if keys[pos] == start:
+            self._update(pos, work, 1)
+            return
+        insort(self.side, (start, work))
+        if len(self.side) > max(SIDE_LIMIT, isqrt(len(keys))):
+            self._merge()
+
+    def remove(self, start, work):
+        side = self.side
+        pos = bisect_left(side, (start, work))
+        if pos < len(side) and side[pos] == (start, work):
+            del side[pos]
+            return
+        # Any position holding this start time will do: queries only see key ranges
+        self._update(bisect_left(self.keys, start), -work, -1)
+
+    def _update(self, pos, work, count):
+        self._catch_up()
+        self.works[pos] += work
+        self.counts[pos] += count
+        _update(self._work_tree, pos, work)
+        _update(self._count_tree, pos, count)
+
+    def _catch_up(self):
+        """Extends the trees over appended keys: one by one, or rebuilt if many are waiting."""
+        built = len(self._work_tree) - 1
+        waiting = len(self.keys) - built
+        if not waiting:
+            return
+        if waiting > SIDE_LIMIT and waiting * 8 > built:
+            self._work_tree = _build(list(self.works))
+            self._count_tree = _build(list(self.counts))
+            return
+        for pos in range(built, len(self.keys)):
+            _push(self._work_tree, self.works[pos])
+            _push(self._count_tree, self.counts[pos])
+
+    def _merge(self):
+        rows = list(heapq.merge(
+            ((k, w, c) for k, w, c in zip(self.keys, self.works, self.counts) if c or w),
+            ((k, w, 1) for k, w in self.side)))
+        self.keys = [row[0] for row in rows]
+        self.works = [row[1] for row in rows]
+        self.counts = [row[2] for row in rows]
+        self._work_tree = _build(list(self.works))
+        self._count_tree = _build(list(self.counts))
+        self.side = []
+
+    def _range(self, tree, lo, hi, side_value):
+        keys = self.keys
+        i = 0 if lo is None else bisect_left(keys, lo)
+        j = len(keys) if hi is None else bisect_left(keys, hi)
+        total = _prefix(tree, j) - _prefix(tree, i) if j > i else 0
+        side = self.side
+        if side:
+            a = 0 if lo is None else bisect_left(side, (lo,))
+            b = len(side) if hi is None else bisect_left(side, (hi,))
+            total += sum(side_value(row) for row in side[a:b])
+        return total
+
+    def total(self, lo=None, hi=None):
+        """Work seconds for sessions starting in [lo, hi)."""
+        self._catch_up()
+        return self._range(self._work_tree, lo, hi, lambda row: row[1])
+
+    def count(self, lo=None, hi=None):
+        self._catch_up()
+        return self._range(self._count_tree, lo, hi, lambda row: 1)
+
+
+class SessionIndex:
+    """
+    Range and per-task index over a SessionStore.
+
+    `sync()` only looks at sessions appended since the previous call, plus
+    the store's edit log for changed ones, and every query is a pair of
+    bisects plus Fenwick prefix sums: O(log n).
+    """
+    def __init__(self, store):
+        self.store = store
+        self.reset()
+
+    def reset(self):
+        self.all = _Column()
+        self.by_task = {} # task id -> _Column
+        self._seen = 0
+        self._edits = len(self.store.edits)
+        self._column_ref = self.store.starts
+
+    def _column(self, task_id):
+        column = self.by_task.get(task_id)
+        if column is None:
+            column = self.by_task[task_id] = _Column()
+        return column
+
+    def sync(self):
+        store = self.store
+        if store.starts is not self._column_ref:
+            self.reset() # Store was cleared or replaced
+        edits, self._seen = store.edits_before(self._edits, self._seen)
+        self._edits = len(store.edits)
+        for kind, i, old, new in edits:
+            if old is not None:
+                task, start, _end, work, _brk = old
+                self.all.remove(start, work)
+                self.by_task[store.task_id(task)].remove(start, work)
+            if new is not None:
+                task, start, _end, work, _brk = new
+                self.all.add(start, work)
+                self._column(store.task_id(task)).add(start, work)
+        if len(store) < self._seen:
+            self.reset()
+        for i in range(self._seen, len(store)):
+            start = store.starts[i]
+            work = store.work[i]
+            self.all.add(start, work)
+            self._column(store.task_ids[i]).add(start, work)
+        self._seen = len(store)
+
+    # --- Queries ---
+
+    def total(self, lo=None, hi=None):
+        self.sync()
+        return self.all.total(lo, hi)
+
+    def count(self, lo=None, hi=None):
+        self.sync()
+        return self.all.count(lo, hi)
+
+    def task_total(self, task, lo=None, hi=None):
+        self.sync()
+        task_id = self.store.task_id(task)
+        if task_id is None or task_id not in self.by_task:
+            return 0
+        return self.by_task[task_id].total(lo, hi)
+
+    def today(self, now):
+        return self.total(day_start(now), day_start(now) + DAY)
+
+    def this_week(self, now):
+        return self.total(week_start(now), week_start(now) + WEEK)
+
+    def top_tasks(self, limit=5, lo=None, hi=None):
+        """[(task, seconds)] sorted by time spent, one O(log n) lookup per task."""
+        self.sync()
+        names = self.store.task_names
+        totals = [(names[tid], col.total(lo, hi)) for tid, col in self.by_task.items()]
+        totals = [t for t in totals if t[1] > 0]
+        totals.sort(key=lambda t: t[1], reverse=True)
+        return totals[:limit]
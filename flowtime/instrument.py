@@ -0,0 +1,200 @@
+"""
+Opt-in timing of UI handlers.
+
+Set FLOWTIME_TRACE=<path> to turn it on. Each wrapped call is then
+recorded as a span on the monotonic clock, latency histograms are printed
+on exit, and the spans are written to <path> as a Chrome trace (open it
+in chrome://tracing or https://ui.perfetto.dev).
+
+When the variable is unset, `traced` hands back the undecorated function
+and `span` returns a shared no-op context manager, so the instrumented
+code runs exactly as before.
+
+Both apps call `first_frame()` once their window has been drawn. With
+FLOWTIME_FIRST_FRAME=1 that prints "first-frame <ms>" and quits, which is
+how benchmarks.startup measures time-to-first-frame.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+STARTED_NS = time.perf_counter_ns() # As close to process start as the apps get us
+
+TRACE_PATH = os.environ.get("FLOWTIME_TRACE")
+ENABLED = bool(TRACE_PATH)
+EXIT_AFTER_FIRST_FRAME = bool(os.environ.get("FLOWTIME_FIRST_FRAME"))
+MAX_EVENTS = 200000 # Spans kept for the trace file; older ones are dropped
+SUB_BUCKETS = 8 # Histogram buckets per power of two (about 12% resolution)
+BUCKETS = SUB_BUCKETS * 40
+
+_NOOP = nullcontext()
+
+
+def _bucket(us):
+    v = int(us)
+    if v < SUB_BUCKETS:
+        return v
+    shift = v.bit_length() - 4 # Keep the top 4 bits: 8 sub-buckets per octave
+    return min(BUCKETS - 1, SUB_BUCKETS * (shift + 1) + (v >> shift) - SUB_BUCKETS)
+
+def _bucket_limit(i):
+    """Largest value in bucket `i`."""
+    if i < SUB_BUCKETS:
+        return i
+    shift = i // SUB_BUCKETS - 1
+    return ((SUB_BUCKETS + i % SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram:
+    """Log-linear latency buckets: fixed size, O(1) record, percentiles within ~12%."""
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, us):
+        self.buckets[_bucket(max(0, us))] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in microseconds."""
+        target = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(self.max_us, _bucket_limit(i))
+        return self.max_us
+
+
+class Tracer:
+    def __init__(self, max_events=MAX_EVENTS):
+        self.origin = time.perf_counter_ns()
+        self.events = deque(maxlen=max_events)
+        self.histograms = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, start_ns, end_ns):
+        us = (end_ns - start_ns) / 1000
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.record(us)
+            tid = self._threads.setdefault(threading.get_ident(), len(self._threads) + 1)
+            self.events.append((name, (start_ns - self.origin) / 1000, us, tid))
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def wrap(self, func, name):
+        record = self.record
+        clock = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, start, clock())
+        wrapper.__name__ = func.__name__
+        wrapper.__qualname__ = getattr(func, "__qualname__", func.__name__)
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    # --- Output ---
+
+    def summary(self):
+        """{name: {count, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            items = list(self.histograms.items())
+        return {name: {
+            "count": h.count,
+            "mean_ms": h.total_us / h.count / 1000,
+            "p50_ms": h.percentile(50) / 1000,
+            "p90_ms": h.percentile(90) / 1000,
+            "p99_ms": h.percentile(99) / 1000,
+            "max_ms": h.max_us / 1000,
+        } for name, h in items}
+
+    def format_summary(self):
+        lines = [f"{'span':<32}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for name, s in sorted(self.summary().items(), key=lambda item: -item[1]["max_ms"]):
+            lines.append(f"{name:<32}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p90_ms']:>10.2f}"
+                         f"{s['p99_ms']:>10.2f}{s['max_ms']:>10.2f}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """Writes the spans in Chrome's trace event format."""
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "ts": ts, "dur": dur, "pid": pid, "tid": tid}
+                 for name, ts, dur, tid in events]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+class _Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, self.start, time.perf_counter_ns())
+
+
+tracer = Tracer() if ENABLED else None
+
+
+def traced(name=None):
+    """Decorator timing every call. Returns the function untouched when disabled."""
+    def decorate(func):
+        if tracer is None:
+            return func
+        return tracer.wrap(func, name or func.__qualname__)
+    return decorate
+
+def span(name):
+    """`with span("load"):` times a block. A shared no-op when disabled."""
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name)
+
+def first_frame(quit=None):
+    """Marks the first drawn frame; quits via `quit()` when measuring startup."""
+    now = time.perf_counter_ns()
+    if tracer is not None:
+        tracer.record("startup.first_frame", STARTED_NS, now)
+    if EXIT_AFTER_FIRST_FRAME:
+        print(f"first-frame {(now - STARTED_NS) / 1e6:.1f}", flush=True)
+        if quit is not None:
+            quit()
+
+def _report():
+    if tracer.histograms:
+        print(tracer.format_summary(), file=sys.stderr)
+    try:
+        tracer.dump(TRACE_PATH)
+        print(f"Trace written to {TRACE_PATH}", file=sys.stderr)
+    except OSError as e:
+        print(f"Error writing trace: {e}", file=sys.stderr)
+
+if ENABLED:
+    atexit.register(_report)
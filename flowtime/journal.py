@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+
+from flowtime.persist import atomic_write
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, EDIT_SET
+
+
+class SessionJournal:
+    """
+    Append-only session history.
+
+    New records go to a line-delimited journal next to the snapshot file, so
+    saving a session costs one short write no matter how long the history is.
+    The snapshot keeps the old `flowtime_v2.json` layout (newest first) and is
+    only rewritten during compaction.
+
+    Edits to recorded sessions are journaled too, as {"_edit": kind, "i":
+    index, "record"} entries that are replayed in order.
+    """
+    def __init__(self, snapshot_path, journal_path=None, sync_every=8, compact_every=500):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + ".journal"
+        self.sync_every = sync_every
+        self.compact_every = compact_every
+
+        self._fh = None
+        self._unsynced = 0
+        self._snapshot_len = None
+        self._valid_size = None
+        self.pending = 0 # Records in the journal that are not in the snapshot yet
+
+    # --- Reading ---
+
+    def load(self):
+        """Returns every record, oldest first (snapshot + replayed journal)."""
+        records = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r") as f:
+                records = json.load(f)
+            records.reverse()
+        for item in self.unsaved_entries(len(records), self.read_journal()):
+            replay(records, item)
+        return records
+
+    def unsaved_entries(self, snapshot_len, journal):
+        """Entries from `read_journal()` that a snapshot of `snapshot_len` records lacks."""
+        base, entries, compacted = journal
+        if base is None:
+            base = snapshot_len
+
+        # A crash between writing the snapshot and resetting the journal
+        # leaves entries that the snapshot already holds: skip those. The
+        # compaction marker says which snapshot that would be; journals
+        # from before it had one only ever appended, so counting works.
+        if compacted is not None and compacted[0] == self._snapshot_digest():
+            skip = compacted[1]
+        else:
+            skip = max(0, snapshot_len - base)
+        self._snapshot_len = snapshot_len
+        self.pending += len(entries) - skip
+        return entries[skip:]
+
+    def read_journal(self):
+        """
+        (base, entries, compaction marker) from the journal file; the
+        marker is (snapshot digest, entries before it). Cheap, since
+        compaction keeps the journal short.
+        """
+        base = None
+        entries = []
+        compacted = None
+        self._valid_size = 0
+        if not os.path.exists(self.journal_path):
+            return base, entries, compacted
+
+        with open(self.journal_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break # Torn write from a crash, everything before it is intact
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    break
+                if "_base" in item:
+                    base = item["_base"]
+                elif "_compact" in item:
+                    compacted = (item["_compact"], len(entries))
+                else:
+                    entries.append(item)
+                self._valid_size += len(line)
+        return base, entries, compacted
+
+    # --- Writing ---
+
+    def append(self, record):
+        """Adds one record (or edit entry) to the journal. O(1) regardless of history size."""
+        self._open()
+        self._fh.write(json.dumps(record) + "\n")
+        self._fh.flush()
+        self.pending += 1
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every:
+            self.sync()
+
+    def sync(self):
+        """Forces buffered journal writes to disk."""
+        if self._fh is not None and self._unsynced:
+            os.fsync(self._fh.fileno())
+            self._unsynced = 0
+
+    def needs_compaction(self):
+        return self.pending >= self.compact_every
+
+    def compact(self, records):
+        """Folds the journal into a fresh snapshot. `records` is oldest first."""
+        text = json.dumps(list(reversed(records)))
+        # Name the snapshot about to be written, in case we crash before the journal is reset
+        self._open()
+        self._fh.write(json.dumps({"_compact": hashlib.sha1(text.encode()).hexdigest()}) + "\n")
+        self._unsynced += 1
+        self._close_handle()
+        atomic_write(self.snapshot_path, text)
+        atomic_write(self.journal_path, json.dumps({"_base": len(records)}) + "\n")
+        self.pending = 0
+        self._snapshot_len = len(records)
+        self._valid_size = None
+
+    def close(self):
+        """Flushes and releases the journal file."""
+        self._close_handle()
+
+    # --- Helpers ---
+
+    def _open(self):
+        if self._fh is not None:
+            return
+        new_file = not os.path.exists(self.journal_path)
+        self._fh = open(self.journal_path, "a")
+        if not new_file and self._valid_size is not None:
+            self._fh.truncate(self._valid_size) # Drop a torn tail before appending
+        self._valid_size = None
+        if new_file:
+            self._fh.write(json.dumps({"_base": self._count_snapshot()}) + "\n")
+
+    def _snapshot_digest(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        with open(self.snapshot_path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def _close_handle(self):
+        if self._fh is not None:
+            self.sync()
+            self._fh.close()
+            self._fh = None
+
+    def _count_snapshot(self):
+        if self._snapshot_len is None:
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r") as f:
+                    self._snapshot_len = len(json.load(f))
+            else:
+                self._snapshot_len = 0
+        return self._snapshot_len
+
+
+def replay(records, item):
+    """Applies one journal entry to a list of records: appends a record, or applies an edit."""
+    kind = item.get("_edit")
+    if kind is None:
+        records.append(item)
+    elif kind == EDIT_SET:
+        records[item["i"]] = item["record"]
+    elif kind == EDIT_INSERT:
+        records.insert(item["i"], item["record"])
+    elif kind == EDIT_DELETE:
+        del records[item["i"]]
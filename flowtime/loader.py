@@ -0,0 +1,152 @@
+"""
+Incremental history loading.
+
+The apps show the newest sessions straight away (`tail_items`/`head_items`
+read only the end or start of the file) and rebuild the full SessionStore
+on a worker thread with `BackgroundLoad`, streaming the JSON array in
+chunks instead of holding the whole document in memory.
+"""
+import json
+import threading
+from itertools import islice
+
+from flowtime.store import SessionStore
+
+CHUNK_BYTES = 1 << 16
+CHUNK_RECORDS = 2000
+
+_decoder = json.JSONDecoder()
+
+
+def iter_json_array(path, chunk_bytes=CHUNK_BYTES):
+    """Yields the items of a top-level JSON array, reading `chunk_bytes` at a time."""
+    with open(path, "r") as f:
+        buf = f.read(chunk_bytes)
+        pos = 0
+        eof = not buf
+        started = False
+        while True:
+            # Skip whitespace and separators between items
+            while pos < len(buf) and buf[pos] in " \t\r\n,[":
+                if buf[pos] == "[":
+                    started = True
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            if pos < len(buf) and started:
+                try:
+                    item, pos = _decoder.raw_decode(buf, pos)
+                    yield item
+                    continue
+                except ValueError:
+                    if eof:
+                        raise
+            elif eof:
+                if started:
+                    raise ValueError("Unterminated JSON array")
+                return
+
+            # Need more text: drop what was consumed, read the next chunk
+            more = f.read(chunk_bytes)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+
+def iter_chunks(path, size=CHUNK_RECORDS):
+    """Items of a JSON array in lists of up to `size`."""
+    items = iter_json_array(path)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def head_items(path, count):
+    """First `count` items; only reads as much of the file as needed."""
+    return list(islice(iter_json_array(path), count))
+
+def tail_items(path, count, chunk_bytes=CHUNK_BYTES):
+    """
+    Last `count` items of a JSON array of flat objects, in file order.
+    Reads backwards from the end of the file, so the cost depends on `count`,
+    not on the size of the history.
+    """
+    with open(path, "rb") as f:
+        pos = f.seek(0, 2)
+        data = b""
+        step = chunk_bytes
+        while True:
+            read = min(step, pos)
+            pos -= read
+            f.seek(pos)
+            data = f.read(read) + data
+            items = _decode_tail(data.decode("utf-8", errors="ignore"), count)
+            if len(items) >= count or pos == 0:
+                return items
+            step *= 2
+
+def _decode_tail(text, count):
+    items = []
+    end = text.rfind("]")
+    next_start = end
+    i = end
+    while len(items) < count and i > 0:
+        i = text.rfind("{", 0, i)
+        if i < 0:
+            break
+        try:
+            item, stop = _decoder.raw_decode(text, i)
+        except ValueError:
+            continue
+        # Only accept a real array element: "{...}" followed by "," + the
+        # element after it (or the closing bracket)
+        gap = text[stop:next_start].strip()
+        if not isinstance(item, dict) or gap != ("," if next_start != end else ""):
+            continue
+        items.append(item)
+        next_start = i
+    items.reverse()
+    return items
+
+
+def load_store(path, to_row, newest_first=False):
+    """Streams a history file into a new SessionStore, one chunk at a time."""
+    store = SessionStore()
+    if newest_first:
+        rows = []
+        for chunk in iter_chunks(path):
+            rows.extend(to_row(r) for r in chunk)
+        rows.reverse()
+        store.extend(rows)
+    else:
+        for chunk in iter_chunks(path):
+            store.extend(to_row(r) for r in chunk)
+    return store
+
+
+class BackgroundLoad:
+    """Runs `load()` on a daemon thread; the UI polls `done()` from its own timer."""
+    def __init__(self, load):
+        self._load = load
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._load()
+        except Exception as e:
+            self._error = e
+
+    def done(self):
+        return not self._thread.is_alive()
+
+    def wait(self):
+        self._thread.join()
+
+    def result(self):
+        """The loaded value; re-raises whatever the worker raised."""
+        if self._error is not None:
+            raise self._error
+        return self._result
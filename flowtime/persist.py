@@ -0,0 +1,64 @@
+import os
+import queue
+import threading
+
+_STOP = object()
+
+
+def atomic_write(path, text):
+    """Writes through a temp file + rename so readers never see half a file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BackgroundWriter:
+    """
+    Saves snapshots on a worker thread so the UI thread never touches the disk.
+
+    The queue holds at most one pending snapshot: submitting while a save is
+    still waiting replaces it, so bursts of changes coalesce into one write.
+    `write(snapshot)` runs on the worker and does the serialization too.
+    """
+    def __init__(self, write):
+        self._write = write
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, snapshot):
+        while True:
+            try:
+                self._queue.put_nowait(snapshot)
+                return
+            except queue.Full:
+                # Replace the stale pending snapshot with the newer one
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                except queue.Empty:
+                    pass
+
+    def flush(self):
+        """Blocks until every submitted snapshot has been written."""
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            snapshot = self._queue.get()
+            try:
+                if snapshot is _STOP:
+                    return
+                self._write(snapshot)
+            except Exception as e: # sqlite3.Error, serialization bugs: keep the worker alive
+                print(f"Error saving data: {e}")
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,185 @@
+"""
+Conversions between the two on-disk record layouts and SessionStore rows.
+
+flowtime_data.json (Tk app):
+    {"task_name", "start_time": "YYYY-MM-DD HH:MM:SS", "end_time",
+     "work_time_str": "H:MM:SS", "break_time_str"}
+flowtime_v2.json (Kivy app):
+    {"task", "start": "HH:MM", "end", "duration", "work_sec",
+     optional "start_ts", "end_ts", "break_sec"}
+
+Timestamps are stored as "local epoch" seconds: seconds since 1970-01-01
+00:00 in local wall-clock time, with no timezone conversion. That keeps
+parsing pure arithmetic and makes `ts // 86400` the local calendar day.
+Old v2 records only carry "HH:MM", so they land on day 0 (undated).
+"""
+import json
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+NO_BREAK = -1 # Break not measured yet (shown as "On Break...")
+PENDING_BREAK_TEXT = "On Break..."
+
+
+# --- Timestamps ---
+
+def to_epoch(dt):
+    if dt is None:
+        return 0
+    return int((dt - EPOCH).total_seconds())
+
+def from_epoch(ts):
+    return EPOCH + timedelta(seconds=ts)
+
+def days_from_civil(y, m, d):
+    """Days since 1970-01-01 for a proleptic Gregorian date (no datetime objects)."""
+    y -= m <= 2
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * (m + (-3 if m > 2 else 9)) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+def civil_from_days(z):
+    z += 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = mp + (3 if mp < 10 else -9)
+    return yoe + era * 400 + (m <= 2), m, d
+
+_day_cache = {} # 'YYYY-MM-DD' -> epoch of midnight; histories reuse few dates
+
+def parse_timestamp(text):
+    """
+    'YYYY-MM-DD HH:MM[:SS]' -> local epoch.
+    Fixed-position slicing plus a per-date cache instead of datetime.strptime.
+    """
+    if not text:
+        return 0
+    try:
+        midnight = _day_cache.get(text[:10])
+        if midnight is None:
+            midnight = days_from_civil(int(text[0:4]), int(text[5:7]), int(text[8:10])) * 86400
+            _day_cache[text[:10]] = midnight
+        seconds = int(text[17:19]) if len(text) >= 19 else 0
+        return midnight + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + seconds
+    except ValueError:
+        return to_epoch(datetime.strptime(text, "%Y-%m-%d %H:%M:%S"))
+
+def format_timestamp(ts):
+    days, secs = divmod(ts, 86400)
+    y, m, d = civil_from_days(days)
+    return f"{y:04}-{m:02}-{d:02} {secs // 3600:02}:{secs // 60 % 60:02}:{secs % 60:02}"
+
+def parse_clock(text):
+    """'HH:MM' -> seconds into day 0."""
+    try:
+        h, m = text.split(':')
+        return int(h) * 3600 + int(m) * 60
+    except (AttributeError, ValueError):
+        return 0
+
+def format_clock(ts):
+    return f"{ts // 3600 % 24:02}:{ts // 60 % 60:02}"
+
+
+# --- Durations ---
+
+def parse_duration(text):
+    """'H:MM:SS', 'M:SS' or 'S' -> seconds, NO_BREAK if unparseable."""
+    try:
+        days = 0
+        if 'day' in text: # str(timedelta) form: "2 days, 1:00:00"
+            day_part, text = text.split(',')
+            days = int(day_part.split()[0])
+        total = 0
+        for part in text.split(':'):
+            total = total * 60 + int(part)
+        return days * 86400 + total
+    except (TypeError, ValueError):
+        return NO_BREAK
+
+def format_duration(seconds):
+    return str(timedelta(seconds=seconds))
+
+def format_break(seconds):
+    return PENDING_BREAK_TEXT if seconds == NO_BREAK else format_duration(seconds)
+
+
+# --- Record layouts ---
+
+def study_row(r):
+    """flowtime_data.json dict -> (task, start, end, work_sec, break_sec)."""
+    work = parse_duration(r.get('work_time_str'))
+    return (
+        r.get('task_name', ""),
+        parse_timestamp(r.get('start_time')),
+        parse_timestamp(r.get('end_time')),
+        max(work, 0),
+        parse_duration(r.get('break_time_str')),
+    )
+
+def study_record(store, i):
+    return {
+        "task_name": store.task(i),
+        "start_time": format_timestamp(store.starts[i]),
+        "end_time": format_timestamp(store.ends[i]),
+        "work_time_str": format_duration(store.work[i]),
+        "break_time_str": format_break(store.breaks[i]),
+    }
+
+def v2_row(r):
+    """flowtime_v2.json dict -> (task, start, end, work_sec, break_sec)."""
+    start = r.get('start_ts')
+    end = r.get('end_ts')
+    return (
+        r.get('task', ""),
+        start if start is not None else parse_clock(r.get('start')),
+        end if end is not None else parse_clock(r.get('end')),
+        r.get('work_sec', 0),
+        r.get('break_sec', NO_BREAK),
+    )
+
+def v2_record(store, i):
+    return v2_fields(*store.row(i))
+
+def v2_fields(task, start, end, work, brk):
+    return {
+        "task": task,
+        "start": format_clock(start),
+        "end": format_clock(end),
+        "duration": format_duration(work),
+        "work_sec": work,
+        "start_ts": start,
+        "end_ts": end,
+        "break_sec": brk,
+    }
+
+
+# --- Files ---
+
+def detect_rows(data):
+    """
+    Picks the right converter for a list loaded from either JSON layout.
+    Anything else (such as the task-less records of flowtime_study_data.json)
+    is a ValueError rather than sessions with empty task names.
+    """
+    if not data or 'task' in data[0]:
+        return v2_row
+    if 'task_name' in data[0]:
+        return study_row
+    raise ValueError(f"Not a Flowtime history layout (fields: {', '.join(sorted(data[0]))})")
+
+def load_rows(path):
+    """Reads a flowtime_data.json or flowtime_v2.json file as store rows."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    to_row = detect_rows(data)
+    rows = [to_row(r) for r in data]
+    if to_row is v2_row:
+        rows.reverse() # v2 files are stored newest first
+    return rows
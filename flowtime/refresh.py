@@ -0,0 +1,141 @@
+"""
+Visibility-aware refresh of the timer display.
+
+Both front-ends used to re-arm their own per-second callback for the
+timer label, whether anyone could see it or not. A RefreshScheduler owns
+the one wakeup instead. Each wakeup is a single pass: it advances the
+engine (so an expired break still rings on time), works out the frame
+(clock, window title and alarm flash), and hands only what changed to the
+app's `apply(changes)` in one call.
+
+How often it wakes depends on what the user can see:
+
+    focused     every change of the displayed second
+    background  shown but another app has focus: every BACKGROUND_SECONDS
+                (the alarm flash keeps its full rate, to get attention)
+    hidden      minimized or paused: the title, once a minute
+
+An idle engine, or a hidden alarm, needs no wakeups at all. A break's end
+is always woken for on time. Everything is derived from the engine's
+monotonic timers, so showing or focusing the window again catches up
+straight away with one pass; nothing was counted while it slept.
+"""
+import math
+
+from flowtime.core import ALARM, BREAK, WORKING
+
+BACKGROUND_SECONDS = 5
+HIDDEN_SECONDS = 60
+FLASH_SECONDS = 1 # Half a flash cycle
+
+_UNSET = object()
+
+FOCUSED = 'focused'
+BACKGROUND = 'background'
+HIDDEN = 'hidden'
+
+
+class RefreshScheduler:
+    """
+    `call_later(seconds, callback)` returns a handle for `cancel(handle)`
+    (root.after / after_cancel in Tk, Clock.schedule_once in Kivy).
+
+    `apply(changes)` receives a dict with any of:
+        "clock"  (engine state, whole seconds to show)
+        "title"  short status for the window title, None when idle
+        "flash"  True while the alarm flash is on (only with flash=True)
+    """
+    def __init__(self, engine, apply, call_later, cancel, flash=False):
+        self.engine = engine
+        self.apply = apply
+        self.call_later = call_later
+        self.cancel = cancel
+        self.flash = flash
+
+        self.visible = True
+        self.focused = True
+        self._shown = {}
+        self._pending = None
+        self._in_pass = False
+        engine.subscribe(lambda event, data: self.wake())
+
+    @property
+    def level(self):
+        if not self.visible:
+            return HIDDEN
+        return FOCUSED if self.focused else BACKGROUND
+
+    def set_visible(self, visible):
+        if visible != self.visible:
+            self.visible = visible
+            self.wake()
+
+    def set_focused(self, focused):
+        if focused != self.focused:
+            self.focused = focused
+            self.wake()
+
+    def wake(self):
+        """Runs a pass now (after a transition, or to catch up) and re-arms the timer."""
+        if self._in_pass:
+            return # engine.tick() fired an event mid-pass; this pass already sees it
+        if self._pending is not None:
+            self.cancel(self._pending)
+            self._pending = None
+        self._run()
+
+    def _run(self):
+        self._pending = None
+        self._in_pass = True
+        try:
+            self.engine.tick()
+            frame, delay = self._frame()
+        finally:
+            self._in_pass = False
+
+        changes = {key: value for key, value in frame.items() if self._shown.get(key, _UNSET) != value}
+        if changes:
+            self._shown.update(changes)
+            self.apply(changes)
+        if delay is not None:
+            self._pending = self.call_later(delay, self._run)
+
+    def _frame(self):
+        """(fields to show, seconds until the next pass or None)."""
+        engine = self.engine
+        level = self.level
+        step = {FOCUSED: 1, BACKGROUND: BACKGROUND_SECONDS, HIDDEN: HIDDEN_SECONDS}[level]
+        state = engine.state
+        seconds = 0
+        title = None
+        delay = None
+        flash = False
+
+        if state == WORKING:
+            timer = engine.focus_timer
+            seconds = timer.seconds()
+            title = f"Focus {seconds // 60} min"
+            delay = timer.next_delay(step)
+        elif state == BREAK:
+            timer = engine.break_timer
+            seconds = timer.seconds()
+            title = f"Break {math.ceil(seconds / 60)} min left"
+            delay = timer.next_delay(step) # Wakes at the break's end at the latest
+        elif state == ALARM:
+            title = "Break over"
+            if self.flash and level != HIDDEN:
+                timer = engine.break_timer
+                flash = int(timer.elapsed() / FLASH_SECONDS) % 2 == 0
+                delay = timer.next_delay(FLASH_SECONDS)
+
+        frame = {"title": title}
+        if level != HIDDEN:
+            frame["clock"] = (state, seconds)
+            if self.flash:
+                frame["flash"] = flash
+        return frame, delay
+
+    def close(self):
+        if self._pending is not None:
+            self.cancel(self._pending)
+            self._pending = None
@@ -0,0 +1,369 @@
+"""
+Local HTTP service for dashboards (stdlib asyncio only).
+
+    python -m flowtime.server --port 8765 alice=flowtime_data.json bob=flowtime_v2.json
+
+Each source is any history the apps write (either JSON layout with its
+journal, or a FLOWTIME_DB file), read through the same storage backends.
+Routes, all JSON:
+
+    GET /api/users                      configured sources
+    GET /api/<user>/summary             totals, today, this week, top tasks
+    GET /api/<user>/daily               focus seconds per day and per task
+    GET /api/<user>/sessions?limit=&before=
+                                        newest first, one page at a time;
+                                        "next" is the `before` cursor for the next page
+
+Sessions in a tiered history's monthly segments (flowtime.tiers) are
+included: totals come from the segment headers, and a segment is only
+decompressed when a page of sessions reaches it.
+
+A source is only re-read when one of its files changes (mtime/size).
+Responses are cached per source version and carry that version as their
+ETag, so a dashboard polling with If-None-Match gets a bodyless 304 until
+something new is recorded. Session pages are sent with chunked transfer
+encoding as they are serialized. GET / serves index.html.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from email.utils import formatdate
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from flowtime.aggregate import Rollup
+from flowtime.core import SystemClock
+from flowtime.export import json_fields, json_row
+from flowtime.index import DAY, SessionIndex, day_start
+from flowtime.storage import SqliteBackend, open_history
+from flowtime.store import SessionStore
+from flowtime.tiers import MANIFEST, TieredHistory, segments_dir
+
+DEFAULT_PORT = 8765
+PAGE_SIZE = 100
+MAX_PAGE = 5000
+CHUNK_ROWS = 500 # Sessions per chunk of a streamed page
+CACHE_ENTRIES = 256 # Cached responses per source
+IDLE_TIMEOUT = 30 # Seconds a keep-alive connection may sit idle
+INDEX_HTML = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "index.html")
+
+REASONS = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class HistorySource:
+    """One user's history, reloaded only when its files change."""
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        # The history itself, a v2 journal next to it and a SQLite write-ahead log
+        self.watched = [path, os.path.splitext(path)[0] + ".journal", path + "-wal",
+                        os.path.join(segments_dir(path), MANIFEST)]
+
+        self.etag = None
+        self.store = None
+        self.index = None
+        self.tiers = None # Cold tier, when the history has segments
+        self._signature = None
+        self._rollup = None
+        self._cache = OrderedDict() # (route, params) -> response body
+        self._lock = asyncio.Lock()
+
+    def signature(self):
+        state = []
+        for path in self.watched:
+            try:
+                st = os.stat(path)
+                state.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                state.append((path, None, None))
+        return tuple(state)
+
+    async def refresh(self):
+        """Reloads on a worker thread if a file changed since the last load."""
+        signature = self.signature()
+        if signature == self._signature:
+            return
+        async with self._lock:
+            signature = self.signature()
+            if signature == self._signature:
+                return # Another request already reloaded it
+            store, tiers = await asyncio.get_running_loop().run_in_executor(None, self._read)
+            self.store = store
+            self.tiers = tiers
+            self.index = SessionIndex(store)
+            self._rollup = None
+            self._cache.clear()
+            self._signature = signature
+            self.etag = '"' + hashlib.sha1(repr(signature).encode()).hexdigest()[:20] + '"'
+
+    def _read(self):
+        """(hot store, TieredHistory or None), on a worker thread."""
+        tiers = TieredHistory(self.path) if os.path.isdir(segments_dir(self.path)) else None
+        if not os.path.exists(self.path):
+            return SessionStore(), tiers # Never create a history just by looking at it
+        # A fresh backend each time: the layout may have changed since the last
+        # read, and JournalBackend caches journal state between calls
+        backend = open_history(self.path, read_only=True)
+        store = backend.load()
+        if isinstance(backend, SqliteBackend):
+            backend.close(store) # Read-only: JournalBackend.close() would compact, so only this one
+        return store, tiers
+
+    def cached(self, key, build):
+        body = self._cache.get(key)
+        if body is None:
+            body = build()
+            self._cache[key] = body
+            if len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return body
+
+    # --- Views ---
+
+    def summary(self, now):
+        store, tiers = self.store, self.tiers
+        sessions, work, breaks = len(store), store.total_work, store.total_break
+        top = self.index.top_tasks(10)
+        if tiers is not None:
+            sessions += len(tiers)
+            work += tiers.total_work
+            breaks += tiers.total_break
+            top = tiers.top_tasks(self.index, 10)
+        return {
+            "user": self.name,
+            "sessions": sessions,
+            "work_sec": work,
+            "break_sec": breaks,
+            "today_sec": self.index.today(now),
+            "week_sec": self.index.this_week(now),
+            "top_tasks": [{"task": task, "work_sec": seconds} for task, seconds in top],
+        }
+
+    def daily(self):
+        if self._rollup is None:
+            self._rollup = Rollup()
+            self._rollup.add_store(self.store)
+            if self.tiers is not None:
+                self._rollup.add_tiers(self.tiers)
+        report = self._rollup.to_dict()
+        return {"user": self.name, "daily": report["daily"], "tasks": report["tasks"]}
+
+    def session_page(self, before, limit):
+        """
+        Newest-first page as a list of byte chunks, ending before index `before`.
+        Indices run over cold sessions first, then the hot store.
+        """
+        store = self.store
+        cold = len(self.tiers) if self.tiers is not None else 0
+        total = cold + len(store)
+        stop = total if before is None else max(0, min(before, total))
+        start = max(0, stop - limit)
+        head = {"user": self.name, "total": total, "next": start if start > 0 else None}
+        chunks = [(json.dumps(head)[:-1] + ', "sessions": [').encode()]
+        first = True
+        for hi in range(stop, start, -CHUNK_ROWS):
+            lo = max(start, hi - CHUNK_ROWS)
+            rows = []
+            archived = self.tiers.slice(lo, min(hi, cold)) if lo < cold else []
+            for i in range(hi - 1, lo - 1, -1):
+                if i >= cold:
+                    row = json_row(store, i - cold)
+                else:
+                    row = json_fields(*archived[i - lo])
+                row["index"] = i
+                rows.append(json.dumps(row))
+            chunks.append(((", " if not first else "") + ", ".join(rows)).encode())
+            first = False
+        chunks.append(b"]}")
+        return chunks
+
+
+class StatsServer:
+    def __init__(self, sources):
+        self.sources = {source.name: source for source in sources}
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                    return
+                keep_alive = await self.respond(head, writer)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, head, writer):
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            await self.send(writer, 400, {"error": "malformed request"}, keep_alive=False)
+            return False
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+        if method not in ("GET", "HEAD"):
+            await self.send(writer, 405, {"error": "only GET is supported"}, keep_alive=keep_alive)
+            return keep_alive
+        try:
+            status, body, etag = await self.route(target)
+        except HttpError as e:
+            status, body, etag = e.status, {"error": str(e)}, None
+        except Exception as e: # Keep serving other users if one history is broken
+            status, body, etag = 500, {"error": f"{type(e).__name__}: {e}"}, None
+
+        if etag is not None and etag in _etags(headers.get("if-none-match", "")):
+            status, body = 304, None
+        await self.send(writer, status, body, etag, keep_alive, head_only=method == "HEAD")
+        return keep_alive
+
+    async def route(self, target):
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        if not parts:
+            return 200, _StaticFile(INDEX_HTML), None
+        if parts[0] != "api":
+            raise HttpError(404, "not found")
+        if parts[1:] == ["users"]:
+            return 200, {"users": sorted(self.sources)}, None
+        if len(parts) != 3:
+            raise HttpError(404, "not found")
+
+        source = self.sources.get(parts[1])
+        if source is None:
+            raise HttpError(404, f"unknown user {parts[1]!r}")
+        await source.refresh()
+        query = parse_qs(url.query)
+
+        etag = source.etag
+        if parts[2] == "summary":
+            # "today" and "this week" also change at midnight, not only with the files
+            now = SystemClock().now()
+            today = day_start(now)
+            etag = f'{etag[:-1]}-{today // DAY}"'
+            body = source.cached(("summary", today), lambda: _encode(source.summary(now)))
+        elif parts[2] == "daily":
+            body = source.cached(("daily",), lambda: _encode(source.daily()))
+        elif parts[2] == "sessions":
+            limit = min(MAX_PAGE, _int_param(query, "limit", PAGE_SIZE))
+            before = _int_param(query, "before", None)
+            body = source.cached(("sessions", before, limit), lambda: source.session_page(before, limit))
+        else:
+            raise HttpError(404, "not found")
+        return 200, body, etag
+
+    async def send(self, writer, status, body, etag=None, keep_alive=True, head_only=False):
+        """`body`: a dict, encoded bytes, a list of byte chunks (streamed), a _StaticFile or None."""
+        content_type = "application/json"
+        if isinstance(body, dict):
+            body = _encode(body)
+        elif isinstance(body, _StaticFile):
+            body, content_type = body.data, body.content_type
+
+        headers = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                   f"Date: {formatdate(usegmt=True)}",
+                   "Access-Control-Allow-Origin: *",
+                   "Cache-Control: no-cache",
+                   f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if etag is not None:
+            headers.append(f"ETag: {etag}")
+        if body is not None:
+            headers.append(f"Content-Type: {content_type}")
+        if isinstance(body, list):
+            headers.append("Transfer-Encoding: chunked")
+        else:
+            headers.append(f"Content-Length: {len(body) if body is not None else 0}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1"))
+
+        if body is not None and not head_only:
+            if isinstance(body, list):
+                for chunk in body:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    await writer.drain() # Let slow clients apply backpressure
+                writer.write(b"0\r\n\r\n")
+            else:
+                writer.write(body)
+        await writer.drain()
+
+class _StaticFile:
+    """Read when route() builds it, so a missing file is an ordinary 404 response."""
+    def __init__(self, path, content_type="text/html; charset=utf-8"):
+        try:
+            with open(path, "rb") as f:
+                self.data = f.read()
+        except OSError:
+            raise HttpError(404, f"{os.path.basename(path)} not found")
+        self.content_type = content_type
+
+def _encode(data):
+    return json.dumps(data).encode()
+
+def _etags(header):
+    return {tag.strip() for tag in header.split(",") if tag.strip()}
+
+def _int_param(query, name, default):
+    values = query.get(name)
+    if not values:
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if value < 0:
+        raise HttpError(400, f"{name} must not be negative")
+    return value
+
+
+def parse_sources(specs):
+    """"name=path" or plain paths (named after the file's folder, or "default")."""
+    sources = []
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep:
+            path = spec
+            name = os.path.basename(os.path.dirname(os.path.abspath(path))) if len(specs) > 1 else "default"
+        sources.append(HistorySource(name, path))
+    return sources
+
+async def serve(sources, host="127.0.0.1", port=DEFAULT_PORT):
+    app = StatsServer(sources)
+    server = await asyncio.start_server(app.handle, host, port)
+    print(f"Serving {', '.join(sorted(app.sources))} on http://{host}:{port}/")
+    async with server:
+        await server.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve Flowtime history as JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("sources", nargs="*", default=["flowtime_data.json"],
+                        help="name=path or path (default: flowtime_data.json)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(parse_sources(args.sources), args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
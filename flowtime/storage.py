@@ -0,0 +1,376 @@
+"""
+Pluggable history storage.
+
+Every backend offers the same calls:
+    recent(count)  newest sessions as store rows, for the startup preview
+    load()         the full SessionStore (runs on the loader thread)
+    compact(store) housekeeping after load(), still on the loader thread,
+                   while nothing saves (a no-op for most backends)
+    save(store)    persist whatever changed since the last save: new
+                   sessions, and the edits in store.edits
+    edits_saved(store)
+                   position in store.edits that save() has caught up to; a
+                   snapshot for save() need only copy the edits after it
+    close(store)   flush and release files
+
+JsonFileBackend is the Tk app's flowtime_data.json, JournalBackend is the
+Kivy app's flowtime_v2.json + journal. Setting FLOWTIME_DB=<path> switches
+either app to SqliteBackend. Existing JSON histories can be imported with:
+
+    python -m flowtime.storage migrate --db flowtime.db flowtime_data.json flowtime_v2.json
+"""
+import argparse
+import json
+import os
+import pathlib
+import sqlite3
+from array import array
+
+from flowtime.journal import SessionJournal
+from flowtime.loader import head_items, load_store, tail_items
+from flowtime.persist import atomic_write
+from flowtime.records import detect_rows, load_rows, study_record, study_row, v2_fields, v2_record, v2_row
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, EDIT_SET, SessionStore
+
+BATCH_ROWS = 10000
+
+
+class StorageBackend:
+    def recent(self, count):
+        raise NotImplementedError
+
+    def load(self):
+        raise NotImplementedError
+
+    def compact(self, store):
+        pass
+
+    def save(self, store):
+        raise NotImplementedError
+
+    def edits_saved(self, store):
+        return len(store.edits) # Backends that rewrite everything need no edits
+
+    def close(self, store):
+        pass
+
+
+class JsonFileBackend(StorageBackend):
+    """flowtime_data.json: chronological list, rewritten whole on save (edits included)."""
+    def __init__(self, path):
+        self.path = path
+
+    def recent(self, count):
+        if not os.path.exists(self.path):
+            return []
+        return [study_row(r) for r in tail_items(self.path, count)]
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return SessionStore()
+        return load_store(self.path, study_row)
+
+    def save(self, store):
+        serializable = [study_record(store, i) for i in range(len(store))]
+        atomic_write(self.path, json.dumps(serializable, indent=4))
+
+
+class JournalBackend(StorageBackend):
+    """flowtime_v2.json snapshot (newest first) plus the append-only journal."""
+    def __init__(self, path):
+        self.journal = SessionJournal(path)
+        self._journal_state = None
+        self._saved = 0
+        self._edits = 0 # store.edits already journaled
+        self._generation = 0
+
+    def recent(self, count):
+        # Read the journal here, on the UI thread, so appends made while the
+        # snapshot loads can't be picked up twice
+        self._journal_state = self.journal.read_journal()
+        preview = []
+        if os.path.exists(self.journal.snapshot_path):
+            preview = head_items(self.journal.snapshot_path, count)
+            preview.reverse()
+        # Edit entries need the whole history; the full load applies them
+        added = [r for r in self._journal_state[1] if "_edit" not in r]
+        return [v2_row(r) for r in preview + added]
+
+    def load(self):
+        state = self._journal_state or self.journal.read_journal()
+        store = SessionStore()
+        if os.path.exists(self.journal.snapshot_path):
+            store = load_store(self.journal.snapshot_path, v2_row, newest_first=True)
+        for item in self.journal.unsaved_entries(len(store), state):
+            _replay(store, item)
+        store.edits.clear() # Already on disk
+        self._saved = len(store)
+        self._edits = 0
+        return store
+
+    def save(self, store):
+        if store.generation != self._generation:
+            # Cleared or rolled into tiers: a new snapshot replaces the old one atomically
+            # before the journal is reset, so a crash in between never loses the history
+            self.journal.compact([v2_record(store, i) for i in range(len(store))])
+            self._saved = len(store)
+            self._edits = len(store.edits)
+            self._generation = store.generation
+            return
+        edits, self._saved = store.edits_before(self._edits, self._saved)
+        for kind, i, _old, new in edits:
+            entry = {"_edit": kind, "i": i}
+            if new is not None:
+                entry["record"] = v2_fields(*new)
+            self.journal.append(entry)
+        self._edits = len(store.edits)
+        for i in range(self._saved, len(store)):
+            self.journal.append(v2_record(store, i))
+        self._saved = len(store)
+
+    def edits_saved(self, store):
+        return self._edits
+
+    def compact(self, store):
+        """Folds the journal into the snapshot if it has grown large. Nothing may save meanwhile."""
+        if self.journal.needs_compaction():
+            self.journal.compact([v2_record(store, i) for i in range(len(store))])
+
+    def close(self, store):
+        self.compact(store)
+        self.journal.close()
+
+
+class SqliteBackend(StorageBackend):
+    """
+    SQLite in WAL mode, indexed on start time and task.
+    Saves insert only the new sessions and touch only edited rows, so they
+    cost O(changes) however long the history is. Sessions load in start
+    time order, which is also where an edit inserts them.
+
+    With `read_only` (export, aggregate, archive, the stats server) the file
+    is opened with mode=ro and never created, switched to WAL or given tables.
+    """
+    def __init__(self, path, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self._conn = None
+        self._task_rowids = {}
+        self._ids = array('q') # Store index -> sessions.id
+        self._edits = 0 # store.edits already written
+        self._generation = 0
+
+    def connect(self):
+        if self.read_only:
+            uri = pathlib.Path(self.path).resolve().as_uri() + "?mode=ro"
+            return sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE);
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                task_id INTEGER NOT NULL REFERENCES tasks(id),
+                start INTEGER NOT NULL,
+                end INTEGER NOT NULL,
+                work INTEGER NOT NULL,
+                brk INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start);
+            CREATE INDEX IF NOT EXISTS sessions_task ON sessions(task_id, start);
+        """)
+        return conn
+
+    def _writer(self):
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn
+
+    def _task_rowid(self, conn, name):
+        rowid = self._task_rowids.get(name)
+        if rowid is None:
+            conn.execute("INSERT OR IGNORE INTO tasks (name) VALUES (?)", (name,))
+            rowid = conn.execute("SELECT id FROM tasks WHERE name = ?", (name,)).fetchone()[0]
+            self._task_rowids[name] = rowid
+        return rowid
+
+    # --- Reading ---
+
+    def recent(self, count):
+        if self.read_only and not os.path.exists(self.path):
+            return []
+        conn = self.connect()
+        try:
+            rows = conn.execute(
+                "SELECT t.name, s.start, s.end, s.work, s.brk FROM sessions s "
+                "JOIN tasks t ON t.id = s.task_id ORDER BY s.start DESC, s.id DESC LIMIT ?", (count,)).fetchall()
+        finally:
+            conn.close()
+        rows.reverse()
+        return rows
+
+    def load(self):
+        if self.read_only and not os.path.exists(self.path):
+            return SessionStore()
+        conn = self.connect() # Own connection: this runs on the loader thread
+        try:
+            names = dict(conn.execute("SELECT id, name FROM tasks"))
+            store = SessionStore()
+            ids = array('q')
+            cursor = conn.execute("SELECT id, task_id, start, end, work, brk FROM sessions ORDER BY start, id")
+            while True:
+                batch = cursor.fetchmany(BATCH_ROWS)
+                if not batch:
+                    break
+                for rowid, task_id, start, end, work, brk in batch:
+                    ids.append(rowid)
+                    store.append(names[task_id], start, end, work, brk)
+        finally:
+            conn.close()
+        self._ids = ids
+        self._edits = 0
+        return store
+
+    # --- Writing ---
+
+    def save(self, store):
+        conn = self._writer()
+        with conn:
+            if store.generation != self._generation:
+                conn.execute("DELETE FROM sessions")
+                self._ids = array('q')
+                self._edits = len(store.edits)
+                self._generation = store.generation
+
+            edits, _ = store.edits_before(self._edits, len(self._ids))
+            for kind, i, _old, new in edits:
+                self._write_edit(conn, kind, i, new)
+            self._edits = len(store.edits)
+
+            # A break measured after its session was saved arrives as an edit too
+            for i in range(len(self._ids), len(store)):
+                cursor = conn.execute(
+                    "INSERT INTO sessions (task_id, start, end, work, brk) VALUES (?, ?, ?, ?, ?)",
+                    (self._task_rowid(conn, store.task(i)), store.starts[i], store.ends[i],
+                     store.work[i], store.breaks[i]))
+                self._ids.append(cursor.lastrowid)
+
+    def edits_saved(self, store):
+        return self._edits
+
+    def _write_edit(self, conn, kind, i, row):
+        if kind == EDIT_DELETE:
+            conn.execute("DELETE FROM sessions WHERE id = ?", (self._ids[i],))
+            del self._ids[i]
+            return
+        task, start, end, work, brk = row
+        values = (self._task_rowid(conn, task), start, end, work, brk)
+        if kind == EDIT_SET:
+            conn.execute("UPDATE sessions SET task_id = ?, start = ?, end = ?, work = ?, brk = ? WHERE id = ?",
+                         values + (self._ids[i],))
+        elif kind == EDIT_INSERT:
+            cursor = conn.execute(
+                "INSERT INTO sessions (task_id, start, end, work, brk) VALUES (?, ?, ?, ?, ?)", values)
+            self._ids.insert(i, cursor.lastrowid)
+
+    def session_keys(self):
+        """(task, start, end) of every stored session."""
+        return set(self._writer().execute(
+            "SELECT t.name, s.start, s.end FROM sessions s JOIN tasks t ON t.id = s.task_id"))
+
+    def insert_rows(self, rows):
+        """Bulk import of (task, start, end, work, break) rows in batched transactions."""
+        conn = self._writer()
+        batch = []
+        with conn:
+            for task, start, end, work, brk in rows:
+                batch.append((self._task_rowid(conn, task), start, end, work, brk))
+                if len(batch) >= BATCH_ROWS:
+                    conn.executemany("INSERT INTO sessions (task_id, start, end, work, brk) VALUES (?, ?, ?, ?, ?)", batch)
+                    batch = []
+            if batch:
+                conn.executemany("INSERT INTO sessions (task_id, start, end, work, brk) VALUES (?, ?, ?, ?, ?)", batch)
+
+    def close(self, store):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _replay(store, item):
+    """Applies one journal entry (a record or an edit) to a store."""
+    kind = item.get("_edit")
+    if kind is None:
+        store.append(*v2_row(item))
+    elif kind == EDIT_SET:
+        store.replace(item["i"], *v2_row(item["record"]))
+    elif kind == EDIT_INSERT:
+        store.insert(item["i"], *v2_row(item["record"]))
+    elif kind == EDIT_DELETE:
+        store.delete(item["i"])
+
+
+def open_history(path, read_only=False):
+    """
+    Backend for any history file the apps write, picked from its contents.
+    `read_only` keeps tools that only read from creating or converting a database.
+    """
+    if path.endswith(".db"):
+        return SqliteBackend(path, read_only)
+    first = head_items(path, 1) if os.path.exists(path) else []
+    if detect_rows(first) is study_row:
+        return JsonFileBackend(path)
+    return JournalBackend(path)
+
+def open_backend(default):
+    """SqliteBackend when FLOWTIME_DB is set, otherwise the app's own JSON backend."""
+    db_path = os.environ.get("FLOWTIME_DB")
+    if db_path:
+        return SqliteBackend(db_path)
+    return default
+
+
+# --- Migration ---
+
+def read_history(path):
+    """Rows from either JSON layout, including a v2 journal if one sits next to it."""
+    journal = SessionJournal(path)
+    if os.path.exists(journal.journal_path):
+        records = journal.load()
+        return [detect_rows(records)(r) for r in records]
+    return load_rows(path)
+
+def migrate(db_path, paths):
+    """Imports the sessions the database does not hold yet, so running it again adds nothing."""
+    backend = SqliteBackend(db_path)
+    present = backend.session_keys()
+    total = 0
+    for path in paths:
+        rows = []
+        history = read_history(path)
+        for row in history:
+            if row[:3] not in present:
+                present.add(row[:3])
+                rows.append(row)
+        backend.insert_rows(rows)
+        total += len(rows)
+        print(f"{path}: {len(rows)} sessions ({len(history) - len(rows)} already imported)")
+    backend.close(None)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flowtime storage tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    cmd = commands.add_parser("migrate", help="bulk-import JSON histories into SQLite")
+    cmd.add_argument("--db", default="flowtime.db")
+    cmd.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        total = migrate(args.db, args.paths)
+        print(f"Imported {total} sessions into {args.db}")
+
+if __name__ == "__main__":
+    main()
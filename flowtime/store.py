@@ -0,0 +1,232 @@
+from array import array
+
+from flowtime.records import NO_BREAK
+from flowtime.tasks import TaskRegistry
+
+# Kinds of entries in SessionStore.edits
+EDIT_SET = "set"
+EDIT_INSERT = "insert"
+EDIT_DELETE = "delete"
+
+
+class EditLog:
+    """
+    SessionStore.edits: the logged edits, numbered from 0 for the life of the
+    store. Consumers keep a position (len() when they last caught up) and
+    slice from it. A copy made for a consumer keeps only the entries from
+    `base` on, so it costs what changed since that consumer's position
+    rather than the whole run's edits; earlier positions are not valid in it.
+    """
+    def __init__(self, entries=(), base=0):
+        self.base = base
+        self._entries = list(entries)
+
+    def __len__(self):
+        return self.base + len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start = self.base if key.start is None else key.start
+            if start < self.base or key.stop is not None or key.step is not None:
+                raise IndexError("EditLog slices run from a position to the end")
+            return self._entries[start - self.base:]
+        if not self.base <= key < len(self):
+            raise IndexError(f"Edit {key} is not in the log")
+        return self._entries[key - self.base]
+
+    def append(self, edit):
+        self._entries.append(edit)
+
+    def clear(self):
+        """Forgets every entry and numbers from 0 again; only before anything follows the store."""
+        self.base = 0
+        self._entries = []
+
+    def since(self, position):
+        """Copy holding the entries from `position` on."""
+        base = min(max(position, self.base), len(self))
+        return EditLog(self[base:], base)
+
+
+
+class SessionStore:
+    """
+    Columnar session history shared by both front-ends.
+
+    Each session is five machine integers spread over typed arrays
+    (start, end, work seconds, break seconds, task id) instead of a dict of
+    strings. Task names are interned once in `tasks`. Totals are kept
+    up to date on every change, so stats never rescan the history.
+
+    Appends are the normal case; everything else (set_break, replace,
+    insert, delete) is logged in `edits` as (kind, index, old row, new row) so indexes and
+    backends can catch up on just those rows (see `edits_before`).
+    """
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.work = array('q')
+        self.breaks = array('q')
+        self.task_ids = array('l')
+
+        self.tasks = TaskRegistry()
+
+        self.total_work = 0
+        self.total_break = 0
+        self.generation = 0 # Bumped by clear() so backends know to start over
+        self.edits = EditLog()
+
+    def __len__(self):
+        return len(self.starts)
+
+    # --- Tasks ---
+
+    @property
+    def task_names(self):
+        return self.tasks.names
+
+    def intern_task(self, name):
+        return self.tasks.intern(name)
+
+    def task_id(self, name):
+        """Id of an already interned task name, or None."""
+        return self.tasks.lookup(name)
+
+    def task(self, i):
+        return self.tasks.names[self.task_ids[i]]
+
+    # --- Updates ---
+
+    def append(self, task, start, end, work, brk=NO_BREAK):
+        """Adds a session and returns its index."""
+        self.starts.append(start)
+        self.ends.append(end)
+        self.work.append(work)
+        self.breaks.append(brk)
+        self.task_ids.append(self.tasks.add(task))
+
+        self.total_work += work
+        if brk != NO_BREAK:
+            self.total_break += brk
+        return len(self.starts) - 1
+
+    def extend(self, rows):
+        """Bulk append of (task, start, end, work, break) tuples."""
+        for row in rows:
+            self.append(*row)
+
+    def set_break(self, i, seconds):
+        """Measured (or chosen) break of session `i`; logged in `edits` like replace()."""
+        old = self.breaks[i]
+        if seconds == old:
+            return
+        row = self.row(i)
+        if old != NO_BREAK:
+            self.total_break -= old
+        if seconds != NO_BREAK:
+            self.total_break += seconds
+        self.breaks[i] = seconds
+        self.edits.append((EDIT_SET, i, row, row[:4] + (seconds,)))
+
+    # --- Edits ---
+
+    def _count(self, task_id, work, brk, sign):
+        self.total_work += sign * work
+        if brk != NO_BREAK:
+            self.total_break += sign * brk
+        if sign < 0:
+            self.tasks.release(task_id)
+
+    def replace(self, i, task, start, end, work, brk):
+        old = self.row(i)
+        self._count(self.task_ids[i], self.work[i], self.breaks[i], -1)
+        self.task_ids[i] = self.tasks.add(task)
+        self.starts[i], self.ends[i], self.work[i], self.breaks[i] = start, end, work, brk
+        self._count(None, work, brk, 1)
+        self.edits.append((EDIT_SET, i, old, self.row(i)))
+
+    def insert(self, i, task, start, end, work, brk=NO_BREAK):
+        """Adds a session at index `i`; later sessions move up by one."""
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.work.insert(i, work)
+        self.breaks.insert(i, brk)
+        self.task_ids.insert(i, self.tasks.add(task))
+        self._count(None, work, brk, 1)
+        self.edits.append((EDIT_INSERT, i, None, self.row(i)))
+
+    def delete(self, i):
+        old = self.row(i)
+        self._count(self.task_ids[i], self.work[i], self.breaks[i], -1)
+        for column in (self.starts, self.ends, self.work, self.breaks, self.task_ids):
+            del column[i]
+        self.edits.append((EDIT_DELETE, i, old, None))
+
+    def edits_before(self, position, seen):
+        """
+        For a consumer that has processed the first `seen` sessions and the
+        first `position` edits: (edits it must apply, its new `seen`). Edits
+        to sessions past `seen` are left out, since those sessions will be
+        read as new ones anyway.
+        """
+        relevant = []
+        for n in range(position, len(self.edits)):
+            edit = self.edits[n]
+            kind, i = edit[0], edit[1]
+            if i < seen:
+                relevant.append(edit)
+                if kind == EDIT_INSERT:
+                    seen += 1
+                elif kind == EDIT_DELETE:
+                    seen -= 1
+        return relevant, seen
+
+    def clear(self):
+        generation = self.generation
+        self.__init__()
+        self.generation = generation + 1
+
+    def copy(self, edits_from=0):
+        """
+        Independent snapshot (plain memory copies), safe to hand to another
+        thread. Only the edits from position `edits_from` on are copied.
+        """
+        other = SessionStore()
+        other.starts, other.ends, other.work = array('q', self.starts), array('q', self.ends), array('q', self.work)
+        other.breaks, other.task_ids = array('q', self.breaks), array('l', self.task_ids)
+        other.tasks = self.tasks.copy()
+        other.total_work, other.total_break = self.total_work, self.total_break
+        other.generation = self.generation
+        other.edits = self.edits.since(edits_from)
+        return other
+
+    def adopt(self, full, preview_len):
+        """
+        Swaps in `full` (loaded in the background) for a preview that held
+        its last `preview_len` sessions. Sessions added to the preview since
+        then, and the break measured for its last loaded session, carry over.
+        """
+        added = [self.row(i) for i in range(preview_len, len(self))]
+        last_break = self.breaks[preview_len - 1] if preview_len else NO_BREAK
+
+        self.starts, self.ends, self.work = full.starts, full.ends, full.work
+        self.breaks, self.task_ids = full.breaks, full.task_ids
+        self.tasks = full.tasks
+        self.total_work, self.total_break = full.total_work, full.total_break
+        self.edits = full.edits
+
+        if preview_len and len(self):
+            self.set_break(len(self) - 1, last_break)
+        self.extend(added)
+
+    # --- Reading ---
+
+    def row(self, i):
+        return (self.task(i), self.starts[i], self.ends[i], self.work[i], self.breaks[i])
+
+    def rows(self):
+        for i in range(len(self.starts)):
+            yield self.row(i)
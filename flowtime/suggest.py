@@ -0,0 +1,187 @@
+"""
+Break suggestions learned from the user's own history.
+
+Every finished session with a known break contributes one observation,
+the break/focus ratio, to three scopes: all sessions, the session's task,
+and its time of day (three-hour buckets). Each scope keeps an
+exponentially weighted mean and a P-square median sketch, so an update is
+O(1) and nothing is ever rescanned: only sessions added since the last
+call are read, and a fresh or reloaded history is warmed from its most
+recent WARM_SESSIONS sessions.
+"""
+import math
+
+from flowtime.index import DAY
+from flowtime.records import NO_BREAK
+
+ALPHA = 0.1 # EWMA weight of the newest observation
+MIN_SAMPLES = 5 # Observations before a scope is trusted
+MAX_BREAK = 2 * 3600 # Longer gaps are days off, not breaks
+MAX_RATIO = 2.0
+HOUR_BUCKET = 3 * 3600
+WARM_SESSIONS = 5000
+
+
+def default_minutes(work_seconds):
+    """The fixed rule used before there is any history: max(3, work/5)."""
+    work_minutes = work_seconds // 60
+    if work_minutes <= 15:
+        return 3
+    return max(3, int(work_minutes / 5))
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate in constant memory (Jain & Chlamtac's P²
+    algorithm): five markers whose heights track the quantile.
+    """
+    def __init__(self, p=0.5):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.steps = [0, p / 2, p, (1 + p) / 2, 1]
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.steps[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    def value(self):
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[(len(q) - 1) // 2]
+        return q[2]
+
+
+class RatioStats:
+    """EWMA and median of break/focus ratios for one scope."""
+    def __init__(self):
+        self.ewma = None
+        self.median = P2Quantile(0.5)
+
+    @property
+    def count(self):
+        return self.median.count
+
+    def add(self, ratio):
+        self.ewma = ratio if self.ewma is None else self.ewma + ALPHA * (ratio - self.ewma)
+        self.median.add(ratio)
+
+    def ratio(self):
+        """Median once the sketch is warm (robust to the odd long break), EWMA before."""
+        if self.count >= MIN_SAMPLES:
+            return self.median.value()
+        return self.ewma
+
+
+class BreakAdvisor:
+    """Incrementally trained break/focus model over a SessionStore."""
+    def __init__(self, store):
+        self.store = store
+        self.reset()
+
+    def reset(self):
+        self.overall = RatioStats()
+        self.by_task = {} # task id -> RatioStats
+        self.by_hour = {} # three-hour bucket -> RatioStats
+        self._column_ref = self.store.starts
+        self._seen = max(0, len(self.store) - WARM_SESSIONS)
+        self._edits = len(self.store.edits)
+
+    def sync(self):
+        store = self.store
+        if store.starts is not self._column_ref or len(store) < self._seen:
+            self.reset() # Store was cleared or replaced
+        # Sketches can't forget a sample: an edit to a learned session retrains the warm window
+        edits, self._seen = store.edits_before(self._edits, self._seen)
+        self._edits = len(store.edits)
+        if edits:
+            self.reset()
+        i = self._seen
+        last = len(store) - 1
+        while i <= last:
+            brk = store.breaks[i]
+            if brk == NO_BREAK and i == last:
+                break # Newest break is still running; learn it next time
+            self.observe(store.task_ids[i], store.ends[i], store.work[i], brk)
+            i += 1
+        self._seen = i
+
+    def observe(self, task_id, end, work, brk):
+        if brk == NO_BREAK or work <= 0 or brk > MAX_BREAK:
+            return
+        ratio = min(MAX_RATIO, brk / work)
+        self.overall.add(ratio)
+        self._scope(self.by_task, task_id).add(ratio)
+        self._scope(self.by_hour, end % DAY // HOUR_BUCKET).add(ratio)
+
+    def _scope(self, table, key):
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = RatioStats()
+        return stats
+
+    def ratio(self, task=None, at=None):
+        """Learned break/focus ratio for `task` ending at `at`, or None without history."""
+        self.sync()
+        if self.overall.count < MIN_SAMPLES:
+            return None
+        base = self.overall.ratio()
+        ratio = base
+
+        task_id = self.store.task_id(task) if task is not None else None
+        task_stats = self.by_task.get(task_id)
+        if task_stats is not None and task_stats.count >= MIN_SAMPLES:
+            ratio = task_stats.ratio()
+
+        # Time of day scales whatever we have by how that slot compares to the average
+        hour_stats = self.by_hour.get(at % DAY // HOUR_BUCKET) if at is not None else None
+        if hour_stats is not None and hour_stats.count >= MIN_SAMPLES and base > 0:
+            ratio *= min(2.0, max(0.5, hour_stats.ratio() / base))
+        return ratio
+
+    def suggest(self, work_seconds, task=None, at=None):
+        """Break length in whole minutes for a session of `work_seconds`."""
+        ratio = self.ratio(task, at)
+        if ratio is None:
+            return default_minutes(work_seconds)
+        return max(1, int(math.floor(ratio * work_seconds / 60 + 0.5)))
@@ -0,0 +1,506 @@
+"""
+Multi-device history sync.
+
+Every session has a stable id, derived from what never changes once it is
+recorded: its task, start and end (`record_id`). A device sends each
+session as an operation {"id", "clock", "device", "row"}, where `clock` is
+the device's Lamport clock: one more than anything it has sent or seen.
+When two devices change the same session (say, a break measured on the
+phone and corrected on the desktop), the op with the higher
+(clock, device) wins everywhere. Editing a session's task or times
+changes its id, so an edit is sent as a delete op ("deleted": true) for
+the old id plus the session under its new one. Edits to sessions already
+pushed wait in an outbox in the sync state until the server has them.
+
+The server keeps accepted ops in a numbered log. A round of sync:
+
+    push   the outbox, then local sessions from the `pushed` watermark
+           on, in gzip batches
+    pull   ops after the `pulled` log position, in gzip batches
+
+Both watermarks live in <history>.sync.json and advance after each
+acknowledged batch, so an interrupted transfer picks up where it stopped;
+a batch that did get through but was not acknowledged is simply sent
+again, since applying the same op twice changes nothing. A round costs
+O(new sessions) on both ends, never a pass over the whole history.
+
+Set FLOWTIME_SYNC=<url> to sync either app. A stand-in server for testing:
+
+    python -m flowtime.sync serve --port 8766 --log sync-log.jsonl
+    python -m flowtime.sync run --server http://127.0.0.1:8766 flowtime_data.json
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import uuid
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+from urllib.request import Request, urlopen
+
+from flowtime.persist import atomic_write
+from flowtime.records import NO_BREAK
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, EDIT_SET
+
+DEFAULT_PORT = 8766
+BATCH_OPS = 500 # Ops per request, each way
+PULL_BATCHES = 20 # Pull requests per round; the rest waits for the next round
+TIMEOUT = 30
+
+
+def record_id(task, start, end):
+    return hashlib.blake2b(f"{start}\0{end}\0{task}".encode(), digest_size=8).hexdigest()
+
+def encode(data):
+    return gzip.compress(json.dumps(data, separators=(",", ":")).encode(), compresslevel=6)
+
+def decode(body):
+    return json.loads(gzip.decompress(body))
+
+def state_path(history_path):
+    return os.path.splitext(history_path)[0] + ".sync.json"
+
+
+class SyncState:
+    """This device's id, Lamport clock and watermarks, saved after every batch."""
+    def __init__(self, path):
+        self.path = path
+        self.device = uuid.uuid4().hex[:12]
+        self.clock = 0
+        self.pushed = 0 # Local sessions before this index are on the server
+        self.pushed_id = None # Id of session pushed - 1, to notice a rewritten history
+        self.pulled = 0 # Server log position applied locally
+        self.pending = [] # [task, start, end] of pushed sessions whose break was still running
+        self.outbox = [] # Ops for edits to pushed sessions, until the server acknowledges them
+        if os.path.exists(path):
+            with open(path) as f:
+                self.__dict__.update(json.load(f))
+
+    def save(self):
+        fields = {k: v for k, v in self.__dict__.items() if k != "path"}
+        atomic_write(self.path, json.dumps(fields))
+
+    def tick(self):
+        self.clock += 1
+        return self.clock
+
+    def observe(self, clock):
+        if clock > self.clock:
+            self.clock = clock
+
+
+class _Lookup:
+    """
+    Store indices ordered by start time, to find a session by (task, start,
+    end). Edited sessions are moved in place; an insert or delete shifts
+    the indices, so the lookup is rebuilt on the next find.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.reset()
+
+    def reset(self):
+        self.starts = array('q')
+        self.indices = array('q')
+        self._seen = 0
+        self._edits = len(self.store.edits)
+        self._column_ref = self.store.starts
+
+    def sync(self):
+        store = self.store
+        if store.starts is not self._column_ref:
+            self.reset() # Store was cleared or replaced
+        edits, self._seen = store.edits_before(self._edits, self._seen)
+        self._edits = len(store.edits)
+        if any(kind != EDIT_SET for kind, _i, _old, _new in edits) or len(store) < self._seen:
+            self.reset()
+        else:
+            for _kind, i, old, new in edits:
+                self._move(i, old[1], new[1])
+        for i in range(self._seen, len(store)):
+            start = store.starts[i]
+            if not self.starts or start >= self.starts[-1]:
+                # Sessions normally arrive in time order: O(1)
+                self.starts.append(start)
+                self.indices.append(i)
+            else:
+                pos = bisect_right(self.starts, start)
+                self.starts.insert(pos, start)
+                self.indices.insert(pos, i)
+        self._seen = len(store)
+
+    def _move(self, i, old_start, start):
+        pos = bisect_left(self.starts, old_start)
+        while self.indices[pos] != i:
+            pos += 1
+        del self.starts[pos]
+        del self.indices[pos]
+        pos = bisect_right(self.starts, start)
+        self.starts.insert(pos, start)
+        self.indices.insert(pos, i)
+
+    def find(self, task, start, end):
+        self.sync()
+        store = self.store
+        pos = bisect_left(self.starts, start)
+        while pos < len(self.starts) and self.starts[pos] == start:
+            i = self.indices[pos]
+            if store.ends[i] == end and store.task(i) == task:
+                return i
+            pos += 1
+        return None
+
+
+class SyncClient:
+    """
+    Syncs one SessionStore. The network part (`exchange`) may run on a
+    worker thread; `outgoing` and `apply` touch the store and belong on the
+    thread that owns it.
+    """
+    def __init__(self, store, state, transport, batch=BATCH_OPS):
+        self.store = store
+        self.state = state
+        self.transport = transport
+        self.batch = batch
+        self._lookup = _Lookup(store)
+        self._edits = len(store.edits)
+        self._column_ref = store.starts
+
+    def _op(self, i):
+        return self._row_op(self.store.row(i))
+
+    def _row_op(self, row, deleted=False):
+        op = {"id": record_id(*row[:3]), "clock": self.state.tick(), "device": self.state.device,
+              "row": list(row)}
+        if deleted:
+            op["deleted"] = True
+        return op
+
+    def capture(self):
+        """
+        Moves edits to already pushed sessions into the outbox and keeps the
+        `pushed` watermark on the same sessions. Call before closing, so
+        the outbox is saved for the next run.
+        """
+        store, state = self.store, self.state
+        if store.starts is not self._column_ref:
+            # Cleared or reloaded: the pushed_id check in outgoing() takes care of it
+            self._edits = len(store.edits)
+            self._column_ref = store.starts
+            return
+        edits, state.pushed = store.edits_before(self._edits, state.pushed)
+        self._edits = len(store.edits)
+        if not edits:
+            return
+        for _kind, _i, old, new in edits:
+            if old is not None and (new is None or old[:3] != new[:3]):
+                state.outbox.append(self._row_op(old, deleted=True))
+            if new is not None:
+                state.outbox.append(self._row_op(new))
+        state.pushed_id = record_id(*_key(store, state.pushed - 1)) if state.pushed else None
+        state.save()
+
+    def outgoing(self):
+        """
+        [(index, op)] for what the server has not seen: the outbox, sessions
+        from the `pushed` watermark on, and pushed sessions whose break has
+        been measured since (index None: they do not move the watermark).
+        """
+        self.capture()
+        store, state = self.store, self.state
+        self._newest = len(store) - 1
+        ops = [(None, op) for op in state.outbox]
+        for key in state.pending:
+            i = self._lookup.find(*key)
+            if i is not None and store.breaks[i] != NO_BREAK:
+                ops.append((None, self._op(i)))
+
+        start = state.pushed
+        if start > len(store) or (start and record_id(*_key(store, start - 1)) != state.pushed_id):
+            start = 0 # History was cleared, rolled into tiers or replaced: offer it again
+        ops.extend((i, self._op(i)) for i in range(start, len(store)))
+        return ops
+
+    def exchange(self, ops):
+        """
+        Pushes `ops` and pulls what other devices sent, one batch per
+        request. Returns (pulled ops, log position after them, more waiting).
+        """
+        state = self.state
+        for lo in range(0, len(ops), self.batch):
+            chunk = ops[lo:lo + self.batch]
+            self.transport.push(state.device, [op for _, op in chunk])
+            for i, op in chunk:
+                if state.outbox and state.outbox[0] is op:
+                    state.outbox.pop(0)
+                key = op["row"][:3]
+                if op.get("deleted") or op["row"][4] != NO_BREAK:
+                    if key in state.pending:
+                        state.pending.remove(key)
+                elif i == self._newest and key not in state.pending:
+                    state.pending.append(key) # Break still running: send it again once measured
+                if i is not None:
+                    state.pushed = i + 1
+                    state.pushed_id = op["id"]
+            state.save() # Acknowledged: an interrupted round resumes after this batch
+
+        pulled = []
+        position = state.pulled
+        more = False
+        for _ in range(PULL_BATCHES):
+            reply = self.transport.pull(state.device, position, self.batch)
+            pulled.extend(reply["ops"])
+            position, more = reply["next"], reply["more"]
+            if not more:
+                break
+        return pulled, position, more
+
+    def apply(self, ops, position):
+        """
+        Merges pulled ops into the store and records `position` as pulled.
+        New sessions go in at their place by start time. Returns the store
+        edits made, as (kind, index, old row, new row) in order, so a view
+        can follow them one by one like an Editor operation. Applying an op
+        twice is a no-op, and an op that loses to a local edit still in the
+        outbox is skipped: the server will keep the local one too.
+        """
+        store, state = self.store, self.state
+        self.capture() # Local edits first; the ones made here are not sent back
+        local = {op["id"]: (op["clock"], op["device"]) for op in state.outbox}
+        caught_up = state.pushed == len(store)
+        position_before = len(store.edits)
+        # Deletes and inserts wait for the end, so the lookup stays valid for the whole batch
+        doomed = set()
+        fresh = {} # (task, start, end) -> (work, break) of sessions new here
+        for op in ops:
+            state.observe(op["clock"])
+            if op["id"] in local and (op["clock"], op["device"]) < local[op["id"]]:
+                continue
+            task, start, end, work, brk = op["row"]
+            key = (task, start, end)
+            i = self._lookup.find(*key)
+            if op.get("deleted"):
+                fresh.pop(key, None)
+                if i is not None:
+                    doomed.add(i)
+            elif i is None:
+                fresh[key] = (work, brk)
+            else:
+                doomed.discard(i)
+                if store.breaks[i] != brk or store.work[i] != work:
+                    store.replace(i, task, start, end, work, brk)
+        for i in sorted(doomed, reverse=True):
+            store.delete(i)
+        for (task, start, end), (work, brk) in sorted(fresh.items(), key=lambda item: item[0][1]):
+            # Usually newer than anything here, which makes this an append
+            store.insert(bisect_right(store.starts, start), task, start, end, work, brk)
+        _, state.pushed = store.edits_before(position_before, state.pushed)
+        self._edits = len(store.edits)
+        if (fresh or doomed) and caught_up:
+            # Nothing local was waiting, so the new sessions need not be echoed back
+            state.pushed = len(store)
+        if fresh or doomed:
+            state.pushed_id = record_id(*_key(store, state.pushed - 1)) if state.pushed else None
+        if position != state.pulled or ops:
+            state.pulled = position
+            state.save()
+        return store.edits[position_before:]
+
+    def sync(self):
+        """
+        Complete rounds on the calling thread, until nothing is waiting (CLI
+        and tests). Returns the store edits made, like apply().
+        """
+        edits = []
+        ops = self.outgoing()
+        more = True
+        while more:
+            pulled, position, more = self.exchange(ops)
+            edits += self.apply(pulled, position)
+            ops = []
+        return edits
+
+def _key(store, i):
+    return store.task(i), store.starts[i], store.ends[i]
+
+
+# --- Server ---
+
+class SyncServer:
+    """
+    Stand-in sync server: an append-only op log, replayed from `log_path`
+    on start. Ops that do not change a session, or lose to what the server
+    already has, are dropped, which makes resent batches harmless.
+    """
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self.ops = [] # Accepted ops; op["seq"] == position + 1
+        self.latest = {} # Session id -> (clock, device, row, deleted)
+        self._lock = threading.Lock()
+        self._log = None
+        if log_path and os.path.exists(log_path):
+            with open(log_path) as f:
+                for line in f:
+                    if line.endswith("\n"): # Skip a torn last line
+                        self._accept(json.loads(line))
+        if log_path:
+            self._log = open(log_path, "a")
+
+    def _accept(self, op):
+        current = self.latest.get(op["id"])
+        deleted = op.get("deleted", False)
+        if current is not None and (current[2:] == (op["row"], deleted) or current[:2] >= (op["clock"], op["device"])):
+            return None
+        op = dict(op, seq=len(self.ops) + 1)
+        self.ops.append(op)
+        self.latest[op["id"]] = (op["clock"], op["device"], op["row"], deleted)
+        return op
+
+    def push(self, device, ops):
+        with self._lock:
+            accepted = [op for op in (self._accept(op) for op in ops) if op is not None]
+            if self._log is not None and accepted:
+                self._log.write("".join(json.dumps(op) + "\n" for op in accepted))
+                self._log.flush()
+                os.fsync(self._log.fileno())
+            return {"accepted": len(accepted), "seq": len(self.ops)}
+
+    def pull(self, device, since, limit):
+        """
+        Up to `limit` ops logged after `since`, leaving out the device's own
+        and any that a later op for the same session has beaten.
+        """
+        with self._lock:
+            end = min(len(self.ops), since + limit)
+            ops = [op for op in self.ops[since:end]
+                   if op["device"] != device and self.latest[op["id"]][:2] == (op["clock"], op["device"])]
+            return {"ops": ops, "next": end, "more": end < len(self.ops)}
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+
+
+class LocalTransport:
+    """Talks to a SyncServer in the same process, through the same encoding as HTTP."""
+    def __init__(self, server):
+        self.server = server
+
+    def push(self, device, ops):
+        return decode(encode(self.server.push(device, decode(encode(ops)))))
+
+    def pull(self, device, since, limit):
+        return decode(encode(self.server.pull(device, since, limit)))
+
+class HttpTransport:
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, request):
+        with urlopen(request, timeout=self.timeout) as response:
+            return decode(response.read())
+
+    def push(self, device, ops):
+        request = Request(f"{self.url}/push", data=encode({"device": device, "ops": ops}), method="POST",
+                          headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        return self._request(request)
+
+    def pull(self, device, since, limit):
+        query = urlencode({"device": device, "since": since, "limit": limit})
+        return self._request(Request(f"{self.url}/pull?{query}"))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FlowtimeSync/1"
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/push":
+            return self.send_error(404)
+        body = decode(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self._reply(self.server.sync.push(body["device"], body["ops"]))
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path != "/pull":
+            return self.send_error(404)
+        query = parse_qs(url.query)
+        try:
+            since = int(query.get("since", ["0"])[0])
+            limit = min(BATCH_OPS * 10, int(query.get("limit", [str(BATCH_OPS)])[0]))
+        except ValueError:
+            return self.send_error(400)
+        self._reply(self.server.sync.pull(query.get("device", [""])[0], since, limit))
+
+    def _reply(self, data):
+        body = encode(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(sync_server, host="127.0.0.1", port=DEFAULT_PORT):
+    httpd = ThreadingHTTPServer((host, port), _Handler)
+    httpd.sync = sync_server
+    return httpd
+
+
+def open_sync(history_path, store):
+    """SyncClient for the app's history when FLOWTIME_SYNC=<url> is set, else None."""
+    url = os.environ.get("FLOWTIME_SYNC")
+    if not url:
+        return None
+    return SyncClient(store, SyncState(state_path(history_path)), HttpTransport(url))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flowtime multi-device sync")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="run the stand-in sync server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--log", help="op log file (default: in memory only)")
+    run = sub.add_parser("run", help="sync a history file once")
+    run.add_argument("--server", required=True, help="http://host:port")
+    run.add_argument("history")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        sync_server = SyncServer(args.log)
+        httpd = make_server(sync_server, args.host, args.port)
+        print(f"Sync server on http://{args.host}:{args.port}/ ({len(sync_server.ops)} ops logged)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+            sync_server.close()
+        return 0
+
+    from flowtime.storage import open_history
+    backend = open_history(args.history)
+    store = backend.load()
+    client = SyncClient(store, SyncState(state_path(args.history)), HttpTransport(args.server))
+    edits = client.sync()
+    if edits:
+        backend.save(store)
+    backend.close(store)
+    counts = Counter(kind for kind, _i, _old, _new in edits)
+    print(f"{counts[EDIT_INSERT]} sessions added, {counts[EDIT_SET]} updated, {counts[EDIT_DELETE]} deleted; "
+          f"{len(store)} in total.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+class RecordTable:
+    """
+    Incremental view over a ttk.Treeview showing records newest first.
+
+    Each record gets a fixed item id ("r<index>"), so changing one record
+    touches exactly one row instead of rebuilding the whole tree. Only the
+    newest `page_size` records are inserted up front; older pages are added
+    when the user scrolls to the bottom.
+
+    Below the oldest record, `older(offset, count)` (if given) supplies
+    rows from the cold history tier: column values for the `count` sessions
+    after the `offset` newest cold ones. Those rows ("c<n>") are read-only.
+    """
+    def __init__(self, tree, row_values, scrollbar=None, page_size=200, older=None):
+        self.tree = tree
+        self.row_values = row_values # index -> tuple of column values
+        self.scrollbar = scrollbar
+        self.page_size = page_size
+        self.older = older
+
+        self.count = 0 # Records the table knows about
+        self.oldest = 0 # Lowest record index currently inserted
+        self.cold = 0 # Cold-tier rows inserted below the records
+        self.more_cold = older is not None
+        self._paging = False
+
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+    def item_id(self, index):
+        return f"r{index}"
+
+    def selected(self):
+        """Record indices of the selected rows, oldest first."""
+        return sorted(int(iid[1:]) for iid in self.tree.selection() if iid.startswith("r"))
+
+    def reset(self, count):
+        """Full rebuild. Only needed on load or after clearing history."""
+        self.tree.delete(*self.tree.get_children())
+        self.count = count
+        self.oldest = count
+        self.cold = 0
+        self.more_cold = self.older is not None
+        self.load_more()
+
+    def load_more(self):
+        """Inserts the next page of older records at the bottom."""
+        self._paging = False
+        if self.oldest == 0:
+            self.load_cold()
+            return
+        stop = self.oldest
+        start = max(0, stop - self.page_size)
+        for i in range(stop - 1, start - 1, -1):
+            self.tree.insert("", "end", iid=self.item_id(i), values=self.row_values(i))
+        self.oldest = start
+
+    def load_cold(self):
+        """Inserts the next page from the cold tier; only then is its segment read."""
+        if not self.more_cold:
+            return
+        rows = self.older(self.cold, self.page_size)
+        for values in rows:
+            self.tree.insert("", "end", iid=f"c{self.cold}", values=values)
+            self.cold += 1
+        self.more_cold = len(rows) == self.page_size
+
+    def append(self):
+        """Shows the record that was just added at index `count`."""
+        index = self.count
+        self.count += 1
+        self.tree.insert("", 0, iid=self.item_id(index), values=self.row_values(index))
+
+    def refresh(self, index):
+        """Re-renders one record, if its row has been inserted."""
+        iid = self.item_id(index)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.row_values(index))
+
+    def insert(self, index):
+        """Shows a record inserted at `index`: the rows from there up move by one."""
+        self.count += 1
+        self.tree.insert("", 0, iid=self.item_id(self.count - 1))
+        self._shift(index)
+
+    def delete(self, index):
+        """Drops the record deleted at `index`: the rows from there up move by one."""
+        self.count -= 1
+        iid = self.item_id(self.count)
+        if self.tree.exists(iid):
+            self.tree.delete(iid)
+        self.oldest = min(self.oldest, self.count)
+        self._shift(index)
+
+    def _shift(self, index):
+        # Item ids are fixed per index, so only the rows at or above `index` change
+        for i in range(max(index, self.oldest), self.count):
+            self.refresh(i)
+
+    def _on_scroll(self, first, last):
+        if self.scrollbar is not None:
+            self.scrollbar.set(first, last)
+        # Reached the bottom: pull in the next page once Tk is idle
+        if float(last) >= 1.0 and (self.oldest > 0 or self.more_cold) and not self._paging:
+            self._paging = True
+            self.tree.after_idle(self.load_more)
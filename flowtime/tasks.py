@@ -0,0 +1,233 @@
+"""
+Task names: interning and as-you-type suggestions.
+
+Sessions refer to tasks by small integer ids (SessionStore.task_ids); the
+TaskRegistry owns the id <-> name mapping and how often each task has
+been used. SQLite (tasks table) and binary archives (string table) store
+the same ids, so each distinct name is kept once.
+
+TaskCompleter indexes the registry for autocomplete: word prefixes for
+the first couple of characters, trigrams from three on, and a typo
+tolerant trigram overlap when nothing matches exactly. Posting lists are
+kept in most-used-first order, so a query only has to look at the first
+MAX_SCAN candidates however many tasks share a prefix. When a task's use
+count changes, the next sync moves just that task within its lists (by
+bisection); no query ever re-sorts a list.
+"""
+import heapq
+from array import array
+from bisect import bisect_left, insort
+
+MIN_GRAM = 3
+SHORT_CACHE = 256 # Cached results for 1-2 character queries
+MAX_SCAN = 500 # Candidates looked at per query, most used first
+BULK_INDEX = 64 # New tasks in one sync above which posting lists are sorted, not inserted into
+
+
+class TaskRegistry:
+    def __init__(self):
+        self.names = []
+        self.uses = array('q') # Sessions recorded per task id
+        self.changed = set() # Ids whose use count changed, until TaskCompleter.sync takes them
+        self.version = 0 # Bumped on every change, for caches
+        self._ids = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Id for `name`, adding it if it is new."""
+        task_id = self._ids.get(name)
+        if task_id is None:
+            task_id = len(self.names)
+            self.names.append(name)
+            self.uses.append(0)
+            self._ids[name] = task_id
+            self.version += 1
+        return task_id
+
+    def add(self, name):
+        """Interns `name` and counts one more session for it."""
+        task_id = self.intern(name)
+        self.use(task_id)
+        return task_id
+
+    def use(self, task_id, sessions=1):
+        """Counts `sessions` more sessions (fewer, if negative) for `task_id`."""
+        self.uses[task_id] += sessions
+        self.changed.add(task_id)
+        self.version += 1
+
+    def release(self, task_id):
+        """Counts one session less for `task_id` (after an edit or delete)."""
+        self.use(task_id, -1)
+
+    def lookup(self, name):
+        """Id of an already interned name, or None."""
+        return self._ids.get(name)
+
+    def name(self, task_id):
+        return self.names[task_id]
+
+    def copy(self):
+        other = TaskRegistry()
+        other.names = list(self.names)
+        other.uses = array('q', self.uses)
+        other._ids = dict(self._ids)
+        other.version = self.version
+        return other
+
+
+def _trigrams(text):
+    return {text[i:i + MIN_GRAM] for i in range(len(text) - MIN_GRAM + 1)}
+
+def _prefixes(text):
+    """1-2 character prefixes of each word."""
+    prefixes = set()
+    for word in text.split():
+        prefixes.add(word[:1])
+        prefixes.add(word[:2])
+    return prefixes
+
+
+class TaskCompleter:
+    """
+    Autocomplete over a TaskRegistry.
+
+    `suggest(text)` ranks names that start with the text first, then names
+    with a word starting with it, then other substring matches; ties go to
+    the most used task. New tasks are picked up incrementally and a whole
+    new registry (after clear() or a background load) is re-indexed.
+    """
+    def __init__(self, registry_source):
+        self._source = registry_source # Callable: the registry can be swapped out
+        self.reset()
+
+    def reset(self):
+        self.registry = self._source()
+        self._lower = []
+        self._grams = {} # Trigram -> task ids
+        self._words = {} # 1-2 character word prefix -> task ids
+        self._cache = {}
+        self._version = None
+        self._uses = array('q') # Use counts the posting lists are ordered by
+
+    def sync(self):
+        registry = self._source()
+        if registry is not self.registry:
+            self.reset()
+            registry = self.registry
+        if registry.changed:
+            changed, registry.changed = registry.changed, set()
+            for task_id in changed:
+                if task_id < len(self._lower): # Newer ones are indexed with their count below
+                    self._move(task_id, registry.uses[task_id])
+        if len(registry) > len(self._lower):
+            self._index(registry)
+        # Short queries are cached; any recorded session can change their ranking
+        if registry.version != self._version:
+            self._cache = {}
+            self._version = registry.version
+
+    def _key(self, task_id, uses=None):
+        # Most used first, ties by id: every task has its own position, found by bisection
+        if uses is None:
+            uses = self._uses[task_id]
+        return task_id - (uses << 32)
+
+    def _lists(self, lower):
+        """Posting lists a name belongs in: its trigrams' and its words' 1-2 character prefixes'."""
+        return ([self._grams.setdefault(gram, []) for gram in _trigrams(lower)]
+                + [self._words.setdefault(prefix, []) for prefix in _prefixes(lower)])
+
+    def _index(self, registry):
+        """Adds the tasks interned since the last sync. A large batch (a new registry) is sorted in once."""
+        start = len(self._lower)
+        bulk = len(registry) - start > BULK_INDEX
+        grams, words = self._grams, self._words
+        for task_id in range(start, len(registry)):
+            lower = registry.names[task_id].lower()
+            self._lower.append(lower)
+            self._uses.append(registry.uses[task_id])
+            if not bulk:
+                for ids in self._lists(lower):
+                    insort(ids, task_id, key=self._key)
+                continue
+            for gram in _trigrams(lower):
+                grams.setdefault(gram, []).append(task_id)
+            for prefix in _prefixes(lower):
+                words.setdefault(prefix, []).append(task_id)
+        if bulk:
+            keys = [self._key(task_id, uses) for task_id, uses in enumerate(self._uses)]
+            for table in (self._grams, self._words):
+                for ids in table.values():
+                    ids.sort(key=keys.__getitem__) # Lists that were in order already cost O(n)
+
+    def _move(self, task_id, uses):
+        """Re-files a task whose use count changed: O(log n) per list it is in."""
+        old = self._uses[task_id]
+        if uses == old:
+            return
+        lists = self._lists(self._lower[task_id])
+        position = self._key(task_id, old)
+        for ids in lists:
+            del ids[bisect_left(ids, position, key=self._key)]
+        self._uses[task_id] = uses
+        for ids in lists:
+            insort(ids, task_id, key=self._key)
+
+    def suggest(self, text, limit=8):
+        """Up to `limit` task names matching `text`, best first."""
+        query = text.strip().lower()
+        if not query:
+            return []
+        self.sync()
+        if len(query) < MIN_GRAM:
+            key = (query, limit)
+            if key not in self._cache:
+                if len(self._cache) >= SHORT_CACHE:
+                    self._cache = {}
+                ids = self._postings(self._words, query)
+                self._cache[key] = self._rank(query, ids[:MAX_SCAN], limit)
+            return self._cache[key]
+
+        grams = sorted((self._postings(self._grams, gram) for gram in _trigrams(query)), key=len)
+        if grams and grams[0]:
+            # Exact substring: walk the rarest trigram's list, check the rest by `in`
+            lower = self._lower
+            candidates = [task_id for task_id in grams[0][:MAX_SCAN] if query in lower[task_id]]
+            if candidates:
+                return self._rank(query, candidates, limit)
+        return self._fuzzy(grams, limit)
+
+    def _postings(self, table, key):
+        """Task ids under `key`, most used first."""
+        return table.get(key, [])
+
+    def _rank(self, query, candidates, limit):
+        lower = self._lower
+        uses = self.registry.uses
+        names = self.registry.names
+
+        def score(task_id):
+            name = lower[task_id]
+            if name.startswith(query):
+                match = 2
+            elif (" " + query) in name:
+                match = 1
+            else:
+                match = 0
+            return (match, uses[task_id], -len(name))
+        return [names[task_id] for task_id in heapq.nlargest(limit, candidates, key=score)]
+
+    def _fuzzy(self, grams, limit):
+        """Typo tolerant: names sharing at least half of the query's trigrams."""
+        needed = max(1, (len(grams) + 1) // 2)
+        shared = {}
+        for ids in grams:
+            for task_id in ids[:MAX_SCAN]:
+                shared[task_id] = shared.get(task_id, 0) + 1
+        uses = self.registry.uses
+        best = heapq.nlargest(limit, (task_id for task_id, n in shared.items() if n >= needed),
+                              key=lambda task_id: (shared[task_id], uses[task_id]))
+        return [self.registry.names[task_id] for task_id in best]
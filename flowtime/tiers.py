@@ -0,0 +1,374 @@
+"""
+Hot/cold history tiers.
+
+The app's own history file (or database) only keeps recent sessions: the
+current and previous week. Older ones are rolled into gzip-compressed
+monthly segments next to it:
+
+    flowtime_data.segments/2024-03.jsonl.gz
+
+Each segment starts with a one-line summary header (session count, focus
+and break totals, focus per day and per task, first/last timestamps),
+followed by one [task, start, end, work, break] row per line. Opening the
+tiers reads only the headers (cached together in manifest.json), so totals, per-day and per-task figures for
+the whole history cost nothing to compute; a segment is decompressed only
+when a range query, a page of the table or an export actually reaches it,
+and only a few decompressed months are kept in memory.
+
+Tiering is on once the segments folder exists (or FLOWTIME_TIERS is set).
+To roll an existing history by hand:
+
+    python -m flowtime.tiers roll flowtime_data.json
+    python -m flowtime.tiers info flowtime_data.json
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from collections import Counter, OrderedDict
+
+from flowtime.index import DAY, WEEK, week_start
+from flowtime.persist import atomic_write
+from flowtime.records import NO_BREAK, civil_from_days
+from flowtime.store import SessionStore
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+FORMAT = 1
+HOT_WEEKS = 2 # Current and previous week stay in the app's history file
+CACHE_SEGMENTS = 3 # Decompressed months kept in memory
+COMPRESS_LEVEL = 6
+MANIFEST = "manifest.json"
+
+
+def segments_dir(history_path):
+    return os.path.splitext(history_path)[0] + ".segments"
+
+def month_of(ts):
+    """'YYYY-MM' of a local epoch timestamp."""
+    y, m, _ = civil_from_days(ts // DAY)
+    return f"{y:04}-{m:02}"
+
+def hot_cutoff(now, hot_weeks=HOT_WEEKS):
+    """Sessions starting before this are rolled into segments."""
+    return week_start(now) - (hot_weeks - 1) * WEEK
+
+
+def summarize(rows):
+    """Segment header for `rows` of (task, start, end, work, break)."""
+    days = Counter()
+    tasks = {}
+    work = breaks = 0
+    for task, start, end, w, brk in rows:
+        work += w
+        if brk != NO_BREAK:
+            breaks += brk
+        days[start // DAY] += w
+        counts = tasks.setdefault(task, [0, 0])
+        counts[0] += 1
+        counts[1] += w
+    return {
+        "format": FORMAT,
+        "sessions": len(rows),
+        "work": work,
+        "breaks": breaks,
+        "first": min(r[1] for r in rows) if rows else 0,
+        "last": max(r[2] for r in rows) if rows else 0,
+        "days": {str(day): seconds for day, seconds in sorted(days.items())},
+        "tasks": tasks, # name -> [sessions, focus seconds]
+    }
+
+
+class Segment:
+    """One month of cold sessions. Only the header is read until `rows()` is called."""
+    def __init__(self, path, header):
+        self.path = path
+        self.month = os.path.basename(path)[:-len(SEGMENT_SUFFIX)]
+        self.header = header
+
+    @classmethod
+    def open(cls, path):
+        with gzip.open(path, "rt") as f:
+            header = json.loads(f.readline()) # Decompresses just the first block
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path}: unsupported segment format {header.get('format')!r}")
+        return cls(path, header)
+
+    @property
+    def sessions(self):
+        return self.header["sessions"]
+
+    def rows(self):
+        """Every session in the segment, oldest first (decompresses the file)."""
+        rows = []
+        with gzip.open(self.path, "rt") as f:
+            f.readline()
+            for line in f:
+                task, start, end, work, brk = json.loads(line)
+                rows.append((task, start, end, work, brk))
+        return rows
+
+    @staticmethod
+    def write(path, rows):
+        """Writes `rows` (oldest first) with their header, atomically."""
+        header = summarize(rows)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=COMPRESS_LEVEL, mtime=0) as f:
+                f.write((json.dumps(header) + "\n").encode())
+                f.write("".join(json.dumps(list(r)) + "\n" for r in rows).encode())
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(tmp_path, path)
+        return Segment(path, header)
+
+
+class TieredHistory:
+    """
+    The cold tier of one history: its monthly segments, oldest first.
+
+    Cold sessions are numbered 0..len(self)-1 in chronological order, just
+    like SessionStore indices, so callers can page through them by index.
+    """
+    def __init__(self, history_path, cache_segments=CACHE_SEGMENTS):
+        self.directory = segments_dir(history_path)
+        self.cache_segments = cache_segments
+        self._cache = OrderedDict() # month -> rows
+        self.reload()
+
+    def reload(self):
+        self.segments = []
+        if os.path.isdir(self.directory):
+            self.segments = self._scan()
+        self._cache.clear()
+        self._offsets = [0] # Cold index of each segment's first session
+        for segment in self.segments:
+            self._offsets.append(self._offsets[-1] + segment.sessions)
+
+    def _scan(self):
+        """
+        Segments with their headers. Headers are cached in a manifest keyed
+        by file size and mtime, so opening decades of history reads one small
+        file instead of a gzip header per month.
+        """
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        segments = []
+        fresh = {}
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            st = os.stat(path)
+            entry = manifest.get(name)
+            if entry is not None and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                segment = Segment(path, entry["header"])
+            else:
+                segment = Segment.open(path)
+            segments.append(segment)
+            fresh[name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "header": segment.header}
+        if fresh != manifest:
+            try:
+                atomic_write(manifest_path, json.dumps(fresh))
+            except OSError:
+                pass # Read-only copy of someone's history: just slower to open
+        return segments
+
+    def __len__(self):
+        return self._offsets[-1]
+
+    @property
+    def total_work(self):
+        return sum(s.header["work"] for s in self.segments)
+
+    @property
+    def total_break(self):
+        return sum(s.header["breaks"] for s in self.segments)
+
+    def task_totals(self):
+        """Counter of task name -> focus seconds, from the headers alone."""
+        totals = Counter()
+        for segment in self.segments:
+            for task, (_, seconds) in segment.header["tasks"].items():
+                totals[task] += seconds
+        return totals
+
+    def task_counts(self):
+        """Counter of task name -> sessions, from the headers alone."""
+        counts = Counter()
+        for segment in self.segments:
+            for task, (sessions, _) in segment.header["tasks"].items():
+                counts[task] += sessions
+        return counts
+
+    def daily(self):
+        """Counter of local day number -> focus seconds, from the headers alone."""
+        days = Counter()
+        for segment in self.segments:
+            for day, seconds in segment.header["days"].items():
+                days[int(day)] += seconds
+        return days
+
+    def total(self, lo=None, hi=None):
+        """Focus seconds of sessions starting in [lo, hi). Day-aligned bounds never decompress."""
+        total = 0
+        for segment in self.segments:
+            header = segment.header
+            if (lo is not None and header["last"] < lo) or (hi is not None and header["first"] >= hi):
+                continue
+            if (lo is None or lo <= header["first"]) and (hi is None or header["last"] < hi):
+                total += header["work"]
+            elif (lo is None or lo % DAY == 0) and (hi is None or hi % DAY == 0):
+                first = None if lo is None else lo // DAY
+                last = None if hi is None else hi // DAY
+                total += sum(seconds for day, seconds in header["days"].items()
+                             if (first is None or int(day) >= first) and (last is None or int(day) < last))
+            else:
+                total += sum(r[3] for r in self._rows(segment)
+                             if (lo is None or r[1] >= lo) and (hi is None or r[1] < hi))
+        return total
+
+    # --- Sessions ---
+
+    def _rows(self, segment):
+        rows = self._cache.get(segment.month)
+        if rows is None:
+            rows = self._cache[segment.month] = segment.rows()
+            if len(self._cache) > self.cache_segments:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(segment.month)
+        return rows
+
+    def slice(self, start, stop):
+        """Rows with cold indices [start, stop), oldest first; reads only the segments in range."""
+        start, stop = max(0, start), min(len(self), stop)
+        rows = []
+        for i, segment in enumerate(self.segments):
+            lo, hi = self._offsets[i], self._offsets[i + 1]
+            if hi <= start or lo >= stop:
+                continue
+            rows.extend(self._rows(segment)[max(start, lo) - lo:min(stop, hi) - lo])
+        return rows
+
+    def page(self, offset, limit):
+        """`limit` rows newest first, skipping the `offset` newest cold sessions."""
+        stop = len(self) - offset
+        rows = self.slice(stop - limit, stop)
+        rows.reverse()
+        return rows
+
+    def rows(self):
+        """Every cold session, oldest first, one segment in memory at a time."""
+        for segment in self.segments:
+            yield from segment.rows()
+
+    def combined(self, store):
+        """New SessionStore holding the cold sessions followed by `store` (for exports)."""
+        full = SessionStore()
+        full.extend(self.rows())
+        full.extend(store.rows())
+        return full
+
+    def top_tasks(self, index, limit=5):
+        """Like SessionIndex.top_tasks over hot and cold sessions together."""
+        totals = self.task_totals()
+        totals.update(dict(index.top_tasks(limit=None)))
+        return totals.most_common(limit)
+
+    # --- Rolling ---
+
+    def add(self, rows):
+        """Files `rows` into their monthly segments, merging with what is already there."""
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(month_of(row[1]), []).append(row)
+        if not by_month:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        existing = {segment.month: segment for segment in self.segments}
+        for month, new_rows in by_month.items():
+            old = existing[month].rows() if month in existing else []
+            # The same session twice: rolled again after a crash between writing a
+            # segment and saving the hot file, or a break edit that sync pulled in
+            # for a session already rolled. Keep one copy, the newer one
+            fresh = {(r[0], r[1], r[2]): r for r in new_rows}
+            merged = [r for r in old if (r[0], r[1], r[2]) not in fresh]
+            merged.extend(fresh.values())
+            merged.sort(key=lambda r: r[1])
+            Segment.write(os.path.join(self.directory, month + SEGMENT_SUFFIX), merged)
+        self.reload()
+
+    def roll(self, store, now, hot_weeks=HOT_WEEKS):
+        """
+        Moves sessions that started before the hot window out of `store`
+        into segments. Returns how many moved. The store is rebuilt with the
+        hot sessions only (a new generation, so backends rewrite it whole).
+        """
+        cutoff = hot_cutoff(now, hot_weeks)
+        cold = [store.row(i) for i in range(len(store)) if store.starts[i] < cutoff]
+        if not cold:
+            return 0
+        hot = [store.row(i) for i in range(len(store)) if store.starts[i] >= cutoff]
+        self.add(cold) # Segments first: a crash now leaves duplicates, never a gap
+        store.clear()
+        store.extend(hot)
+        return len(cold)
+
+    def clear(self):
+        """Deletes every segment (the apps' "delete all history")."""
+        for segment in self.segments:
+            os.remove(segment.path)
+        self.reload()
+
+
+def open_tiers(history_path):
+    """TieredHistory for the history, or None if tiering is not in use for it."""
+    if os.environ.get("FLOWTIME_TIERS") or os.path.isdir(segments_dir(history_path)):
+        return TieredHistory(history_path)
+    return None
+
+def seed_tasks(store, tiers):
+    """Registers cold task names (with their use counts) so autocomplete still knows them."""
+    for task, sessions in tiers.task_counts().items():
+        store.tasks.use(store.tasks.intern(task), sessions)
+
+
+def main(argv=None):
+    from flowtime.core import SystemClock
+    from flowtime.storage import open_history
+
+    parser = argparse.ArgumentParser(description="Flowtime history tiers")
+    sub = parser.add_subparsers(dest="command", required=True)
+    roll = sub.add_parser("roll", help="move old sessions into monthly segments")
+    roll.add_argument("history")
+    roll.add_argument("--hot-weeks", type=int, default=HOT_WEEKS)
+    info = sub.add_parser("info", help="show the segments of a history")
+    info.add_argument("history")
+    args = parser.parse_args(argv)
+
+    tiers = TieredHistory(args.history)
+    if args.command == "roll":
+        backend = open_history(args.history)
+        store = backend.load()
+        moved = tiers.roll(store, SystemClock().now(), args.hot_weeks)
+        if moved:
+            backend.save(store)
+            backend.close(store)
+        print(f"Moved {moved} sessions to {tiers.directory}; {len(store)} stay hot.")
+        return 0
+
+    for segment in tiers.segments:
+        h = segment.header
+        print(f"{segment.month}  {h['sessions']:>7} sessions  {h['work'] / 3600:>9.1f} h focus"
+              f"  {os.path.getsize(segment.path):>10} bytes")
+    print(f"{len(tiers)} cold sessions in {len(tiers.segments)} segments", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
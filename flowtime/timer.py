@@ -0,0 +1,70 @@
+import math
+import time
+
+TICK_SLACK = 0.005 # Land just after the second boundary, never just before it
+
+
+class MonotonicTimer:
+    """
+    Stopwatch or countdown driven by `time.monotonic()`.
+
+    Time is always computed from the start point, never accumulated per
+    callback, so late callbacks under load can't make the timer drift. The
+    UI asks `next_delay()` when to wake up next (the moment the displayed
+    second changes) and `changed(text)` whether a redraw is needed at all.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.origin = None
+        self.duration = None
+        self._shown = None
+
+    def start(self, duration=None):
+        """Starts a stopwatch, or a countdown of `duration` seconds."""
+        self.origin = self.clock()
+        self.duration = duration
+        self._shown = None
+
+    def stop(self):
+        self.origin = None
+
+    @property
+    def running(self):
+        return self.origin is not None
+
+    def elapsed(self):
+        return self.clock() - self.origin
+
+    def remaining(self):
+        return max(0.0, self.duration - self.elapsed())
+
+    def expired(self):
+        return self.duration is not None and self.elapsed() >= self.duration
+
+    def seconds(self):
+        """Whole seconds to display: elapsed rounded down, remaining rounded up."""
+        if self.duration is None:
+            return int(self.elapsed())
+        return math.ceil(self.remaining())
+
+    def next_delay(self, step=1):
+        """
+        Seconds until the displayed value next reaches a multiple of `step`
+        seconds (every change, with the default). A countdown never sleeps
+        past its end.
+        """
+        if self.duration is None or self.expired():
+            fraction = step - self.elapsed() % step
+        else:
+            fraction = self.remaining() % step or step
+        return fraction + TICK_SLACK
+
+    def next_delay_ms(self):
+        return max(1, int(self.next_delay() * 1000))
+
+    def changed(self, text):
+        """True the first time `text` differs from what was last shown."""
+        if text == self._shown:
+            return False
+        self._shown = text
+        return True
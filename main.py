@@ -1,59 +1,170 @@
 from kivy.app import App
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.gridlayout import GridLayout
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
 from kivy.clock import Clock
 from kivy.core.window import Window
-from kivy.core.audio import SoundLoader
-from datetime import datetime, timedelta
-import json
+from datetime import timedelta
 import os
+import sqlite3
+
+from flowtime.core import (BREAK, BREAK_ENDED, BREAK_EXPIRED, BREAK_MEASURED, BREAK_STARTED, IDLE,
+                           WORK_STARTED, WORKING, FlowtimeEngine)
+from flowtime.editing import Editor
+from flowtime.index import SessionIndex
+from flowtime.instrument import first_frame, span, traced
+from flowtime.loader import BackgroundLoad
+from flowtime.records import format_clock, format_timestamp, parse_timestamp
+from flowtime.refresh import RefreshScheduler
+from flowtime.storage import JournalBackend, open_backend
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, SessionStore
+from flowtime.suggest import BreakAdvisor
+from flowtime.tasks import TaskCompleter
+from flowtime.tiers import open_tiers, seed_tasks
+
+PREVIEW_COUNT = 50 # Sessions shown before the full history has loaded
+COLD_PAGE = 100 # Archived sessions added per scroll to the bottom
+SYNC_SECONDS = 60
 
 # Dark Theme
 Window.clearcolor = (0.12, 0.12, 0.12, 1)
 
-class HistoryCard(BoxLayout):
+CARD_HEIGHT = 110
+
+class HistoryCard(RecycleDataViewBehavior, BoxLayout):
     """
-    Updated Row: Shows Task, Start-End Time, and Duration
+    Recycled Row: Shows Task, Start-End Time, and Duration.
+    Only enough cards to fill the viewport exist; scrolling rebinds them to other records.
+    Tapping a card of a stored (not archived) record opens its editor.
     """
-    def __init__(self, task, start_t, end_t, duration, **kwargs):
+    @traced("HistoryCard.__init__")
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
         self.size_hint_y = None
-        self.height = 110 # Slightly taller for more info
+        self.height = CARD_HEIGHT
         self.padding = 10
+        self.rec = None # Record index shown, None for archived rows
         
         # 1. Task Name
-        self.add_widget(Label(text=task, font_size='18sp', bold=True, color=(1,1,1,1), size_hint_y=0.4))
+        self.task_lbl = Label(font_size='18sp', bold=True, color=(1,1,1,1), size_hint_y=0.4)
+        self.add_widget(self.task_lbl)
         
         # 2. Start - End Time
-        time_str = f"{start_t} - {end_t}"
-        self.add_widget(Label(text=time_str, color=(0.7, 0.7, 0.7, 1), font_size='14sp', size_hint_y=0.3))
+        self.time_lbl = Label(color=(0.7, 0.7, 0.7, 1), font_size='14sp', size_hint_y=0.3)
+        self.add_widget(self.time_lbl)
         
         # 3. Focus Duration
-        dur_str = f"Focus Time: {duration}"
-        self.add_widget(Label(text=dur_str, color=(0, 1, 0, 1), bold=True, size_hint_y=0.3))
+        self.dur_lbl = Label(color=(0, 1, 0, 1), bold=True, size_hint_y=0.3)
+        self.add_widget(self.dur_lbl)
         
         # Separator
         self.add_widget(Label(text="_"*30, color=(0.3,0.3,0.3,1), size_hint_y=0.1))
 
+    @traced("HistoryCard.refresh_view_attrs")
+    def refresh_view_attrs(self, rv, index, data):
+        task, start_t, end_t, duration = data['row'] if 'row' in data else rv.row_source(data['rec'])
+        self.task_lbl.text = task
+        self.time_lbl.text = f"{start_t} - {end_t}"
+        self.dur_lbl.text = f"Focus Time: {duration}"
+        self.rv = rv
+        self.rec = data.get('rec')
+        return super().refresh_view_attrs(rv, index, data)
+
+    def on_touch_down(self, touch):
+        # A tap has to start on the card; the end of a scroll only lifts over it
+        if (self.collide_point(*touch.pos) and not touch.is_mouse_scrolling
+                and self.rec is not None and self.rv.on_edit is not None):
+            touch.grab(self)
+            touch.ud['edit_rec'] = self.rec # The view may be recycled before the touch ends
+        return super().on_touch_down(touch)
+
+    def on_touch_up(self, touch):
+        if touch.grab_current is self:
+            touch.ungrab(self)
+            if self.collide_point(*touch.pos):
+                self.rv.on_edit(touch.ud['edit_rec'])
+            return True
+        return super().on_touch_up(touch)
+
+class HistoryList(RecycleView):
+    """
+    Virtualized history. Each data item only holds a record index;
+    the card pulls the text it needs from `row_source` when it scrolls into view.
+    Scrolling past the oldest record asks `older(offset, count)` for a page
+    of the cold history tier, so archived months are only read when reached.
+    """
+    def __init__(self, row_source, older=None, on_edit=None, **kwargs):
+        super().__init__(**kwargs)
+        self.row_source = row_source
+        self.older = older
+        self.on_edit = on_edit
+        self.cold = 0
+        self.viewclass = HistoryCard
+        if older is not None:
+            self.bind(scroll_y=self.on_scroll_y)
+
+        layout = RecycleBoxLayout(orientation='vertical', spacing=5, size_hint_y=None,
+                                  default_size=(None, CARD_HEIGHT), default_size_hint=(1, None))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+
+    def show_records(self, count):
+        # Newest first
+        self.data = [{'rec': i} for i in range(count - 1, -1, -1)]
+        self.cold = 0
+
+    def on_scroll_y(self, instance, value):
+        if value <= 0 and self.cold is not None:
+            rows = self.older(self.cold, COLD_PAGE)
+            self.data.extend({'row': row} for row in rows)
+            self.cold = self.cold + len(rows) if len(rows) == COLD_PAGE else None # None: no more
+
+    def push_record(self, rec_index):
+        self.data.insert(0, {'rec': rec_index})
+
+    def apply_edits(self, edits):
+        """
+        Follows store edits. Items only hold indices, so an insert or delete
+        just adds or drops the top item; the visible cards then re-read
+        their (shifted) records.
+        """
+        for kind, _i, _old, _new in edits:
+            if kind == EDIT_INSERT:
+                count = self.data[0]['rec'] + 1 if self.data and 'rec' in self.data[0] else 0
+                self.data.insert(0, {'rec': count})
+            elif kind == EDIT_DELETE:
+                del self.data[0]
+        self.refresh_from_data()
+
 class FlowtimeApp(App):
     def build(self):
         self.data_file = "flowtime_v2.json"
-        self.records = []
+        self.backend = open_backend(JournalBackend(self.data_file))
+        self.tiers = open_tiers(self.data_file) # Older months, compressed; None when not tiered
+        self.records = SessionStore() # Oldest first, matches the journal append order
+        self.sync = None
+        if os.environ.get("FLOWTIME_SYNC"): # Set FLOWTIME_SYNC=<url> to enable
+            from flowtime.sync import open_sync # Network modules only when syncing
+            self.sync = open_sync(self.data_file, self.records)
+        self.syncer = None
+        self.loader = None
+        self.dirty = False # Changes held back until the history has loaded
+        self.index = SessionIndex(self.records)
+        self.completer = TaskCompleter(lambda: self.records.tasks)
+        self.advisor = BreakAdvisor(self.records)
+        self.editor = Editor(self.records)
         
-        self.state = 'IDLE'
-        self.start_timestamp = None
-        self.end_timestamp = None
-        self.work_seconds_total = 0
-        self.break_seconds_total = 0 # Track this for stats
+        # The break taken (until the next focus starts) is stored, not the popup's value
+        self.engine = FlowtimeEngine(self.records)
+        self.engine.subscribe(self.on_engine_event)
         
-        # Load Sound
-        self.sound = SoundLoader.load('alarm.mp3') 
+        self.sound = None # Loaded when the first break ends, not at startup
 
         # --- MAIN LAYOUT ---
         root = BoxLayout(orientation='vertical', padding=15, spacing=10)
@@ -63,8 +174,13 @@ class FlowtimeApp(App):
                                     multiline=False, size_hint_y=0.1,
                                     background_color=(0.2, 0.2, 0.2, 1),
                                     foreground_color=(1, 1, 1, 1), font_size='18sp')
+        self.task_input.bind(text=self.on_task_text)
         root.add_widget(self.task_input)
 
+        # Autocomplete: tap a suggestion to fill in the task name
+        self.suggestion_row = BoxLayout(size_hint_y=None, height=0, spacing=5, opacity=0)
+        root.add_widget(self.suggestion_row)
+
         # 2. TIMER
         self.timer_label = Label(text="00:00:00", font_size='60sp', bold=True, color=(1, 1, 1, 1), size_hint_y=0.25)
         root.add_widget(self.timer_label)
@@ -90,59 +206,105 @@ class FlowtimeApp(App):
 
         # 5. HISTORY
         root.add_widget(Label(text="Session History", size_hint_y=0.05, color=(0.5, 0.5, 0.5, 1)))
-        self.scroll_view = ScrollView(size_hint_y=0.4)
-        self.history_grid = GridLayout(cols=1, spacing=5, size_hint_y=None)
-        self.history_grid.bind(minimum_height=self.history_grid.setter('height'))
-        self.scroll_view.add_widget(self.history_grid)
-        root.add_widget(self.scroll_view)
+        self.history_list = HistoryList(self.history_row, size_hint_y=0.4,
+                                        older=self.cold_rows if self.tiers is not None else None,
+                                        on_edit=self.show_edit_popup)
+        root.add_widget(self.history_list)
+
+        # Timer label, title and alarm flash; subscribed after on_engine_event, so it sees its changes
+        self.refresh = RefreshScheduler(self.engine, self.render,
+                                        lambda seconds, callback: Clock.schedule_once(lambda dt: callback(), seconds),
+                                        lambda event: event.cancel(), flash=True)
+        Window.bind(on_minimize=lambda *args: self.refresh.set_visible(False),
+                    on_hide=lambda *args: self.refresh.set_visible(False),
+                    on_restore=lambda *args: self.refresh.set_visible(True),
+                    on_show=lambda *args: self.refresh.set_visible(True),
+                    focus=lambda window, focused: self.refresh.set_focused(focused))
 
         self.load_records()
+        if self.sync is not None:
+            Clock.schedule_interval(lambda dt: self.start_sync(), SYNC_SECONDS)
         return root
 
     # --- LOGIC HANDLERS ---
+    @traced()
     def on_main_button(self, instance):
-        if self.state == 'IDLE':
+        if self.engine.state == IDLE:
             self.start_work()
-        elif self.state == 'WORKING':
+        elif self.engine.working:
             self.trigger_break_setup()
-        elif self.state == 'BREAK':
+        elif self.engine.on_break:
             self.end_break()
 
+    @traced()
+    def on_engine_event(self, event, data):
+        if event == BREAK_MEASURED:
+            self.save_records() # Journals the previous session's real break
+        elif event == WORK_STARTED:
+            self.main_btn.text = "STOP FOCUS"
+            self.main_btn.background_color = (0.9, 0.3, 0.3, 1) # Red
+            self.stats_btn.disabled = True # Disable stats while working
+            self.status_label.text = "Focus Mode: ON"
+            self.status_label.color = (0, 1, 0, 1)
+        elif event == BREAK_STARTED:
+            # Save the Work Record NOW; its break is measured when the next focus starts
+            self.save_records() # Appends just this session (no full-file rewrite)
+            self.history_list.push_record(self.engine.last_index)
+
+            self.main_btn.text = "END BREAK"
+            self.main_btn.background_color = (0.2, 0.6, 0.9, 1) # Blue
+            self.status_label.text = f"Relaxing..."
+            self.status_label.color = (0.2, 0.8, 1, 1)
+        elif event == BREAK_EXPIRED:
+            self.status_label.text = "BREAK OVER!"
+            self.play_alarm() # Loops until the break is ended
+        elif event == BREAK_ENDED:
+            if self.sound and self.sound.state == 'play':
+                self.sound.stop()
+
+            # Reset UI to IDLE
+            self.main_btn.text = "START FOCUS"
+            self.main_btn.background_color = (0.2, 0.8, 0.2, 1)
+            self.stats_btn.disabled = False
+            self.status_label.text = "Ready"
+            self.status_label.color = (0.7, 0.7, 0.7, 1)
+
+    def on_task_text(self, instance, text):
+        names = self.completer.suggest(text, limit=3)
+        if names == [text]:
+            names = []
+        self.suggestion_row.clear_widgets()
+        for name in names:
+            btn = Button(text=name, font_size='14sp', shorten=True,
+                         background_color=(0.3, 0.3, 0.3, 1))
+            btn.bind(on_press=self.pick_suggestion)
+            self.suggestion_row.add_widget(btn)
+        self.suggestion_row.height = 40 if names else 0
+        self.suggestion_row.opacity = 1 if names else 0
+
+    def pick_suggestion(self, instance):
+        self.task_input.text = instance.text # Fires on_task_text, which hides the row
+
     def start_work(self):
         if not self.task_input.text.strip():
             self.status_label.text = "Enter Task Name First!"
             self.status_label.color = (1, 0, 0, 1)
             return
 
-        self.state = 'WORKING'
-        self.start_timestamp = datetime.now()
-        
-        # UI Updates
-        self.main_btn.text = "STOP FOCUS"
-        self.main_btn.background_color = (0.9, 0.3, 0.3, 1) # Red
-        self.stats_btn.disabled = True # Disable stats while working
-        self.status_label.text = "Focus Mode: ON"
-        self.status_label.color = (0, 1, 0, 1)
-        
-        Clock.schedule_interval(self.update_timer, 1)
+        self.engine.start_work(self.task_input.text)
 
+    @traced()
     def trigger_break_setup(self):
         # 1. Capture Work Data
-        self.end_timestamp = datetime.now()
-        delta = self.end_timestamp - self.start_timestamp
-        self.work_seconds_total = int(delta.total_seconds())
-        work_minutes = self.work_seconds_total // 60
-
-        # 2. Logic: Max(3, Work/5)
-        if work_minutes <= 15:
-            suggested_mins = 3
-        else:
-            suggested_mins = int(work_minutes / 5)
-            if suggested_mins < 3: suggested_mins = 3
+        index = self.engine.stop_work()
+        work_seconds = self.records.work[index]
+
+        # 2. Learned from past breaks (max(3, Work/5) until there is history)
+        suggested_mins = self.advisor.suggest(work_seconds, self.records.task(index), self.records.ends[index])
 
         # 3. Popup
         content = BoxLayout(orientation='vertical', padding=10, spacing=10)
-        content.add_widget(Label(text=f"Work Done: {self.format_time(self.work_seconds_total)}"))
+        content.add_widget(Label(text=f"Work Done: {self.format_time(work_seconds)}"))
         content.add_widget(Label(text="Break Duration (mins):"))
         
         self.break_input = TextInput(text=str(suggested_mins), multiline=False, font_size='25sp', halign='center')
@@ -162,76 +324,70 @@ class FlowtimeApp(App):
             mins = 3
         
         self.break_popup.dismiss()
-        
-        # Save the Work Record NOW (so we have start/end times accurately)
-        self.save_work_record()
-        
-        # Start Break
-        self.start_break(mins)
-
-    def start_break(self, minutes):
-        self.state = 'BREAK'
-        self.break_seconds_left = minutes * 60
-        self.break_seconds_total = minutes * 60 # Store specifically for stats
-        
-        self.main_btn.text = "END BREAK"
-        self.main_btn.background_color = (0.2, 0.6, 0.9, 1) # Blue
-        self.status_label.text = f"Relaxing..."
-        self.status_label.color = (0.2, 0.8, 1, 1)
+        self.engine.start_break(mins * 60)
 
     def end_break(self):
-        Clock.unschedule(self.update_timer)
-        if self.sound and self.sound.state == 'play':
-            self.sound.stop()
-        
-        # Reset UI to IDLE
-        self.state = 'IDLE'
-        self.main_btn.text = "START FOCUS"
-        self.main_btn.background_color = (0.2, 0.8, 0.2, 1)
-        self.stats_btn.disabled = False
-        self.status_label.text = "Ready"
-        self.status_label.color = (0.7, 0.7, 0.7, 1)
-        self.timer_label.text = "00:00:00"
-
-    def update_timer(self, dt):
-        if self.state == 'WORKING':
-            delta = datetime.now() - self.start_timestamp
-            self.timer_label.text = self.format_time(int(delta.total_seconds()))
-            
-        elif self.state == 'BREAK':
-            if self.break_seconds_left > 0:
-                self.break_seconds_left -= 1
-                self.timer_label.text = self.format_time(self.break_seconds_left)
-            else:
-                self.timer_label.text = "00:00:00"
-                self.status_label.text = "BREAK OVER!"
-                # PLAY SOUND
-                self.play_alarm()
-                # Visual Flash (Backup if sound fails)
-                if int(datetime.now().second) % 2 == 0:
-                    Window.clearcolor = (0.5, 0, 0, 1)
-                else:
-                    Window.clearcolor = (0.12, 0.12, 0.12, 1)
+        self.engine.end_break()
+
+    def render(self, changes):
+        """Applies one RefreshScheduler frame: only the fields that changed."""
+        if "clock" in changes:
+            state, seconds = changes["clock"]
+            self.timer_label.text = self.format_time(seconds) if state in (WORKING, BREAK) else "00:00:00"
+        if "flash" in changes:
+            # Visual Flash (Backup if sound fails)
+            Window.clearcolor = (0.5, 0, 0, 1) if changes["flash"] else (0.12, 0.12, 0.12, 1)
+        if "title" in changes:
+            title, name = changes["title"], self.get_application_name()
+            Window.set_title(f"{title} - {name}" if title else name)
+
+    def on_pause(self):
+        # Mobile: the app is in the background, only the title (if any) is kept current
+        self.refresh.set_visible(False)
+        return True
+
+    def on_resume(self):
+        self.refresh.set_visible(True)
 
     def play_alarm(self):
         try:
+            if self.sound is None:
+                from kivy.core.audio import SoundLoader
+                self.sound = SoundLoader.load('alarm.mp3')
             if self.sound:
+                self.sound.loop = True
                 self.sound.play()
         except: 
             print("Sound Error")
 
     # --- STATS & DATA ---
+    @traced()
     def show_stats_popup(self, instance):
         # Calculate Totals
-        total_work_sec = sum(r.get('work_sec', 0) for r in self.records)
-        # Note: We are estimating break time based on user settings, or you could save it specifically
-        # For now, let's just show Total Work Time as that's the most critical metric
+        total_work_sec = self.records.total_work # Maintained incrementally by the store
+        top = self.index.top_tasks(limit=3)
+        if self.tiers is not None:
+            # Older months come from the segment headers; nothing is decompressed
+            total_work_sec += self.tiers.total_work
+            top = self.tiers.top_tasks(self.index, limit=3)
+        now = self.engine.clock.now()
         
         content = BoxLayout(orientation='vertical', padding=10, spacing=10)
         
         stat_lbl = Label(text=f"Total Focus Time:\n{self.format_time(total_work_sec)}", 
                          font_size='25sp', halign='center')
         content.add_widget(stat_lbl)
+
+        # Range and per-task totals (indexed, no history scan)
+        lines = [f"Today: {self.format_time(self.index.today(now))}",
+                 f"This Week: {self.format_time(self.index.this_week(now))}"]
+        for task, seconds in top:
+            lines.append(f"{task}: {self.format_time(seconds)}")
+        with span("stats.analytics"):
+            from flowtime.analytics import NUMPY_AVAILABLE, Analytics, format_report # NumPy only when asked
+            if NUMPY_AVAILABLE and (self.records or self.tiers):
+                lines.append(format_report(Analytics.from_store(self.records, self.tiers).report(now)))
+        content.add_widget(Label(text="\n".join(lines), font_size='16sp', halign='center'))
         
         # Clear Data Button
         clear_btn = Button(text="CLEAR ALL DATA", background_color=(1, 0, 0, 1), size_hint_y=0.3)
@@ -239,58 +395,195 @@ class FlowtimeApp(App):
         content.add_widget(clear_btn)
         
         close_btn = Button(text="Close", size_hint_y=0.3)
-        self.stats_popup = Popup(title="Statistics", content=content, size_hint=(0.8, 0.6))
+        self.stats_popup = Popup(title="Statistics", content=content, size_hint=(0.8, 0.8))
         
         close_btn.bind(on_press=self.stats_popup.dismiss)
         content.add_widget(close_btn)
         self.stats_popup.open()
 
+    def show_edit_popup(self, rec_index):
+        """Rename, retime, split, merge with the next session, delete, undo."""
+        if self.loader is not None:
+            self.status_label.text = "Still loading history..."
+            return
+        r = self.records
+        content = BoxLayout(orientation='vertical', padding=10, spacing=5)
+        fields = {}
+        for label, text in (("Task", r.task(rec_index)), ("Start", format_timestamp(r.starts[rec_index])),
+                            ("End", format_timestamp(r.ends[rec_index])), ("Split at", "")):
+            fields[label] = TextInput(text=text, hint_text=label, multiline=False)
+            content.add_widget(fields[label])
+        error = Label(text="", color=(1, 0.4, 0.4, 1))
+        content.add_widget(error)
+        popup = Popup(title="Edit Session", content=content, size_hint=(0.9, 0.8))
+
+        def timestamp(label):
+            try:
+                return parse_timestamp(fields[label].text.strip())
+            except ValueError:
+                raise ValueError(f"{label}: expected YYYY-MM-DD HH:MM:SS")
+
+        def run(operation):
+            try:
+                edits = operation()
+            except ValueError as e:
+                error.text = str(e) # In the popup: the status label is hidden behind it
+                return
+            popup.dismiss()
+            self.history_list.apply_edits(edits)
+            if edits:
+                self.save_records()
+
+        buttons = BoxLayout(spacing=5)
+        actions = [("Save", lambda: self.editor.update(rec_index, fields["Task"].text,
+                                                       timestamp("Start"), timestamp("End"))),
+                   ("Split", lambda: self.editor.split(rec_index, timestamp("Split at"))),
+                   ("Merge Next", lambda: self.editor.merge(rec_index)),
+                   ("Delete", lambda: self.editor.delete(rec_index)),
+                   ("Undo", self.editor.undo)]
+        for text, operation in actions:
+            btn = Button(text=text, disabled=text == "Undo" and not self.editor.can_undo)
+            btn.bind(on_press=lambda instance, operation=operation: run(operation))
+            buttons.add_widget(btn)
+        content.add_widget(buttons)
+        close_btn = Button(text="Close")
+        close_btn.bind(on_press=popup.dismiss)
+        content.add_widget(close_btn)
+        popup.open()
+
     def clear_data(self, instance):
-        self.records = []
-        try:
-            if os.path.exists(self.data_file):
-                os.remove(self.data_file)
-        except: pass
+        self.loader = None # Drop a background load that is still running
+        self.records.clear()
+        if self.tiers is not None:
+            self.tiers.clear()
+        self.save_records()
         
-        self.history_grid.clear_widgets()
+        self.history_list.data = []
         self.stats_popup.dismiss()
         self.status_label.text = "Data Cleared"
 
-    def save_work_record(self):
-        # Format Times
-        start_str = self.start_timestamp.strftime("%H:%M")
-        end_str = self.end_timestamp.strftime("%H:%M")
-        dur_str = self.format_time(self.work_seconds_total)
-        
-        record = {
-            "task": self.task_input.text,
-            "start": start_str,
-            "end": end_str,
-            "duration": dur_str,
-            "work_sec": self.work_seconds_total
-        }
-        
-        self.records.insert(0, record)
-        
-        # Save to JSON
+    @traced()
+    def load_records(self):
+        """Shows the newest sessions now and loads the full history on a worker thread."""
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.records, f)
-        except: pass
-        
-        # Add to UI
-        card = HistoryCard(self.task_input.text, start_str, end_str, dur_str)
-        self.history_grid.add_widget(card, index=len(self.history_grid.children))
+            self.records.extend(self.backend.recent(PREVIEW_COUNT))
+        except (OSError, ValueError) as e:
+            print(f"Error loading data: {e}")
+            return
 
-    def load_records(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    self.records = json.load(f)
-                    for r in reversed(self.records):
-                        card = HistoryCard(r['task'], r['start'], r['end'], r['duration'])
-                        self.history_grid.add_widget(card, index=len(self.history_grid.children))
-            except: pass
+        self.preview_len = len(self.records)
+        self.history_list.show_records(len(self.records))
+        backend = self.backend
+
+        def load():
+            store = backend.load()
+            # Saves wait for the load, so the journal can be compacted here too,
+            # off the UI thread; on Android on_stop (and close()) may never run
+            with span("backend.compact"):
+                backend.compact(store)
+            return store
+        self.loader = BackgroundLoad(traced("backend.load")(load))
+        Clock.schedule_interval(self.poll_loader, 0.1)
+
+    def poll_loader(self, dt):
+        if self.loader is None:
+            return False
+        if self.loader.done():
+            self.finish_loading()
+            return False
+
+    @traced()
+    def finish_loading(self):
+        loader, self.loader = self.loader, None
+        try:
+            full = loader.result()
+        except (OSError, ValueError) as e:
+            print(f"Error loading data: {e}")
+            return
+
+        self.records.adopt(full, self.preview_len)
+        if self.tiers is not None:
+            seed_tasks(self.records, self.tiers)
+        self.history_list.show_records(len(self.records))
+        Clock.schedule_once(lambda dt: self.completer.sync()) # Index task names before the first keystroke
+        Clock.schedule_once(lambda dt: self.start_sync())
+        if self.dirty:
+            self.save_records()
+
+    def start_sync(self):
+        """Sends new sessions and fetches other devices' on a worker thread."""
+        if self.sync is None or self.loader is not None or self.syncer is not None:
+            return
+        ops = self.sync.outgoing()
+        self.syncer = BackgroundLoad(lambda: self.sync.exchange(ops))
+        Clock.schedule_interval(self.poll_sync, 0.2)
+
+    def poll_sync(self, dt):
+        if self.syncer is None:
+            return False # Finished by on_stop
+        if not self.syncer.done():
+            return
+        if self.finish_sync():
+            Clock.schedule_once(lambda dt: self.start_sync())
+        return False
+
+    def finish_sync(self):
+        """Applies a finished round on the UI thread. Returns True if more is waiting on the server."""
+        syncer, self.syncer = self.syncer, None
+        try:
+            pulled, position, more = syncer.result()
+        except (OSError, ValueError) as e:
+            print(f"Sync failed: {e}") # Watermarks stay put; the next round resumes
+            return False
+        self.engine.pin_pending() # Sessions from other devices must not take the running break
+        edits = self.sync.apply(pulled, position)
+        self.history_list.apply_edits(edits)
+        if edits:
+            self.save_records()
+        return more
+
+    def history_row(self, rec_index):
+        r = self.records
+        return (r.task(rec_index), format_clock(r.starts[rec_index]),
+                format_clock(r.ends[rec_index]), self.format_time(r.work[rec_index]))
+
+    def cold_rows(self, offset, count):
+        return [(task, format_clock(start), format_clock(end), self.format_time(work))
+                for task, start, end, work, _ in self.tiers.page(offset, count)]
+
+    @traced()
+    def save_records(self):
+        if self.loader is not None:
+            self.dirty = True # Saving on top of a half-loaded history would lose sessions
+            return
+        try:
+            self.backend.save(self.records)
+            self.dirty = False
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error saving record: {e}")
+
+    def on_start(self):
+        # Clock callbacks run before the frame is drawn, so wait one more tick
+        Clock.schedule_once(lambda dt: Clock.schedule_once(self.on_first_frame, 0), 0)
+
+    def on_first_frame(self, dt):
+        first_frame(quit=self.stop)
+
+    def on_stop(self):
+        self.refresh.close()
+        if self.loader is not None:
+            self.loader.wait()
+            self.finish_loading()
+        if self.syncer is not None:
+            self.syncer.wait() # The round owns the sync state until exchange() returns
+            self.finish_sync()
+        if self.sync is not None:
+            self.sync.capture() # Edits not sent yet wait in the outbox for the next run (before rolling resets the store)
+        if self.tiers is not None:
+            self.tiers.roll(self.records, self.engine.clock.now()) # Keep the journal and snapshot small
+        # Flush pending writes (the journal backend also compacts here)
+        self.save_records()
+        self.backend.close(self.records)
 
     def format_time(self, seconds):
         return str(timedelta(seconds=seconds)).split('.')[0]
@@ -0,0 +1,71 @@
+from flowtime.aggregate import Rollup, aggregate, main
+from flowtime.index import DAY
+from flowtime.storage import JournalBackend, JsonFileBackend, SqliteBackend
+from flowtime.store import SessionStore
+
+START = 20_000 * DAY
+
+
+def make_store(user, count):
+    store = SessionStore()
+    for n in range(count):
+        t = START + n * DAY // 2 + user * 60
+        store.append(f"task {n % 3}", t, t + 600 + user, 600 + user, 100)
+    return store
+
+
+def write_team(root, users=6):
+    """One history per user, in each of the layouts the apps write."""
+    stores = []
+    layouts = [(JsonFileBackend, "flowtime_data.json"), (JournalBackend, "flowtime_v2.json"),
+               (SqliteBackend, "flowtime.db")]
+    for user in range(users):
+        store = make_store(user, 20 + user)
+        backend_class, name = layouts[user % 3]
+        folder = root / f"user{user}"
+        folder.mkdir()
+        backend = backend_class(str(folder / name))
+        backend.save(store)
+        backend.close(store)
+        stores.append(store)
+    return stores
+
+
+def test_parallel_rollup_matches_a_serial_one(tmp_path):
+    stores = write_team(tmp_path)
+    expected = Rollup()
+    for store in stores:
+        expected.add_store(store)
+
+    serial, _, errors = aggregate([str(tmp_path)], workers=1)
+    parallel, users, _ = aggregate([str(tmp_path)], workers=3, per_user=True)
+    assert errors == {}
+    assert serial.to_dict() == parallel.to_dict() == expected.to_dict()
+    assert parallel.users == 6
+    assert parallel.sessions == sum(len(store) for store in stores)
+    assert parallel.tasks["task 0"] == sum(store.work[i] for store in stores
+                                           for i in range(len(store)) if store.task(i) == "task 0")
+    assert len(users) == 6 and sum(rollup.sessions for rollup in users.values()) == parallel.sessions
+
+
+def test_merge_adds_every_field():
+    a, b = Rollup(), Rollup()
+    a.add_store(make_store(0, 4))
+    b.add_store(make_store(1, 6))
+    merged = Rollup().merge(a).merge(b)
+    assert merged.work == a.work + b.work
+    assert merged.breaks == a.breaks + b.breaks
+    assert merged.days == a.days + b.days
+    assert merged.to_dict(top=1)["tasks"] == {"task 0": a.tasks["task 0"] + b.tasks["task 0"]}
+
+
+def test_broken_files_are_reported_not_fatal(tmp_path, capsys):
+    write_team(tmp_path, users=2)
+    broken = tmp_path / "broken"
+    broken.mkdir()
+    (broken / "flowtime_data.json").write_text('[{"task_name": "x", "start_time": ')
+    output = tmp_path / "team.json"
+    main(["--workers", "2", "--output", str(output), str(tmp_path)])
+    assert "broken" in capsys.readouterr().err
+    report = output.read_text()
+    assert '"users": 2' in report and '"errors"' in report
@@ -0,0 +1,80 @@
+import pytest
+
+import flowtime.archive
+from flowtime.archive import NUMPY_AVAILABLE, Archive, ArchiveError, convert, write_archive
+from flowtime.records import NO_BREAK
+from flowtime.storage import JsonFileBackend
+from flowtime.store import SessionStore
+
+WITH_AND_WITHOUT_NUMPY = [pytest.param(True, marks=pytest.mark.skipif(not NUMPY_AVAILABLE, reason="needs NumPy")), False]
+
+
+def make_store(count):
+    store = SessionStore()
+    t = 1_700_000_000
+    for n in range(count):
+        store.append(["read", "maths", "ünïcode"][n % 3], t, t + 600 + n, 600 + n, 100)
+        t += 1000
+    store.set_break(count - 1, NO_BREAK)
+    return store
+
+
+def assert_same(store, other):
+    assert list(other.rows()) == list(store.rows())
+    assert other.total_work == store.total_work
+    assert other.total_break == store.total_break
+    assert list(other.tasks.uses) == list(store.tasks.uses)
+
+
+@pytest.mark.parametrize("numpy", WITH_AND_WITHOUT_NUMPY)
+def test_round_trip(tmp_path, monkeypatch, numpy):
+    monkeypatch.setattr(flowtime.archive, "NUMPY_AVAILABLE", numpy)
+    store = make_store(500)
+    path = str(tmp_path / "history.ftarc")
+    write_archive(path, store)
+    with Archive(path) as archive:
+        assert len(archive) == 500
+        assert archive.row(7) == store.row(7)
+        assert_same(store, archive.to_store())
+        if numpy:
+            assert not archive.work.flags.owndata # A view onto the mapping, not a copy
+            assert int(archive.work.sum()) == store.total_work
+            assert list(archive.task_ids[:3]) == list(store.task_ids[:3])
+
+
+@pytest.mark.parametrize("numpy", WITH_AND_WITHOUT_NUMPY)
+def test_empty_archive(tmp_path, monkeypatch, numpy):
+    monkeypatch.setattr(flowtime.archive, "NUMPY_AVAILABLE", numpy)
+    path = str(tmp_path / "empty.ftarc")
+    write_archive(path, SessionStore())
+    with Archive(path) as archive:
+        assert len(archive) == 0
+        assert archive.task_names == []
+        store = archive.to_store()
+        assert len(store) == 0 and store.total_work == 0
+        if numpy:
+            assert len(archive.records) == 0
+        with pytest.raises(IndexError):
+            archive.row(0)
+
+
+def test_bad_files_are_rejected(tmp_path):
+    path = tmp_path / "bad.ftarc"
+    for data in (b"", b"not an archive at all, really not", b"FLOWARC1"):
+        path.write_bytes(data)
+        with pytest.raises(ArchiveError):
+            Archive(str(path))
+    write_archive(str(path), make_store(10))
+    path.write_bytes(path.read_bytes()[:100]) # Truncated inside the records
+    with pytest.raises(ArchiveError):
+        Archive(str(path))
+
+
+def test_convert_from_a_history(tmp_path):
+    store = make_store(20)
+    history = str(tmp_path / "flowtime_data.json")
+    JsonFileBackend(history).save(store)
+    path = str(tmp_path / "history.ftarc")
+    assert convert(history, path) == 20
+    with Archive(path) as archive:
+        assert_same(store, archive.to_store())
@@ -0,0 +1,112 @@
+import threading
+import time
+import wave
+
+import flowtime.audio
+from flowtime.audio import (AlarmPlayer, BellSink, MiniaudioSink, NullSink, PlaysoundSink, WavFileSink, beep_clip,
+                            default_sink, load_clip)
+
+
+def write_wav(path, clip):
+    with open(path, "wb") as f:
+        f.write(clip.wav_bytes())
+    return str(path)
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_alarm_loops_until_stopped(tmp_path):
+    sink = NullSink()
+    player = AlarmPlayer(write_wav(tmp_path / "alarm.wav", beep_clip(seconds=0.01)), sink=sink, gap=0.01)
+    assert not player.ringing
+    player.start()
+    assert wait_for(lambda: sink.plays >= 3)
+    player.stop()
+    assert not player.ringing
+    time.sleep(0.05)
+    plays = sink.plays
+    time.sleep(0.05)
+    assert sink.plays == plays
+
+    player.start() # Rings again after a stop
+    assert wait_for(lambda: sink.plays > plays)
+    player.close()
+
+
+def test_stop_cuts_a_long_clip_short(tmp_path):
+    player = AlarmPlayer(write_wav(tmp_path / "alarm.wav", beep_clip(seconds=5)), sink=NullSink())
+    player.start()
+    assert wait_for(lambda: player.clip is not None)
+    stopped = time.monotonic()
+    player.close()
+    assert time.monotonic() - stopped < 0.5
+    assert not player._thread.is_alive()
+
+
+def test_clip_is_decoded_once(tmp_path, monkeypatch):
+    path = write_wav(tmp_path / "alarm.wav", beep_clip(seconds=0.01))
+    decodes = []
+    monkeypatch.setattr(flowtime.audio, "load_clip", lambda p: decodes.append(p) or load_clip(p))
+    sink = NullSink()
+    player = AlarmPlayer(path, sink=sink, gap=0.01)
+    assert player.clip is None # Nothing decoded until the alarm rings
+    for _ in range(3):
+        player.start()
+        plays = sink.plays
+        assert wait_for(lambda: sink.plays > plays)
+        player.stop()
+    player.close()
+    assert decodes == [path]
+
+
+def test_wav_sink_writes_the_clip(tmp_path):
+    out = tmp_path / "out.wav"
+    clip = beep_clip(seconds=0.01)
+    WavFileSink(str(out)).play(clip, threading.Event())
+    with wave.open(str(out), "rb") as w:
+        assert w.readframes(w.getnframes()) == clip.pcm
+
+
+def test_sink_choice(monkeypatch, tmp_path):
+    monkeypatch.setenv("FLOWTIME_AUDIO", "null")
+    assert type(default_sink()) is NullSink
+    monkeypatch.setenv("FLOWTIME_AUDIO", f"wav:{tmp_path / 'out.wav'}")
+    assert default_sink().path == str(tmp_path / "out.wav")
+
+    monkeypatch.delenv("FLOWTIME_AUDIO")
+    monkeypatch.setattr(flowtime.audio, "MINIAUDIO_AVAILABLE", True)
+    assert isinstance(default_sink(), MiniaudioSink)
+    monkeypatch.setattr(flowtime.audio, "MINIAUDIO_AVAILABLE", False)
+    monkeypatch.setattr(flowtime.audio, "PLAYSOUND_AVAILABLE", False)
+    monkeypatch.setattr(flowtime.audio.sys, "platform", "linux")
+    assert type(default_sink()) is BellSink
+
+
+def test_mp3_goes_to_playsound_without_miniaudio(monkeypatch, tmp_path):
+    mp3 = tmp_path / "notification.mp3"
+    mp3.write_bytes(b"ID3")
+    played = []
+    monkeypatch.delenv("FLOWTIME_AUDIO", raising=False)
+    monkeypatch.setattr(flowtime.audio, "MINIAUDIO_AVAILABLE", False)
+    monkeypatch.setattr(flowtime.audio, "PLAYSOUND_AVAILABLE", True)
+    monkeypatch.setattr(flowtime.audio, "playsound", lambda path, block: played.append((path, block)), raising=False)
+
+    sink = default_sink()
+    assert isinstance(sink, PlaysoundSink)
+    clip = load_clip(str(mp3))
+    assert clip.source == str(mp3)
+    sink.play(clip, threading.Event())
+    assert played == [(str(mp3), True)]
+
+    missing = load_clip(str(tmp_path / "missing.mp3")) # Beeps through the fallback sink instead
+    assert missing.source is None
+    sink.fallback = NullSink()
+    sink.play(missing, threading.Event())
+    assert played == [(str(mp3), True)] and sink.fallback.plays == 1
@@ -0,0 +1,115 @@
+from flowtime.core import (ALARM, BREAK, BREAK_ENDED, BREAK_EXPIRED, BREAK_MEASURED, BREAK_STARTED, IDLE,
+                           SESSION_SAVED, WORK_STARTED, WORKING, FakeClock, FlowtimeEngine)
+from flowtime.editing import Editor
+from flowtime.records import NO_BREAK
+from flowtime.store import SessionStore
+
+START = 1_700_000_000
+
+
+def make_engine(**kwargs):
+    store = SessionStore()
+    clock = FakeClock(START)
+    engine = FlowtimeEngine(store, clock=clock, **kwargs)
+    events = []
+    engine.subscribe(lambda event, data: events.append((event, data)))
+    return engine, store, clock, events
+
+
+def test_work_session_is_saved_with_its_focus_time():
+    engine, store, clock, events = make_engine()
+    engine.start_work("read")
+    assert engine.state == WORKING
+    clock.advance(1500)
+    assert engine.stop_work() == 0
+    assert engine.state == IDLE
+    assert store.row(0) == ("read", START, START + 1500, 1500, NO_BREAK)
+    assert events == [(WORK_STARTED, "read"), (SESSION_SAVED, 0)]
+
+
+def test_break_runs_into_alarm_and_ends():
+    engine, store, clock, events = make_engine()
+    engine.start_work("read")
+    clock.advance(600)
+    engine.stop_work()
+    engine.start_break(300)
+    assert engine.state == BREAK
+    clock.advance(299)
+    engine.tick()
+    assert engine.state == BREAK
+    clock.advance(1)
+    engine.tick()
+    assert engine.state == ALARM
+    engine.end_break()
+    assert engine.state == IDLE
+    assert [event for event, _ in events[2:]] == [BREAK_STARTED, BREAK_EXPIRED, BREAK_ENDED]
+    assert events[-1] == (BREAK_ENDED, False)
+
+
+def test_zero_length_break_rings_straight_away():
+    engine, _store, _clock, _events = make_engine()
+    engine.start_break(0)
+    assert engine.state == ALARM
+
+
+def test_next_session_measures_the_real_break():
+    engine, store, clock, events = make_engine()
+    engine.start_work("a")
+    clock.advance(600)
+    engine.stop_work()
+    engine.start_break(300)
+    clock.advance(450) # Overran the break
+    engine.start_work("b")
+    assert engine.state == WORKING
+    assert (BREAK_ENDED, True) in events
+    assert (BREAK_MEASURED, 0) in events
+    assert store.breaks[0] == 450
+    assert store.total_break == 450
+
+
+def test_break_length_picked_is_not_what_gets_stored():
+    engine, store, clock, _events = make_engine()
+    engine.start_work("a")
+    clock.advance(600)
+    engine.stop_work()
+    engine.start_break(300) # The advisor's suggestion, accepted in the popup
+    assert store.breaks[0] == NO_BREAK
+    clock.advance(100)
+    engine.end_break() # Came back early
+    clock.advance(20)
+    engine.start_work("b")
+    assert store.breaks[0] == 120
+
+
+def test_many_simulated_sessions():
+    engine, store, clock, _events = make_engine()
+    for n in range(1000):
+        engine.start_work(f"task {n % 7}")
+        clock.advance(600 + n % 60)
+        engine.stop_work()
+        clock.advance(120)
+    engine.start_work("last")
+    assert len(store) == 1000
+    assert store.total_work == sum(600 + n % 60 for n in range(1000))
+    assert store.total_break == 1000 * 120
+    assert len(store.task_names) == 7
+
+
+def test_pending_break_follows_edits_and_sync():
+    engine, store, clock, _events = make_engine()
+    for _ in range(5):
+        engine.start_work("a")
+        clock.advance(600)
+        engine.stop_work()
+        clock.advance(100)
+    editor = Editor(store)
+    editor.delete(1)
+    assert engine.pending_index() == 3
+    editor.split(0, store.starts[0] + 100)
+    assert engine.pending_index() == 4
+
+    engine.pin_pending()
+    store.append("phone", clock.now() + 10, clock.now() + 20, 10) # Pulled from another device
+    engine.start_work("b")
+    assert store.breaks[4] == 100
+    assert store.breaks[5] == NO_BREAK
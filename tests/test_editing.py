@@ -0,0 +1,70 @@
+import pytest
+
+from flowtime.editing import Editor
+from flowtime.index import SessionIndex
+from flowtime.records import NO_BREAK
+from flowtime.store import SessionStore
+
+
+def make_store(count=50):
+    store = SessionStore()
+    t = 1_700_000_000
+    for n in range(count):
+        store.append(f"t{n % 5}", t, t + 600, 600, 300)
+        t += 900
+    store.set_break(count - 1, NO_BREAK)
+    store.edits.clear()
+    return store
+
+
+def test_editor_operations_and_undo():
+    store = make_store()
+    index = SessionIndex(store)
+    index.sync()
+    editor = Editor(store)
+    before = list(store.rows())
+
+    editor.rename(3, "renamed")
+    editor.retime(5, store.starts[5] + 60, store.ends[5])
+    assert store.breaks[4] == 360 # Re-measured against the new start
+    editor.split(10, store.starts[10] + 300)
+    editor.merge(20)
+    editor.delete(30)
+    editor.retag([1, 2, 40], "bulk")
+    assert index.total() == store.total_work == sum(store.work)
+    assert index.task_total("bulk") == sum(store.work[i] for i in range(len(store)) if store.task(i) == "bulk")
+
+    while editor.can_undo:
+        editor.undo()
+    assert list(store.rows()) == before
+    assert index.total() == store.total_work
+
+
+def test_editor_rejects_bad_edits():
+    store = make_store(3)
+    editor = Editor(store)
+    with pytest.raises(ValueError):
+        editor.retime(1, store.starts[2] + 1, store.starts[2] + 10)
+    with pytest.raises(ValueError):
+        editor.retag([0, 7], "x")
+    with pytest.raises(ValueError):
+        editor.merge(2)
+    assert list(store.edits) == []
+
+
+def test_update_is_checked_before_anything_changes():
+    store = make_store(3)
+    editor = Editor(store)
+    before = list(store.rows())
+    with pytest.raises(ValueError):
+        editor.update(1, "  ", store.starts[1] + 60, store.ends[1])
+    with pytest.raises(ValueError):
+        editor.update(1, "x", store.starts[2] + 1, store.starts[2] + 10)
+    assert list(store.rows()) == before
+    assert list(store.edits) == []
+
+    editor.update(1, "x", store.starts[1] + 60, store.ends[1])
+    assert store.row(1)[:3] == ("x", before[1][1] + 60, before[1][2])
+    assert store.breaks[0] == 360
+    editor.undo() # One operation, one undo
+    assert list(store.rows()) == before
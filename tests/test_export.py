@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+
+from flowtime.export import CLIPBOARD_LIMIT, HEADER, JSONL_BATCH, clipboard_text, export_file, format_for, main, write_export
+from flowtime.records import NO_BREAK, format_timestamp
+from flowtime.storage import JsonFileBackend
+from flowtime.store import SessionStore
+
+START = 1_700_000_000
+
+
+def make_store(count):
+    store = SessionStore()
+    for n in range(count):
+        t = START + 1000 * n
+        store.append(f"task, {n % 3}", t, t + 600, 600, 120)
+    store.set_break(count - 1, NO_BREAK)
+    return store
+
+
+def test_csv_and_tsv_rows():
+    store = make_store(3)
+    for fmt, dialect in (("csv", "excel"), ("tsv", "excel-tab")):
+        out = io.StringIO()
+        assert write_export(store, out, fmt) == 3
+        rows = list(csv.reader(io.StringIO(out.getvalue()), dialect=dialect))
+        assert rows[0] == list(HEADER)
+        assert rows[1] == ["task, 0", format_timestamp(START), format_timestamp(START + 600), "0:10:00", "0:02:00"]
+        assert rows[3][4] == "On Break..."
+
+
+def test_jsonl_spans_batches():
+    store = make_store(JSONL_BATCH + 5)
+    out = io.StringIO()
+    assert write_export(store, out, "jsonl") == JSONL_BATCH + 5
+    lines = out.getvalue().splitlines()
+    assert len(lines) == JSONL_BATCH + 5
+    assert json.loads(lines[0]) == {"task": "task, 0", "start": format_timestamp(START),
+                                    "end": format_timestamp(START + 600), "work_sec": 600, "break_sec": 120}
+    assert json.loads(lines[-1])["break_sec"] is None
+
+
+def test_selection_and_clipboard_limit():
+    store = make_store(CLIPBOARD_LIMIT + 10)
+    text = clipboard_text(store, range(CLIPBOARD_LIMIT))
+    assert text.count("\n") == CLIPBOARD_LIMIT + 1 # Header + rows
+    assert text.splitlines()[1].split("\t")[0] == "task, 0"
+
+    out = io.StringIO()
+    assert write_export(store, out, "csv", indices=[5, 2]) == 2
+    assert [row[1] for row in csv.reader(io.StringIO(out.getvalue()))][1:] == [
+        format_timestamp(START + 5000), format_timestamp(START + 2000)]
+
+
+def test_format_for():
+    assert format_for("a.TSV") == "tsv"
+    assert format_for("a.json") == "jsonl"
+    assert format_for("a.txt") == "csv"
+
+
+def test_command_line_export(tmp_path):
+    history = str(tmp_path / "flowtime_data.json")
+    JsonFileBackend(history).save(make_store(4))
+    output = str(tmp_path / "out.jsonl")
+    main(["--output", output, history])
+    with open(output) as f:
+        assert [json.loads(line)["start"] for line in f] == [format_timestamp(START + 1000 * n) for n in range(4)]
+    assert export_file(SessionStore(), str(tmp_path / "empty.csv")) == 0
+    assert (tmp_path / "empty.csv").read_text() == ",".join(HEADER) + "\n"
@@ -0,0 +1,37 @@
+import random
+
+from flowtime.index import SessionIndex
+from flowtime.records import NO_BREAK
+from flowtime.store import SessionStore
+
+
+def test_index_matches_brute_force():
+    rng = random.Random(1)
+    store = SessionStore()
+    index = SessionIndex(store)
+    t = 0
+
+    def brute(lo, hi, task=None):
+        return sum(store.work[i] for i in range(len(store))
+                   if lo <= store.starts[i] < hi and (task is None or store.task(i) == task))
+
+    for step in range(3000):
+        r = rng.random()
+        if r < 0.5 or len(store) < 3:
+            t += rng.randint(10, 1000)
+            store.append(rng.choice("abc"), t, t + 50, rng.randint(1, 100))
+        elif r < 0.7:
+            start = rng.randint(0, t)
+            store.replace(rng.randrange(len(store)), rng.choice("abcd"), start, start + 5, rng.randint(1, 100), NO_BREAK)
+        elif r < 0.85:
+            start = rng.randint(0, t)
+            store.insert(rng.randrange(len(store) + 1), rng.choice("abc"), start, start + 5, rng.randint(1, 100))
+        else:
+            store.delete(rng.randrange(len(store)))
+        if step % 37 == 0:
+            lo = rng.randint(0, t)
+            hi = lo + rng.randint(0, t)
+            assert index.total(lo, hi) == brute(lo, hi)
+            assert index.count(lo, hi) == sum(1 for i in range(len(store)) if lo <= store.starts[i] < hi)
+            assert index.task_total("a", lo, hi) == brute(lo, hi, "a")
+            assert index.total() == store.total_work == sum(store.work)
@@ -0,0 +1,88 @@
+import json
+import random
+import threading
+
+import pytest
+
+import flowtime.instrument
+from flowtime.instrument import BUCKETS, Histogram, Tracer, _bucket, _bucket_limit, span, traced
+
+
+def test_buckets_cover_every_value_in_order():
+    previous = -1
+    for i in range(BUCKETS - 1):
+        limit = _bucket_limit(i)
+        assert limit > previous
+        assert _bucket(previous + 1) == i == _bucket(limit)
+        if limit >= 8:
+            assert limit - previous <= (previous + 1) / 8 + 1 # About 12% wide
+        previous = limit
+    assert _bucket(10 ** 15) == BUCKETS - 1
+
+
+def test_percentiles_are_within_a_bucket():
+    rng = random.Random(7)
+    values = sorted(rng.expovariate(1 / 5000) for _ in range(10000))
+    histogram = Histogram()
+    for us in values:
+        histogram.record(us)
+    for p in (50, 90, 99):
+        exact = values[int(p / 100 * len(values)) - 1]
+        assert exact <= histogram.percentile(p) <= exact * 1.13 + 1
+    assert histogram.percentile(100) == histogram.max_us == values[-1]
+    assert Histogram().percentile(50) == 0
+
+
+def test_spans_and_wrapped_calls_are_recorded(tmp_path):
+    tracer = Tracer()
+    add = tracer.wrap(lambda a, b: a + b, "add")
+    assert add(2, 3) == 5
+    with pytest.raises(ZeroDivisionError):
+        tracer.wrap(lambda: 1 / 0, "fails")()
+    with tracer.span("block"):
+        pass
+    thread = threading.Thread(target=add, args=(1, 1))
+    thread.start()
+    thread.join()
+
+    summary = tracer.summary()
+    assert summary["add"]["count"] == 2
+    assert summary["fails"]["count"] == 1 # Timed even when it raises
+    assert summary["block"]["p50_ms"] <= summary["block"]["max_ms"]
+    assert "add" in tracer.format_summary()
+
+    path = tmp_path / "trace.json"
+    tracer.dump(str(path))
+    trace = json.loads(path.read_text())
+    events = trace["traceEvents"]
+    assert [e["name"] for e in events] == ["add", "fails", "block", "add"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 and e["ts"] >= 0 for e in events)
+    assert events[0]["ts"] <= events[1]["ts"] <= events[2]["ts"]
+    assert len({e["tid"] for e in events}) == 2
+    assert trace["displayTimeUnit"] == "ms"
+
+
+def test_old_spans_are_dropped_from_the_trace():
+    tracer = Tracer(max_events=3)
+    for n in range(5):
+        tracer.record(f"s{n}", 0, 1000)
+    assert [e[0] for e in tracer.events] == ["s2", "s3", "s4"]
+    assert sum(s["count"] for s in tracer.summary().values()) == 5 # Histograms keep everything
+
+
+def test_disabled_tracing_changes_nothing(monkeypatch):
+    monkeypatch.setattr(flowtime.instrument, "tracer", None)
+
+    def handler():
+        return 1
+    assert traced()(handler) is handler
+    assert span("a") is span("b")
+    with span("a"):
+        pass
+
+    tracer = Tracer()
+    monkeypatch.setattr(flowtime.instrument, "tracer", tracer)
+    assert traced("named")(handler)() == 1
+    with span("block"):
+        pass
+    assert set(tracer.histograms) == {"named", "block"}
@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+import flowtime.journal
+from flowtime.journal import SessionJournal
+from flowtime.records import v2_fields
+
+
+def row(n):
+    start = 1_700_000_000 + 1000 * n
+    return (f"t{n % 3}", start, start + 600, 600, 400)
+
+
+def record(n):
+    return v2_fields(*row(n))
+
+
+def write_journal(path, count):
+    journal = SessionJournal(str(path))
+    for n in range(count):
+        journal.append(record(n))
+    journal.close()
+    return journal
+
+
+def test_appends_are_replayed(tmp_path):
+    path = tmp_path / "flowtime_v2.json"
+    write_journal(path, 5)
+    assert SessionJournal(str(path)).load() == [record(n) for n in range(5)]
+
+
+def test_torn_last_line_is_dropped_and_overwritten(tmp_path):
+    path = tmp_path / "flowtime_v2.json"
+    journal = write_journal(path, 3)
+    with open(journal.journal_path, "a") as f:
+        f.write('{"task": "half')
+
+    journal = SessionJournal(str(path))
+    assert len(journal.load()) == 3
+    journal.append(record(3))
+    journal.close()
+    assert SessionJournal(str(path)).load() == [record(n) for n in range(4)]
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    path = tmp_path / "flowtime_v2.json"
+    journal = SessionJournal(str(path), compact_every=4)
+    for n in range(4):
+        journal.append(record(n))
+    assert journal.needs_compaction()
+    journal.compact([record(n) for n in range(4)])
+    journal.append(record(4))
+    journal.close()
+
+    with open(path) as f:
+        assert json.load(f) == [record(n) for n in reversed(range(4))] # Snapshot is newest first
+    assert not SessionJournal(str(path)).needs_compaction()
+    assert SessionJournal(str(path)).load() == [record(n) for n in range(5)]
+
+
+@pytest.mark.parametrize("crash_at", [0, 1])
+def test_crash_during_compaction_loses_nothing(tmp_path, monkeypatch, crash_at):
+    path = tmp_path / "flowtime_v2.json"
+    journal = write_journal(path, 6)
+    records = journal.load()
+    write = flowtime.journal.atomic_write
+    calls = []
+
+    def crashing_write(target, text):
+        if len(calls) == crash_at:
+            raise RuntimeError("crash")
+        calls.append(target)
+        write(target, text)
+
+    monkeypatch.setattr(flowtime.journal, "atomic_write", crashing_write)
+    with pytest.raises(RuntimeError):
+        journal.compact(records)
+    monkeypatch.undo()
+    assert SessionJournal(str(path)).load() == records
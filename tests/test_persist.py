@@ -0,0 +1,39 @@
+import sqlite3
+import threading
+
+from flowtime.persist import BackgroundWriter
+
+
+def test_failed_write_does_not_stop_the_writer():
+    written = []
+    first = threading.Event()
+
+    def write(snapshot):
+        if snapshot == "locked":
+            first.set()
+            raise sqlite3.OperationalError("database is locked")
+        written.append(snapshot)
+
+    writer = BackgroundWriter(write)
+    writer.submit("locked")
+    first.wait(1)
+    writer.submit("next")
+    writer.close() # Would block forever if the worker had died
+    assert written == ["next"]
+
+
+def test_pending_snapshots_coalesce():
+    release = threading.Event()
+    written = []
+
+    def write(snapshot):
+        release.wait(1)
+        written.append(snapshot)
+
+    writer = BackgroundWriter(write)
+    writer.submit(1)
+    for n in range(2, 10):
+        writer.submit(n)
+    release.set()
+    writer.close()
+    assert written[-1] == 9 and len(written) <= 3
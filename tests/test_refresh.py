@@ -0,0 +1,85 @@
+import heapq
+import itertools
+
+from flowtime.core import ALARM, BREAK, IDLE, WORKING, FakeClock, FlowtimeEngine
+from flowtime.refresh import RefreshScheduler
+from flowtime.store import SessionStore
+
+
+class FakeLoop:
+    """call_later/cancel over the engine's FakeClock."""
+    def __init__(self, clock):
+        self.clock = clock
+        self.timers = []
+        self.cancelled = set()
+        self._ids = itertools.count()
+
+    def call_later(self, seconds, callback):
+        handle = next(self._ids)
+        heapq.heappush(self.timers, (self.clock.mono + seconds, handle, callback))
+        return handle
+
+    def cancel(self, handle):
+        self.cancelled.add(handle)
+
+    def run(self, seconds):
+        """Advances the clock, running due callbacks. Returns how many ran."""
+        end = self.clock.mono + seconds
+        wakes = 0
+        while self.timers and self.timers[0][0] <= end:
+            when, handle, callback = heapq.heappop(self.timers)
+            if handle in self.cancelled:
+                continue
+            self.clock.advance(when - self.clock.mono)
+            callback()
+            wakes += 1
+        self.clock.advance(end - self.clock.mono)
+        return wakes
+
+
+def setup():
+    clock = FakeClock(1_700_000_000)
+    loop = FakeLoop(clock)
+    engine = FlowtimeEngine(SessionStore(), clock=clock)
+    frames = []
+    scheduler = RefreshScheduler(engine, lambda changes: frames.append(dict(changes)),
+                                 loop.call_later, loop.cancel, flash=True)
+    scheduler.wake()
+    return engine, scheduler, loop, frames
+
+
+def test_idle_engine_never_wakes():
+    _engine, _scheduler, loop, frames = setup()
+    assert frames == [{"title": None, "clock": (IDLE, 0), "flash": False}]
+    assert loop.run(3600) == 0
+
+
+def test_wakeups_follow_visibility():
+    engine, scheduler, loop, frames = setup()
+    engine.start_work("read")
+    assert 55 <= loop.run(60) <= 60
+    scheduler.set_focused(False)
+    assert 10 <= loop.run(60) <= 13
+    scheduler.set_visible(False)
+    assert loop.run(600) <= 11
+    assert "clock" not in frames[-1]
+
+    scheduler.set_visible(True) # Catches up at once
+    assert frames[-1]["clock"] == (WORKING, 720)
+
+
+def test_hidden_break_still_rings_on_time():
+    engine, scheduler, loop, frames = setup()
+    engine.start_break(125)
+    assert frames[-1]["clock"] == (BREAK, 125)
+    scheduler.set_visible(False)
+    loop.run(126)
+    assert engine.state == ALARM
+    assert loop.run(600) == 0 # A hidden alarm does not flash
+
+    scheduler.set_visible(True)
+    assert frames[-1]["clock"] == (ALARM, 0)
+    assert loop.run(4) >= 3 # Flashing again
+    engine.end_break()
+    assert frames[-1]["clock"] == (IDLE, 0)
+    assert loop.run(60) == 0
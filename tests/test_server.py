@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import flowtime.server
+from flowtime.server import HistorySource, StatsServer
+from flowtime.storage import JsonFileBackend
+from flowtime.store import SessionStore
+
+
+def write_history(path, count):
+    store = SessionStore()
+    t = 1_700_000_000
+    for n in range(count):
+        store.append(f"task {n % 4}", t, t + 600, 600, 300)
+        t += 1000
+    JsonFileBackend(str(path)).save(store)
+    return store
+
+
+async def fetch(port, target, headers=()):
+    """(status, headers, body) of one GET; chunked bodies are joined."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"GET {target} HTTP/1.1", "Host: localhost", "Connection: close", *headers]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    data = await reader.read()
+    writer.close()
+    head, _, body = data.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode().split("\r\n")
+    response_headers = {k.lower(): v.strip() for k, _, v in (line.partition(":") for line in header_lines)}
+    if response_headers.get("transfer-encoding") == "chunked":
+        chunks = []
+        while True:
+            size, _, body = body.partition(b"\r\n")
+            size = int(size, 16)
+            if not size:
+                break
+            chunks.append(body[:size])
+            body = body[size + 2:]
+        body = b"".join(chunks)
+    return int(status_line.split()[1]), response_headers, body
+
+
+def run(sources, scenario):
+    async def main():
+        server = await asyncio.start_server(StatsServer(sources).handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await scenario(lambda target, *headers: fetch(port, target, headers))
+    return asyncio.run(main())
+
+
+def test_etag_revalidation_and_invalidation(tmp_path):
+    path = tmp_path / "flowtime_data.json"
+    write_history(path, 10)
+
+    async def scenario(get):
+        status, headers, body = await get("/api/me/daily")
+        assert status == 200
+        etag = headers["etag"]
+        assert sum(json.loads(body)["tasks"].values()) == 6000
+
+        status, headers, body = await get("/api/me/daily", f"If-None-Match: {etag}")
+        assert status == 304 and body == b"" and headers["etag"] == etag
+
+        write_history(path, 12) # Recorded something new
+        status, headers, body = await get("/api/me/daily", f"If-None-Match: {etag}")
+        assert status == 200 and headers["etag"] != etag
+        assert sum(json.loads(body)["tasks"].values()) == 7200
+
+        status, headers, _ = await get("/api/me/summary")
+        assert status == 200 and headers["etag"] != etag # Also keyed on the day
+    run([HistorySource("me", str(path))], scenario)
+
+
+def test_session_pages_follow_the_cursor(tmp_path):
+    path = tmp_path / "flowtime_data.json"
+    store = write_history(path, 1234)
+
+    async def scenario(get):
+        seen = []
+        target = "/api/me/sessions?limit=500"
+        while target:
+            status, headers, body = await get(target)
+            assert status == 200 and headers["transfer-encoding"] == "chunked"
+            page = json.loads(body)
+            assert page["total"] == 1234
+            seen.extend(page["sessions"])
+            target = f"/api/me/sessions?limit=500&before={page['next']}" if page["next"] is not None else None
+        return seen
+    seen = run([HistorySource("me", str(path))], scenario)
+    assert [row["index"] for row in seen] == list(range(1233, -1, -1))
+    assert seen[0]["task"] == store.task(1233)
+
+
+def test_errors_are_json_responses(tmp_path, monkeypatch):
+    path = tmp_path / "flowtime_data.json"
+    write_history(path, 3)
+    monkeypatch.setattr(flowtime.server, "INDEX_HTML", str(tmp_path / "missing.html"))
+
+    async def scenario(get):
+        statuses = {}
+        for target in ("/", "/api/nobody/summary", "/api/me/nothing", "/api/me/sessions?limit=x", "/api/users"):
+            status, _, body = await get(target)
+            statuses[target] = status
+            json.loads(body)
+        (tmp_path / "index.html").write_text("<html></html>")
+        monkeypatch.setattr(flowtime.server, "INDEX_HTML", str(tmp_path / "index.html"))
+        status, headers, body = await get("/")
+        assert status == 200 and headers["content-type"].startswith("text/html") and body == b"<html></html>"
+        return statuses
+    assert run([HistorySource("me", str(path))], scenario) == {
+        "/": 404, "/api/nobody/summary": 404, "/api/me/nothing": 404, "/api/me/sessions?limit=x": 400,
+        "/api/users": 200}
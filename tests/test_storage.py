@@ -0,0 +1,206 @@
+import sqlite3
+
+import pytest
+
+from flowtime.core import FakeClock, FlowtimeEngine
+from flowtime.editing import Editor
+from flowtime.journal import SessionJournal
+from flowtime.records import NO_BREAK
+from flowtime.storage import JournalBackend, JsonFileBackend, SqliteBackend, migrate, open_history
+from flowtime.store import SessionStore
+
+BACKENDS = {
+    "json": (JsonFileBackend, "flowtime_data.json"),
+    "journal": (JournalBackend, "flowtime_v2.json"),
+    "sqlite": (SqliteBackend, "flowtime.db"),
+}
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def history(request, tmp_path):
+    backend_class, name = BACKENDS[request.param]
+    path = str(tmp_path / name)
+    return lambda: backend_class(path)
+
+
+def sessions(count):
+    t = 1_700_000_000
+    rows = []
+    for n in range(count):
+        rows.append((f"task {n % 4}", t, t + 1500, 1500, 300))
+        t += 1800
+    rows[-1] = rows[-1][:4] + (NO_BREAK,)
+    return rows
+
+
+def reopen(history, store):
+    backend = history()
+    backend.save(store)
+    backend.close(store)
+    return history().load()
+
+
+def test_round_trip(history):
+    store = SessionStore()
+    store.extend(sessions(100))
+    loaded = reopen(history, store)
+    assert list(loaded.rows()) == list(store.rows())
+    assert loaded.total_work == store.total_work
+    assert loaded.total_break == store.total_break
+
+
+def test_incremental_saves_and_edits(history):
+    backend = history()
+    store = backend.load()
+    rows = sessions(30)
+    store.extend(rows[:20])
+    backend.save(store)
+    store.extend(rows[20:])
+    editor = Editor(store)
+    editor.rename(2, "renamed")
+    editor.split(5, store.starts[5] + 600)
+    editor.merge(10)
+    editor.delete(0)
+    backend.save(store)
+    backend.close(store)
+    assert list(history().load().rows()) == list(store.rows())
+
+
+def test_recent_returns_the_newest_sessions(history):
+    store = SessionStore()
+    store.extend(sessions(50))
+    backend = history()
+    backend.save(store)
+    backend.close(store)
+    recent = history().recent(10)
+    # The journal backend also returns whatever is still in the journal
+    assert recent[-10:] == list(store.rows())[-10:]
+
+
+def test_break_measured_after_save_is_kept(history):
+    backend = history()
+    store = backend.load()
+    clock = FakeClock(1_700_000_000)
+    engine = FlowtimeEngine(store, clock=clock)
+    engine.start_work("desk")
+    clock.advance(50)
+    engine.stop_work()
+    backend.save(store)
+
+    store.append("phone", clock.now() + 100, clock.now() + 200, 100) # Pulled by sync
+    engine.pin_pending()
+    backend.save(store)
+    clock.advance(500)
+    engine.start_work("desk")
+    backend.save(store)
+    backend.close(store)
+    assert history().load().row(0) == ("desk", 1_700_000_000, 1_700_000_050, 50, 500)
+
+
+def test_open_history_detects_the_layout(tmp_path):
+    store = SessionStore()
+    store.extend(sessions(3))
+    for backend_class, name in BACKENDS.values():
+        path = str(tmp_path / name)
+        backend_class(path).save(store)
+        assert isinstance(open_history(path), backend_class)
+
+
+def journal_row(n):
+    start = 1_700_000_000 + 1000 * n
+    return (f"t{n % 3}", start, start + 600, 600, 400)
+
+
+def test_edits_are_journaled_and_replayed(tmp_path):
+    path = str(tmp_path / "flowtime_v2.json")
+    backend = JournalBackend(path)
+    store = backend.load()
+    for n in range(5):
+        store.append(*journal_row(n))
+    backend.save(store)
+    store.replace(1, "renamed", *store.row(1)[1:])
+    store.delete(3)
+    store.insert(0, "first", 0, 10, 10)
+    backend.save(store)
+    backend.close(store)
+    assert list(JournalBackend(path).load().rows()) == list(store.rows())
+
+
+def test_grown_journal_is_compacted_after_load(tmp_path):
+    path = str(tmp_path / "flowtime_v2.json")
+    backend = JournalBackend(path)
+    store = backend.load()
+    for n in range(600):
+        store.append(*journal_row(n))
+        backend.save(store)
+    backend.journal.close() # No close(): the app was killed
+
+    backend = JournalBackend(path)
+    backend.recent(10)
+    loaded = backend.load()
+    assert backend.journal.needs_compaction()
+    backend.compact(loaded)
+    assert not backend.journal.needs_compaction()
+    assert SessionJournal(path).read_journal()[1] == []
+
+    loaded.append(*journal_row(600))
+    backend.save(loaded)
+    backend.close(loaded)
+    assert list(JournalBackend(path).load().rows()) == [journal_row(n) for n in range(601)]
+
+
+def test_snapshots_carry_only_unsaved_edits(history):
+    backend = history()
+    store = backend.load()
+    store.extend(sessions(20))
+    backend.save(store.copy(backend.edits_saved(store)))
+    Editor(store).rename(4, "renamed")
+    store.delete(7)
+    snapshot = store.copy(backend.edits_saved(store))
+    assert len(list(snapshot.edits)) <= 2
+    backend.save(snapshot)
+    backend.close(store)
+    assert list(history().load().rows()) == list(store.rows())
+
+
+def test_read_only_open_leaves_the_database_alone(tmp_path):
+    path = str(tmp_path / "flowtime.db")
+    assert len(open_history(path, read_only=True).load()) == 0
+    assert not (tmp_path / "flowtime.db").exists()
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    conn.execute("CREATE TABLE sessions (id INTEGER PRIMARY KEY, task_id INTEGER, start INTEGER, "
+                 "end INTEGER, work INTEGER, brk INTEGER)")
+    conn.execute("INSERT INTO tasks VALUES (1, 'read')")
+    conn.execute("INSERT INTO sessions VALUES (1, 1, 0, 60, 60, 10)")
+    conn.commit()
+    conn.close()
+    backend = open_history(path, read_only=True)
+    assert list(backend.load().rows()) == [("read", 0, 60, 60, 10)]
+    assert backend.recent(5) == [("read", 0, 60, 60, 10)]
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert conn.execute("SELECT count(*) FROM sqlite_master WHERE name = 'sessions_start'").fetchone()[0] == 0
+    conn.close()
+
+
+def test_migrating_twice_adds_nothing(tmp_path):
+    store = SessionStore()
+    store.extend(sessions(30))
+    json_path = str(tmp_path / "flowtime_data.json")
+    JsonFileBackend(json_path).save(store)
+    db_path = str(tmp_path / "flowtime.db")
+    assert migrate(db_path, [json_path]) == 30
+    assert migrate(db_path, [json_path]) == 0
+    assert list(SqliteBackend(db_path).load().rows()) == list(store.rows())
+
+
+def test_unknown_layout_is_rejected(tmp_path):
+    path = tmp_path / "flowtime_study_data.json" # The oldest app's records: no task at all
+    path.write_text('[{"start_time": "2024-12-27 12:36", "end_time": "2024-12-27 12:36", '
+                    '"work_time": "0:00", "break_time": null}]')
+    with pytest.raises(ValueError):
+        open_history(str(path))
+    with pytest.raises(ValueError):
+        migrate(str(tmp_path / "flowtime.db"), [str(path)])
@@ -0,0 +1,60 @@
+import pytest
+
+from flowtime.records import NO_BREAK
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, EDIT_SET, SessionStore
+
+
+def make_store(count=50):
+    store = SessionStore()
+    t = 1_700_000_000
+    for n in range(count):
+        store.append(f"t{n % 5}", t, t + 600, 600, 300)
+        t += 900
+    store.set_break(count - 1, NO_BREAK)
+    store.edits.clear()
+    return store
+
+
+def test_edits_are_logged_and_totals_kept():
+    store = make_store(5)
+    store.replace(1, "x", store.starts[1], store.ends[1], 100, 50)
+    store.insert(2, "y", store.starts[1] + 10, store.starts[1] + 20, 10)
+    store.delete(0)
+    store.set_break(0, 70)
+    assert [edit[:2] for edit in store.edits] == [(EDIT_SET, 1), (EDIT_INSERT, 2), (EDIT_DELETE, 0), (EDIT_SET, 0)]
+    assert store.total_work == sum(store.work)
+    assert store.total_break == sum(b for b in store.breaks if b != NO_BREAK)
+    assert store.task(0) == "x"
+
+
+def test_unchanged_break_is_not_logged():
+    store = make_store(3)
+    store.set_break(0, 300)
+    assert list(store.edits) == []
+
+
+def test_edits_before_skips_unseen_sessions():
+    store = make_store(10)
+    store.replace(2, "x", *store.row(2)[1:])
+    store.insert(0, "y", 0, 1, 1)
+    store.replace(8, "z", *store.row(8)[1:]) # Past what the consumer has seen
+    edits, seen = store.edits_before(0, 5)
+    assert [edit[:2] for edit in edits] == [(EDIT_SET, 2), (EDIT_INSERT, 0)]
+    assert seen == 6
+
+
+def test_copy_keeps_only_the_edits_a_consumer_still_needs():
+    store = make_store(10)
+    store.replace(1, "x", *store.row(1)[1:])
+    position = len(store.edits)
+    store.delete(2)
+    store.set_break(3, 5)
+
+    snapshot = store.copy(position)
+    assert len(snapshot.edits) == len(store.edits) == 3
+    assert [edit[:2] for edit in snapshot.edits[position:]] == [(EDIT_DELETE, 2), (EDIT_SET, 3)]
+    edits, seen = snapshot.edits_before(position, 10)
+    assert len(edits) == 2 and seen == 9
+    with pytest.raises(IndexError):
+        snapshot.edits[0:]
+    assert list(store.copy(len(store.edits)).edits) == []
@@ -0,0 +1,96 @@
+import random
+import statistics
+
+import pytest
+
+from flowtime.index import DAY
+from flowtime.records import NO_BREAK
+from flowtime.store import SessionStore
+from flowtime.suggest import MIN_SAMPLES, BreakAdvisor, P2Quantile, RatioStats, default_minutes
+
+START = 20_000 * DAY
+
+
+def add_sessions(store, task, count, ratio, hour=9, work=3000):
+    """Sessions of `task` ending at `hour`, one per day after the store's last, with breaks of ratio * work."""
+    day = store.starts[-1] // DAY + 1 if len(store) else START // DAY
+    for n in range(count):
+        end = (day + n) * DAY + hour * 3600
+        store.append(task, end - work, end, work, int(ratio * work))
+
+
+@pytest.mark.parametrize("p", [0.5, 0.9])
+def test_p2_tracks_the_quantile(p):
+    rng = random.Random(3)
+    sketch = P2Quantile(p)
+    samples = [rng.lognormvariate(0, 0.5) for _ in range(20000)]
+    for x in samples:
+        sketch.add(x)
+    exact = statistics.quantiles(samples, n=100)[int(p * 100) - 1]
+    assert sketch.value() == pytest.approx(exact, rel=0.03)
+
+
+def test_ewma_until_the_median_is_trusted():
+    stats = RatioStats()
+    stats.add(0.2)
+    assert stats.ratio() == 0.2
+    stats.add(1.2)
+    assert stats.ratio() == pytest.approx(0.3) # EWMA with ALPHA = 0.1
+    for _ in range(MIN_SAMPLES):
+        stats.add(0.2)
+    assert stats.ratio() == 0.2 # Median: the one long break no longer counts
+
+
+def test_default_rule_without_history():
+    advisor = BreakAdvisor(SessionStore())
+    assert advisor.suggest(10 * 60) == 3 == default_minutes(10 * 60)
+    assert advisor.suggest(50 * 60) == 10
+
+
+def test_tasks_and_time_of_day_get_their_own_ratio():
+    store = SessionStore()
+    add_sessions(store, "maths", 30, 0.4)
+    add_sessions(store, "reading", 30, 0.1)
+    advisor = BreakAdvisor(store)
+    assert advisor.suggest(3000, "maths") == 20
+    assert advisor.suggest(3000, "reading") == 5
+    assert advisor.suggest(3000, "new task") == pytest.approx(advisor.overall.ratio() * 50, abs=1)
+
+
+def test_time_of_day_scales_the_ratio():
+    store = SessionStore()
+    for _ in range(20):
+        add_sessions(store, "a", 1, 0.1, hour=9)
+        add_sessions(store, "a", 1, 0.2, hour=15)
+        add_sessions(store, "a", 1, 0.3, hour=22) # Tired in the evening
+    advisor = BreakAdvisor(store)
+    assert advisor.suggest(3000, "a") == 10
+    assert advisor.suggest(3000, "a", START + 9 * 3600) == 5
+    assert advisor.suggest(3000, "a", START + 22 * 3600) == 15
+    assert advisor.suggest(3000, "a", START + 3 * 3600) == 10 # No history at night
+
+
+def test_running_break_is_learned_once_measured():
+    store = SessionStore()
+    add_sessions(store, "a", MIN_SAMPLES, 0.2)
+    store.set_break(len(store) - 1, NO_BREAK)
+    advisor = BreakAdvisor(store)
+    assert advisor.ratio() is None # Only MIN_SAMPLES - 1 breaks known so far
+    store.set_break(len(store) - 1, 600)
+    assert advisor.ratio() == pytest.approx(0.2)
+
+
+def test_edits_retrain_the_model():
+    store = SessionStore()
+    add_sessions(store, "a", 20, 0.1)
+    advisor = BreakAdvisor(store)
+    assert advisor.ratio("a") == pytest.approx(0.1)
+    for i in range(len(store)):
+        store.set_break(i, int(0.3 * store.work[i]))
+    assert advisor.ratio("a") == pytest.approx(0.3)
+    store.delete(0)
+    assert advisor.ratio("a") == pytest.approx(0.3)
+    assert advisor.overall.count == 19 # Retrained from the sessions that are left
+
+    store.clear()
+    assert advisor.ratio() is None
@@ -0,0 +1,158 @@
+from flowtime.editing import Editor
+from flowtime.records import NO_BREAK
+from flowtime.store import EDIT_DELETE, EDIT_INSERT, SessionStore
+from flowtime.sync import LocalTransport, SyncClient, SyncServer, SyncState
+
+
+def make_store(count, task="t", start=1_700_000_000):
+    store = SessionStore()
+    t = start
+    for n in range(count):
+        store.append(f"{task}{n % 5}", t, t + 600, 600, 300)
+        t += 900
+    store.set_break(count - 1, NO_BREAK)
+    return store
+
+
+def client(store, path, server, batch=20):
+    return SyncClient(store, SyncState(str(path)), LocalTransport(server), batch=batch)
+
+
+def by_time(store):
+    return sorted(store.rows(), key=lambda row: (row[1], row[0]))
+
+
+def test_two_devices_converge(tmp_path):
+    server = SyncServer()
+    a = make_store(50, "a")
+    b = make_store(30, "b", start=1_700_000_300)
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+    sync_b = client(b, tmp_path / "b.sync.json", server)
+    sync_a.sync()
+    sync_b.sync()
+    sync_a.sync()
+    assert len(a) == len(b) == 80
+    assert list(a.rows()) == list(b.rows()) == by_time(a)
+    assert sync_a.sync() == []
+
+
+def test_edits_reach_the_other_device(tmp_path):
+    server = SyncServer()
+    a = make_store(50)
+    b = SessionStore()
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+    sync_b = client(b, tmp_path / "b.sync.json", server)
+    sync_a.sync()
+    sync_b.sync()
+
+    editor = Editor(a)
+    editor.rename(3, "x")
+    editor.delete(7)
+    editor.retime(12, a.starts[12], a.ends[12] - 60)
+    sync_a.sync()
+    edits = sync_b.sync()
+    assert sum(kind == EDIT_DELETE for kind, *_ in edits) == 3 # Rename and retime change a session's id: delete + put
+    assert by_time(a) == by_time(b)
+    assert sync_a.state.outbox == []
+
+
+def test_pulled_sessions_go_in_by_start_time(tmp_path):
+    server = SyncServer()
+    a = SessionStore()
+    for start in (1000, 1900, 2800):
+        a.append("a", start, start + 600, 600, 300)
+    b = SessionStore()
+    b.append("b", 5000, 5600, 600)
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+    sync_b = client(b, tmp_path / "b.sync.json", server)
+    sync_b.sync()
+    assert sync_a.sync() == [(EDIT_INSERT, 3, None, ("b", 5000, 5600, 600, NO_BREAK))]
+    edits = sync_b.sync()
+    assert [(kind, i) for kind, i, _old, _new in edits] == [(EDIT_INSERT, 0), (EDIT_INSERT, 1), (EDIT_INSERT, 2)]
+    assert list(a.rows()) == list(b.rows())
+    assert list(b.starts) == [1000, 1900, 2800, 5000]
+    assert sync_b.state.pushed == 4 # Inserted below the watermark: nothing to send back
+
+
+def test_concurrent_edits_settle_on_one_winner(tmp_path):
+    server = SyncServer()
+    a = make_store(5)
+    b = SessionStore()
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+    sync_b = client(b, tmp_path / "b.sync.json", server)
+    sync_a.sync()
+    sync_b.sync()
+
+    a.set_break(2, 111)
+    b.set_break(2, 222)
+    sync_b.sync()
+    sync_a.sync()
+    sync_b.sync()
+    winner = server.latest[sync_a._op(2)["id"]][2]
+    assert a.breaks[2] == b.breaks[2] == winner[4]
+    assert winner[4] in (111, 222)
+
+
+def test_pulled_op_loses_to_a_newer_local_edit(tmp_path):
+    server = SyncServer()
+    a = make_store(5)
+    b = SessionStore()
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+    sync_b = client(b, tmp_path / "b.sync.json", server)
+    sync_a.sync()
+    sync_b.sync()
+
+    a.set_break(2, 111)
+    sync_a.sync()
+    pulled, position, _more = sync_b.exchange(sync_b.outgoing())
+    sync_b.state.clock += 10 # B's clock is ahead, so its edit wins
+    b.set_break(2, 222)
+    sync_b.apply(pulled, position)
+    assert b.breaks[2] == 222
+    sync_b.sync()
+    sync_a.sync()
+    assert a.breaks[2] == 222
+
+
+def test_measured_break_is_sent_again(tmp_path):
+    server = SyncServer()
+    a = make_store(5)
+    b = SessionStore()
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+    sync_b = client(b, tmp_path / "b.sync.json", server)
+    sync_a.sync()
+    sync_b.sync()
+    assert b.breaks[4] == NO_BREAK
+
+    a.set_break(4, 420)
+    sync_a.sync()
+    sync_b.sync()
+    assert b.breaks[4] == 420
+
+
+def test_interrupted_round_resumes_without_duplicates(tmp_path):
+    server = SyncServer()
+    a = make_store(100)
+    sync_a = client(a, tmp_path / "a.sync.json", server)
+
+    class Flaky(LocalTransport):
+        pushes = 0
+
+        def push(self, device, ops):
+            Flaky.pushes += 1
+            if Flaky.pushes == 3:
+                raise OSError("connection reset")
+            return super().push(device, ops)
+
+    sync_a.transport = Flaky(server)
+    try:
+        sync_a.sync()
+    except OSError:
+        pass
+    assert sync_a.state.pushed == 40 # Two acknowledged batches
+
+    sync_a.transport = LocalTransport(server)
+    sync_a.sync()
+    b = SessionStore()
+    client(b, tmp_path / "b.sync.json", server).sync()
+    assert by_time(b) == by_time(a)
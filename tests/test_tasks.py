@@ -0,0 +1,48 @@
+import random
+
+from flowtime.store import SessionStore
+from flowtime.tasks import TaskCompleter
+
+WORDS = ["read", "math", "physics", "review", "essay", "chapter", "lab", "notes"]
+
+
+def assert_most_used_first(completer):
+    uses = completer.registry.uses
+    for table in (completer._grams, completer._words):
+        for ids in table.values():
+            assert all(uses[a] >= uses[b] for a, b in zip(ids, ids[1:]))
+
+
+def test_suggestions_rank_prefix_matches_by_use():
+    store = SessionStore()
+    for name, count in (("review math", 1), ("reading", 3), ("essay review", 5)):
+        for _ in range(count):
+            store.append(name, 0, 1, 1)
+    completer = TaskCompleter(lambda: store.tasks)
+    assert completer.suggest("re") == ["reading", "review math", "essay review"]
+    assert completer.suggest("view") == ["essay review", "review math"]
+    assert completer.suggest("reviwe") == ["essay review", "review math"] # Typo
+
+    for _ in range(4):
+        store.append("review math", 0, 1, 1)
+    assert completer.suggest("re") == ["review math", "reading", "essay review"]
+
+
+def test_posting_lists_stay_ordered_as_uses_change():
+    rng = random.Random(5)
+    store = SessionStore()
+    for n in range(500):
+        store.append(f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n}", n, n + 1, 1)
+    completer = TaskCompleter(lambda: store.tasks)
+    completer.sync()
+    assert_most_used_first(completer)
+
+    for step in range(300):
+        if rng.random() < 0.8:
+            store.append(store.tasks.names[rng.randrange(len(store.tasks))], 0, 1, 1)
+        elif rng.random() < 0.5:
+            store.append(f"new {rng.choice(WORDS)} {step}", 0, 1, 1)
+        else:
+            store.delete(rng.randrange(len(store)))
+        completer.suggest(rng.choice(["r", "re", "rev", "math"]))
+    assert_most_used_first(completer)
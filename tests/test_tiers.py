@@ -0,0 +1,145 @@
+import pytest
+
+import flowtime.journal
+from flowtime.index import DAY, SessionIndex
+from flowtime.records import NO_BREAK
+from flowtime.storage import JournalBackend
+from flowtime.store import SessionStore
+from flowtime.tiers import TieredHistory, hot_cutoff, month_of, segments_dir
+
+START = 20_000 * DAY # 2024-10-04
+NOW = START + 120 * DAY
+
+
+def history(count=480, step=DAY // 4):
+    """Sessions every six hours for `count` sessions (four months by default)."""
+    rows = []
+    for n in range(count):
+        t = START + n * step + 3600
+        rows.append((f"task {n % 5}", t, t + 600 + n, 600 + n, 100 + n % 7))
+    rows[-1] = rows[-1][:4] + (NO_BREAK,)
+    return rows
+
+
+def make_tiers(tmp_path, rows=None):
+    path = str(tmp_path / "flowtime_data.json")
+    store = SessionStore()
+    store.extend(rows or history())
+    tiers = TieredHistory(path)
+    tiers.roll(store, NOW)
+    return tiers, store, path
+
+
+def test_roll_moves_old_sessions_into_monthly_segments(tmp_path):
+    rows = history()
+    tiers, store, path = make_tiers(tmp_path, rows)
+    cutoff = hot_cutoff(NOW)
+    cold = [r for r in rows if r[1] < cutoff]
+    assert list(tiers.rows()) == cold
+    assert list(store.rows()) == [r for r in rows if r[1] >= cutoff]
+    assert store.generation == 1 # Backends rewrite the hot file whole
+    assert [s.month for s in tiers.segments] == sorted({month_of(r[1]) for r in cold})
+    assert tiers.total_work + store.total_work == sum(r[3] for r in rows)
+    assert tiers.total_break == sum(r[4] for r in cold)
+    assert tiers.task_counts()["task 0"] == sum(1 for r in cold if r[0] == "task 0")
+    assert list(tiers.combined(store).rows()) == rows
+    assert tiers.roll(store, NOW) == 0
+
+    reopened = TieredHistory(path) # From the manifest this time
+    assert len(reopened) == len(cold) and reopened.daily() == tiers.daily()
+
+
+def test_rolling_again_after_a_crash_keeps_one_copy(tmp_path):
+    rows = history()
+    tiers, store, path = make_tiers(tmp_path, rows)
+    # The hot file was never saved: the next start rolls the whole history again
+    store = SessionStore()
+    store.extend(rows)
+    tiers.roll(store, NOW)
+    assert list(tiers.combined(store).rows()) == rows
+
+
+def test_newer_copy_of_a_rolled_session_wins(tmp_path):
+    rows = history()
+    tiers, store, _ = make_tiers(tmp_path, rows)
+    old = rows[10]
+    store.append(*old[:4], 999) # Break edit pulled by sync after the session was rolled
+    tiers.roll(store, NOW)
+    assert list(tiers.rows())[10] == old[:4] + (999,)
+    assert len(tiers) + len(store) == len(rows)
+
+
+def test_slices_and_pages_cross_segment_boundaries(tmp_path):
+    rows = history()
+    tiers, _, _ = make_tiers(tmp_path, rows)
+    cold = list(tiers.rows())
+    bounds = [0] # Cold index where each month starts
+    for segment in tiers.segments:
+        bounds.append(bounds[-1] + segment.sessions)
+    for lo, hi in [(0, len(cold)), (bounds[1] - 3, bounds[1] + 3), (bounds[1] - 1, bounds[3] + 1),
+                   (bounds[2], bounds[2]), (-5, 4), (len(cold) - 2, len(cold) + 10)]:
+        assert tiers.slice(lo, hi) == cold[max(0, lo):hi]
+    newest_first = cold[::-1]
+    for offset in range(0, len(cold), 37):
+        assert tiers.page(offset, 50) == newest_first[offset:offset + 50]
+
+
+def test_range_totals(tmp_path):
+    rows = history()
+    tiers, store, _ = make_tiers(tmp_path, rows)
+    cold = list(tiers.rows())
+
+    def brute(lo, hi):
+        return sum(r[3] for r in cold if (lo is None or r[1] >= lo) and (hi is None or r[1] < hi))
+
+    tiers = TieredHistory(tiers.directory[:-len(".segments")] + ".json")
+    for lo, hi in [(None, None), (START + 10 * DAY, START + 40 * DAY), (None, START + 61 * DAY),
+                   (START + 33 * DAY, None)]:
+        assert tiers.total(lo, hi) == brute(lo, hi)
+    assert not tiers._cache # Day-aligned bounds: headers only
+
+    for lo, hi in [(START + 10 * DAY + 7200, START + 40 * DAY), (START + 3 * DAY, START + 50 * DAY + 1)]:
+        assert tiers.total(lo, hi) == brute(lo, hi)
+    assert tiers._cache # Mid-day bounds read the rows
+
+    index = SessionIndex(store)
+    assert dict(tiers.top_tasks(index, None)) == {
+        task: sum(r[3] for r in rows if r[0] == task) for task in {r[0] for r in rows}}
+
+
+def test_clear_removes_every_segment(tmp_path):
+    tiers, _, path = make_tiers(tmp_path)
+    tiers.clear()
+    assert len(tiers) == 0 and tiers.total_work == 0
+    assert len(TieredHistory(path)) == 0
+    assert segments_dir(path) == tiers.directory
+
+
+def test_reset_store_is_rewritten_atomically(tmp_path, monkeypatch):
+    path = str(tmp_path / "flowtime_v2.json")
+    backend = JournalBackend(path)
+    store = backend.load()
+    store.extend(history(20))
+    backend.save(store)
+    backend.close(store)
+
+    backend = JournalBackend(path)
+    store = backend.load()
+    hot = list(store.rows())[10:]
+    store.clear() # What TieredHistory.roll does
+    store.extend(hot)
+
+    def crash(target, text):
+        raise RuntimeError("crash")
+
+    monkeypatch.setattr(flowtime.journal, "atomic_write", crash)
+    with pytest.raises(RuntimeError):
+        backend.save(store)
+    monkeypatch.undo()
+    assert len(JournalBackend(path).load()) == 20 # Old history intact
+
+    backend = JournalBackend(path)
+    backend.load()
+    backend.save(store)
+    backend.close(store)
+    assert list(JournalBackend(path).load().rows()) == hot